@@ -0,0 +1,279 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from checks.WCAG_1_3_1.issues import IssueLimits, jsonable
+from checks.WCAG_1_3_1.registry import select_checks
+from checks.WCAG_1_3_1.sampling import Sampling
+from utils.browser_pool import BrowserPool
+from utils.pipeline import load_tests, run_checks
+from utils.snippet_store import SnippetStore
+
+"""
+Long-running WCAG 1.3.1 audit service.
+
+Keeps a warm browser and the check modules resident and exposes a local
+HTTP/JSON API:
+
+    POST /audit   {"url": "..."} or {"html": "...", "url": "optional label"},
+                  optionally with "checks": "heading,table" to run a subset,
+                  "max_issues": N to cap issues per kind, "early_exit": true and
+                  "sample": N to sample the elements of very large pages and
+                  "accessibility_tree": true to check headings and landmarks
+                  against the browser's accessibility tree and "dom_snapshot":
+                  true to run the checks on the browser's live DOM (URL jobs);
+                  with "snippet_refs": true the details reference their HTML
+                  snippets, which are returned once each under "snippets"
+    GET  /stats   queue depth, queue latency and throughput
+    GET  /health  liveness probe
+"""
+
+
+class ServiceStats:
+    """Thread-safe counters for queue latency and throughput."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_latencies = deque(maxlen=window)
+        self.completion_times = deque(maxlen=window)
+
+    def record_submitted(self):
+        with self._lock:
+            self.submitted += 1
+
+    def record_started(self, queue_latency):
+        with self._lock:
+            self.queue_latencies.append(queue_latency)
+
+    def record_finished(self, failed=False):
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self.completion_times.append(time.monotonic())
+
+    def snapshot(self, queue_depth):
+        with self._lock:
+            now = time.monotonic()
+            latencies = sorted(self.queue_latencies)
+            recent = [t for t in self.completion_times if now - t <= 60]
+            uptime = now - self.started_at
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "queue_depth": queue_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queue_latency_ms": {
+                    "mean": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                    "p95": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+                    "max": round(1000 * latencies[-1], 1) if latencies else 0.0,
+                },
+                "throughput_per_minute": len(recent),
+                "throughput_per_second_overall": round((self.completed + self.failed) / uptime, 3) if uptime else 0.0,
+            }
+
+
+class AuditService:
+    """Queues audit jobs and runs them on a fixed set of worker threads."""
+
+    def __init__(self, browser_pool, workers=4, max_queue=1000, check_processes=0, fetch_timeout=None):
+        self.browser_pool = browser_pool
+        self.fetch_timeout = fetch_timeout
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.stats = ServiceStats()
+        # Checks are CPU bound; a process pool lets them use more than one core.
+        self.check_executor = ProcessPoolExecutor(max_workers=check_processes) if check_processes else None
+        self.workers = [
+            threading.Thread(target=self._work, name=f"audit-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def submit(self, url=None, html=None, checks=None, capture=()):
+        """Queues a job and returns a Future for its result; raises queue.Full when saturated."""
+        future = Future()
+        self.jobs.put_nowait((time.monotonic(), url, html, checks, capture, future))
+        self.stats.record_submitted()
+        return future
+
+    def _work(self):
+        while True:
+            enqueued_at, url, html, checks, capture, future = self.jobs.get()
+            started_at = time.monotonic()
+            self.stats.record_started(started_at - enqueued_at)
+            try:
+                inputs = {}
+                if html is None:
+                    html, inputs = self.browser_pool.fetch_page(url, capture, timeout=self.fetch_timeout)
+                fetched_at = time.monotonic()
+                if self.check_executor:
+                    results = self.check_executor.submit(run_checks, html, checks, inputs=inputs).result()
+                else:
+                    results = run_checks(html, checks, inputs=inputs)
+                finished_at = time.monotonic()
+                future.set_result({
+                    "url": url,
+                    "results": results,
+                    "timings_ms": {
+                        "queued": round(1000 * (started_at - enqueued_at), 1),
+                        "fetch": round(1000 * (fetched_at - started_at), 1),
+                        "checks": round(1000 * (finished_at - fetched_at), 1),
+                    },
+                })
+                self.stats.record_finished()
+            except Exception as e:
+                logging.error(f"Audit failed for {url or 'submitted HTML'}: {e}")
+                future.set_exception(e)
+                self.stats.record_finished(failed=True)
+            finally:
+                self.jobs.task_done()
+
+
+def reference_snippets(payload):
+    """An audit response whose details reference their snippets, listed once under "snippets"."""
+    store = SnippetStore()
+    results = {
+        test_name: {**result, "details": store.reference(result.get("details", []))}
+        for test_name, result in payload["results"].items()
+    }
+    return {**payload, "results": results, "snippets": store.snippets}
+
+
+def make_handler(service, request_timeout):
+    class AuditRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, default=jsonable).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self._send_json(200, service.stats.snapshot(service.jobs.qsize()))
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/audit":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                self._send_json(400, {"error": f"Invalid JSON body: {e}"})
+                return
+            if not isinstance(request, dict):
+                self._send_json(400, {"error": "The JSON body must be an object."})
+                return
+            url, html, checks = request.get("url"), request.get("html"), request.get("checks")
+            if not url and not html:
+                self._send_json(400, {"error": "Provide either 'url' or 'html'."})
+                return
+            try:
+                if checks is not None and not (
+                    isinstance(checks, str)
+                    or (isinstance(checks, list) and all(isinstance(check, str) for check in checks))
+                ):
+                    raise ValueError("'checks' must be a comma-separated string or a list of check names.")
+                select_checks(checks)
+                max_issues, sample = request.get("max_issues"), request.get("sample")
+                if max_issues is not None and (not isinstance(max_issues, int) or max_issues < 1):
+                    raise ValueError("'max_issues' must be a positive integer.")
+                if sample is not None and (not isinstance(sample, int) or sample < 2):
+                    raise ValueError("'sample' must be an integer of at least 2.")
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            limits = None
+            if max_issues is not None or request.get("early_exit"):
+                limits = IssueLimits(per_kind=max_issues, early_exit=bool(request.get("early_exit")))
+            sampling = Sampling(size=sample) if sample else None
+            if limits or sampling:
+                checks = load_tests(checks, limits, sampling)
+            try:
+                capture = [
+                    name for name, field in (("accessibility_tree", "accessibility_tree"), ("document", "dom_snapshot"))
+                    if request.get(field)
+                ]
+                future = service.submit(url=url, html=html, checks=checks, capture=capture)
+            except queue.Full:
+                self._send_json(503, {"error": "Audit queue is full, retry later."})
+                return
+            try:
+                payload = future.result(timeout=request_timeout)
+                if request.get("snippet_refs"):
+                    payload = reference_snippets(payload)
+                self._send_json(200, payload)
+            except TimeoutError:
+                self._send_json(504, {"error": "Audit did not finish in time."})
+            except Exception as e:
+                self._send_json(502, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} - {format % args}")
+
+    return AuditRequestHandler
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Run the WCAG 1.3.1 audit service.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only).")
+    parser.add_argument("--port", type=int, default=8131, help="Port to listen on.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent audit jobs.")
+    parser.add_argument("--browser-pages", type=int, default=4, help="Pages the warm browser may open at once.")
+    parser.add_argument("--check-processes", type=int, default=0,
+                        help="Run checks in this many worker processes (0 runs them in the worker threads).")
+    parser.add_argument("--max-queue", type=int, default=1000, help="Jobs allowed to wait before rejecting requests.")
+    parser.add_argument("--request-timeout", type=float, default=300, help="Seconds a request waits for its result.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # The check modules configure DEBUG logging; a service needs less noise.
+    logging.getLogger().setLevel(logging.INFO)
+
+    browser_pool = BrowserPool(size=args.browser_pages).start()
+    service = AuditService(
+        browser_pool,
+        workers=args.workers,
+        max_queue=args.max_queue,
+        check_processes=args.check_processes,
+        fetch_timeout=args.request_timeout,
+    ).start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.request_timeout))
+    print(f"WCAG 1.3.1 audit service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+        browser_pool.stop()
+        if service.check_executor:
+            service.check_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Helpers for accessibility snapshots.
+
+A snapshot is a tree of dicts with a "role", a "name", optional properties
+such as "level", and "children", in the form of Playwright's former
+`page.accessibility.snapshot(interesting_only=False)`; tree_from_ax_nodes()
+builds it from the Chrome DevTools `Accessibility.getFullAXTree` nodes. Text
+reaches the tree as leaf nodes, while containers such as links and headings
+also repeat it as their name, so text is measured from the leaves only.
+"""
+
+# Landmark roles and the element each one is normally exposed for
+LANDMARK_ROLE_TAGS = {
+    "banner": "header",
+    "navigation": "nav",
+    "main": "main",
+    "contentinfo": "footer",
+    "complementary": "aside",
+    "region": "section",
+    "article": "article",
+    "form": "form",
+}
+
+# Roles of form controls
+INPUT_ROLES = {
+    "textbox", "searchbox", "combobox", "listbox", "checkbox", "radio",
+    "spinbutton", "slider", "switch",
+}
+
+# CDP role names as the snapshot spelled them
+SNAPSHOT_ROLES = {"RootWebArea": "WebArea", "StaticText": "text"}
+
+# Node properties the snapshot carried, with their CDP values
+SNAPSHOT_PROPERTIES = {
+    "level", "checked", "pressed", "selected", "expanded", "disabled", "focused", "modal",
+    "multiline", "multiselectable", "readonly", "required", "invalid", "haspopup",
+    "autocomplete", "orientation", "keyshortcuts", "roledescription", "valuetext",
+    "valuemin", "valuemax",
+}
+
+
+def tree_from_ax_nodes(nodes):
+    """
+    Builds a snapshot from the nodes of a CDP `Accessibility.getFullAXTree` result.
+
+    Ignored nodes are left out and their children take their place; the
+    inline text boxes below text leaves are dropped. Returns None for an
+    empty tree.
+    """
+    by_id = {node["nodeId"]: node for node in nodes}
+
+    def value(node, field):
+        return (node.get(field) or {}).get("value")
+
+    def convert(node):
+        converted = {"role": SNAPSHOT_ROLES.get(value(node, "role"), value(node, "role") or "")}
+        converted["name"] = value(node, "name") or ""
+        for field in ("value", "description"):
+            if value(node, field) not in (None, ""):
+                converted[field] = value(node, field)
+        for prop in node.get("properties", ()):
+            if prop["name"] in SNAPSHOT_PROPERTIES:
+                converted[prop["name"]] = prop["value"].get("value")
+        return converted
+
+    def visible_children(node):
+        # Iterative, so deep documents do not hit the recursion limit
+        found = []
+        stack = list(reversed(node.get("childIds", ())))
+        while stack:
+            child = by_id.get(stack.pop())
+            if child is None or value(child, "role") == "InlineTextBox":
+                continue
+            if child.get("ignored"):
+                stack.extend(reversed(child.get("childIds", ())))
+            else:
+                found.append(child)
+        return found
+
+    roots = [node for node in nodes if node.get("parentId") not in by_id]
+    if not roots:
+        return None
+    root = roots[0]
+    tree = convert(root)
+    pending = [(root, tree)]
+    while pending:
+        node, converted = pending.pop()
+        children = visible_children(node)
+        if children:
+            converted["children"] = [convert(child) for child in children]
+            pending.extend(zip(children, converted["children"]))
+    return tree
+
+
+def iter_nodes(node):
+    """Yields the nodes of a snapshot in document (depth-first) order."""
+    stack = [node] if node else []
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(current.get("children", ())))
+
+
+def subtree_text(node):
+    """Text of a subtree, joined from its leaf nodes."""
+    return " ".join(
+        descendant.get("name", "")
+        for descendant in iter_nodes(node)
+        if not descendant.get("children") and descendant.get("name")
+    )
+
+
+def has_descendant(node, roles):
+    """True if any node below `node` has one of `roles`."""
+    return any(descendant.get("role") in roles for descendant in iter_nodes(node) if descendant is not node)
+
+
+def node_label(node):
+    """Short description of a node for report snippets."""
+    name = node.get("name", "")
+    return f"[{node.get('role', '')}] {name}"[:100]
@@ -0,0 +1,553 @@
+import sys
+import re
+from array import array
+from collections import Counter
+from html.parser import HTMLParser
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+
+"""
+Compact array-backed document model shared by the WCAG 1.3.1 checks.
+
+A Document holds every node of a page in document (pre-)order in flat,
+typed arrays indexed by node id: kind, tag id, parent, end of subtree and
+source line, plus offsets into one attribute table and one text buffer.
+Tag names are stored once in `tag_names` and referred to by id. Because ids
+follow document order, the descendants of node `i` are exactly the ids in
+`range(i + 1, ends[i])`: its first child is `i + 1` and the next sibling of
+a child `c` is `ends[c]`, so no child or sibling pointers are needed and no
+per-node objects are kept.
+
+Node 0 is the document itself. A Document is built once per page, from
+HTML (`from_html` builds the tree BeautifulSoup's html.parser builder
+would) or from a Chrome DevTools `DOMSnapshot.captureSnapshot` result (the
+browser's live DOM). Queries mirror what the checks used to ask
+BeautifulSoup, with the same results: `get_text` and `decode` follow
+BeautifulSoup's text and output rules.
+"""
+
+DOCUMENT, ELEMENT, TEXT, CDATA, COMMENT, PROCESSING_INSTRUCTION, DOCTYPE, DECLARATION = range(8)
+
+# Elements serialized as <tag/> when they have no children; the parser closes them at once
+VOID_ELEMENTS = frozenset({
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+    'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track',
+    'wbr',
+})
+
+# Text inside these elements is their own kind of string: it is only part of
+# get_text() for the container itself, never for ordinary elements
+STRING_CONTAINERS = frozenset({'rt', 'rp', 'style', 'script', 'template'})
+
+# Text of these elements is serialized without entity substitution
+RAW_TEXT_ELEMENTS = frozenset({'script', 'style'})
+
+# Whitespace-only text is kept inside these elements; elsewhere it becomes ' ' or '\n'
+PRESERVE_WHITESPACE_ELEMENTS = frozenset({'pre', 'textarea'})
+
+# Attributes holding space-separated values, per tag ('*': any tag); their whitespace is normalized
+MULTI_VALUED_ATTRIBUTES = {
+    '*': frozenset({'class', 'accesskey', 'dropzone'}),
+    'a': frozenset({'rel', 'rev'}),
+    'link': frozenset({'rel', 'rev'}),
+    'td': frozenset({'headers'}),
+    'th': frozenset({'headers'}),
+    'form': frozenset({'accept-charset'}),
+    'object': frozenset({'archive'}),
+    'area': frozenset({'rel'}),
+    'icon': frozenset({'sizes'}),
+    'iframe': frozenset({'sandbox'}),
+    'output': frozenset({'for'}),
+}
+
+_MARKUP = {
+    CDATA: ('<![CDATA[', ']]>'),
+    COMMENT: ('<!--', '-->'),
+    PROCESSING_INSTRUCTION: ('<?', '>'),
+    DOCTYPE: ('<!DOCTYPE ', '>'),
+    DECLARATION: ('<!', '>'),
+}
+
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+_NON_WHITESPACE = re.compile(r'\S+')
+_DECIMAL_REFERENCE = re.compile('^([0-9]+)(.*)')
+_HEX_REFERENCE = re.compile('^([0-9a-f]+)(.*)')
+_SPECIAL_CHARACTERS = re.compile(r'[&<>]')
+_ENTITIES = {'&': '&amp;', '<': '&lt;', '>': '&gt;'}
+_META_CHARSET = re.compile(r'((^|;)\s*charset=)([^;]*)', re.M)
+
+
+def _escape(value):
+    return _SPECIAL_CHARACTERS.sub(lambda match: _ENTITIES[match.group()], value)
+
+
+def _quote(value):
+    value = _escape(value)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', '&quot;') + '"'
+
+
+def _dereference(name):
+    """Character of a numeric reference such as '#9731' (given as '9731'), and any trailing data."""
+    base, pattern = 10, _DECIMAL_REFERENCE
+    if name[:1] in ('x', 'X'):
+        name = name[1:]
+        base, pattern = 16, _HEX_REFERENCE
+    try:
+        number, extra = int(name, base), ''
+    except ValueError:
+        match = pattern.search(name)
+        if match is None:
+            return '', name
+        number, extra = int(match.group(1), base), match.group(2)
+    return UnicodeDammit.numeric_character_reference(number)[0], extra
+
+
+class Document:
+    """A parsed page as flat per-node arrays; see the module docstring."""
+
+    def __init__(self):
+        # Tag id -> name; id 0 is "no tag" (the document and non-element nodes)
+        self.tag_names = ['']
+        self.tag_ids = {'': 0}
+        self.kinds = array('B', [DOCUMENT])
+        self.tags = array('I', [0])
+        self.parents = array('i', [-1])
+        self.ends = array('I', [1])
+        # 0 when unknown
+        self.lines = array('I', [0])
+        # The attributes of node i are entries attribute_offsets[i]:attribute_offsets[i + 1]
+        self.attribute_offsets = array('I', [0, 0])
+        self.attribute_names = []
+        self.attribute_values = []
+        # The text of node i is text[text_offsets[i]:text_offsets[i + 1]]
+        self.text_offsets = array('I', [0, 0])
+        self.text = ''
+        # Tag id of the innermost string container around each text node
+        self.containers = array('I', [0])
+        self._text_parts = []
+        self._text_length = 0
+        # Longest markup decode() returns, if set (e.g. to keep snippets small when memory is short)
+        self.snippet_limit = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # Building
+
+    def _tag_id(self, name):
+        tag_id = self.tag_ids.get(name)
+        if tag_id is None:
+            tag_id = self.tag_ids[name] = len(self.tag_names)
+            self.tag_names.append(sys.intern(name))
+        return tag_id
+
+    def _append(self, kind, parent, name='', line=0, attributes=(), text='', container=''):
+        self.kinds.append(kind)
+        self.tags.append(self._tag_id(name))
+        self.parents.append(parent)
+        self.ends.append(0)
+        self.lines.append(line or 0)
+        for key, value in attributes:
+            self.attribute_names.append(sys.intern(key))
+            self.attribute_values.append(value)
+        self.attribute_offsets.append(len(self.attribute_names))
+        if text:
+            self._text_parts.append(text)
+            self._text_length += len(text)
+        self.text_offsets.append(self._text_length)
+        self.containers.append(self._tag_id(container))
+        return len(self.kinds) - 1
+
+    def _finish(self):
+        """Joins the text buffer and fills `ends` once all nodes are appended in document order."""
+        self.text = ''.join(self._text_parts)
+        self._text_parts = []
+        ends, parents = self.ends, self.parents
+        for node in range(len(ends) - 1, -1, -1):
+            if ends[node] <= node:
+                ends[node] = node + 1
+            parent = parents[node]
+            if parent >= 0 and ends[node] > ends[parent]:
+                ends[parent] = ends[node]
+        return self
+
+    @classmethod
+    def from_html(cls, html):
+        """Parses HTML into a Document, with the tree BeautifulSoup(html, 'html.parser') builds."""
+        if isinstance(html, bytes):
+            html = UnicodeDammit(html, is_html=True).unicode_markup
+        builder = _TreeBuilder(cls())
+        builder.feed(html)
+        return builder.close()
+
+    @classmethod
+    def from_dom_snapshot(cls, snapshot):
+        """
+        Builds a Document from a CDP `DOMSnapshot.captureSnapshot` result.
+
+        Only the top-level document is used; frames are separate documents in
+        the snapshot. Pseudo-elements are skipped. Snapshots carry no source
+        lines, so `line()` is unknown for every node.
+        """
+        strings = snapshot['strings']
+        nodes = snapshot['documents'][0]['nodes']
+        parent_index = nodes['parentIndex']
+        node_types = nodes['nodeType']
+        node_names = nodes['nodeName']
+        node_values = nodes['nodeValue']
+        node_attributes = nodes.get('attributes') or [[] for _ in parent_index]
+
+        def string(index):
+            return strings[index] if index >= 0 else ''
+
+        children = [[] for _ in parent_index]
+        roots = []
+        for index, parent in enumerate(parent_index):
+            (children[parent] if parent >= 0 else roots).append(index)
+
+        document = cls()
+        kinds = {1: ELEMENT, 3: TEXT, 4: CDATA, 7: PROCESSING_INSTRUCTION, 8: COMMENT, 10: DOCTYPE}
+        # The snapshot's document node becomes node 0
+        top_level = []
+        for root in roots:
+            top_level.extend(children[root] if node_types[root] == 9 else [root])
+        # Depth-first walk in document order: (snapshot index, parent id, innermost string container)
+        stack = [(child, 0, '') for child in reversed(top_level)]
+        while stack:
+            index, parent, container = stack.pop()
+            kind = kinds.get(node_types[index])
+            if kind is None:
+                continue
+            name = string(node_names[index])
+            if kind == ELEMENT:
+                if name.startswith('::'):
+                    continue
+                name = name.lower()
+                pairs = node_attributes[index]
+                attributes = [(string(pairs[i]), string(pairs[i + 1])) for i in range(0, len(pairs), 2)]
+                node = document._append(ELEMENT, parent, name=name, attributes=attributes)
+                inner = name if name in STRING_CONTAINERS else container
+                stack.extend((child, node, inner) for child in reversed(children[index]))
+            elif kind == DOCTYPE:
+                document._append(DOCTYPE, parent, text=name)
+            else:
+                text = string(node_values[index])
+                document._append(kind, parent, text=text, container=container if kind == TEXT else '')
+        return document._finish()
+
+    # Queries
+
+    def name(self, node):
+        """Tag name of an element ('' for other nodes)."""
+        return self.tag_names[self.tags[node]]
+
+    def line(self, node, default=None):
+        """Source line of an element, or `default` when unknown."""
+        return self.lines[node] or default
+
+    def node_text(self, node):
+        """Text of a single text-like node (text, comment, doctype...)."""
+        return self.text[self.text_offsets[node]:self.text_offsets[node + 1]]
+
+    def attributes(self, node):
+        """(name, value) pairs of an element's attributes, in source order."""
+        start, end = self.attribute_offsets[node], self.attribute_offsets[node + 1]
+        return list(zip(self.attribute_names[start:end], self.attribute_values[start:end]))
+
+    def get(self, node, attribute, default=None):
+        """Value of an element attribute."""
+        names = self.attribute_names
+        for index in range(self.attribute_offsets[node], self.attribute_offsets[node + 1]):
+            if names[index] == attribute:
+                return self.attribute_values[index]
+        return default
+
+    def has_attribute(self, node, attribute):
+        names = self.attribute_names
+        return any(
+            names[index] == attribute
+            for index in range(self.attribute_offsets[node], self.attribute_offsets[node + 1])
+        )
+
+    def _tag_set(self, names):
+        """Tag ids of `names`, or None (every element) when `names` is None."""
+        if names is None:
+            return None
+        tag_ids = self.tag_ids
+        return {tag_ids[name] for name in names if name in tag_ids}
+
+    def first_child(self, node):
+        """First child node of `node` (of any kind), or None."""
+        return node + 1 if node + 1 < self.ends[node] else None
+
+    def next_sibling(self, node):
+        """Next sibling node of `node` (of any kind), or None."""
+        parent = self.parents[node]
+        sibling = self.ends[node]
+        return sibling if parent >= 0 and sibling < self.ends[parent] else None
+
+    def children(self, node, names=None):
+        """Child elements of `node`, optionally only those named in `names`."""
+        tag_ids = self._tag_set(names)
+        kinds, tags, ends = self.kinds, self.tags, self.ends
+        child = node + 1
+        end = ends[node]
+        while child < end:
+            if kinds[child] == ELEMENT and (tag_ids is None or tags[child] in tag_ids):
+                yield child
+            child = ends[child]
+
+    def descendants(self, node=0, names=None):
+        """Descendant elements of `node` in document order, optionally only those named in `names`."""
+        tag_ids = self._tag_set(names)
+        span = range(node + 1, self.ends[node])
+        if tag_ids is None:
+            kinds = self.kinds
+            return (descendant for descendant in span if kinds[descendant] == ELEMENT)
+        tags = self.tags
+        return (descendant for descendant in span if tags[descendant] in tag_ids)
+
+    def find_all(self, names=None, node=0):
+        """List of descendant elements of `node` named in `names` (all elements when None)."""
+        return list(self.descendants(node, names))
+
+    def find(self, node=0, names=None, attributes=None):
+        """
+        First descendant element matching `names` and `attributes`; attribute
+        values of True only require the attribute to be present.
+        """
+        for descendant in self.descendants(node, names):
+            if not attributes or all(
+                self.has_attribute(descendant, key) if expected is True else self.get(descendant, key) == expected
+                for key, expected in attributes.items()
+            ):
+                return descendant
+        return None
+
+    def ancestors(self, node):
+        """Ancestors of `node`, nearest first, ending with the document."""
+        parents = self.parents
+        parent = parents[node]
+        while parent >= 0:
+            yield parent
+            parent = parents[parent]
+
+    def find_parent(self, node, names):
+        """Nearest ancestor element named in `names`, or None."""
+        tag_ids = self._tag_set(names)
+        tags = self.tags
+        for ancestor in self.ancestors(node):
+            if tags[ancestor] in tag_ids:
+                return ancestor
+        return None
+
+    def _text_nodes(self, node):
+        """The nodes whose text BeautifulSoup's get_text() includes for `node`."""
+        name = self.name(node)
+        container = self.tag_ids[name] if name in STRING_CONTAINERS else 0
+        kinds, containers = self.kinds, self.containers
+        for descendant in range(node + 1, self.ends[node]):
+            kind = kinds[descendant]
+            if kind == TEXT and containers[descendant] == container or kind == CDATA and not container:
+                yield descendant
+
+    def get_text(self, node, strip=False):
+        """Text of a subtree, as BeautifulSoup's get_text(strip=strip) returns it."""
+        parts = (self.node_text(descendant) for descendant in self._text_nodes(node))
+        if strip:
+            return ''.join(part for part in (part.strip() for part in parts) if part)
+        return ''.join(parts)
+
+    def text_length(self, node, strip=False):
+        """len(get_text(node, strip)); without `strip`, computed from the offsets alone."""
+        if strip:
+            return sum(len(self.node_text(descendant).strip()) for descendant in self._text_nodes(node))
+        offsets = self.text_offsets
+        return sum(offsets[descendant + 1] - offsets[descendant] for descendant in self._text_nodes(node))
+
+    def _output_attributes(self, node):
+        """Attributes as str() of a BeautifulSoup element writes them: sorted, <meta> charsets as utf-8."""
+        attributes = sorted(self.attributes(node))
+        if self.name(node) != 'meta':
+            return attributes
+        if self.has_attribute(node, 'charset'):
+            return [(key, 'utf-8' if key == 'charset' else value) for key, value in attributes]
+        if self.has_attribute(node, 'content') and self.get(node, 'http-equiv', '').lower() == 'content-type':
+            return [
+                (key, _META_CHARSET.sub(lambda match: match.group(1) + 'utf-8', value) if key == 'content' else value)
+                for key, value in attributes
+            ]
+        return attributes
+
+    def decode(self, node, limit=None):
+        """
+        Markup of a node and its subtree, as str() of the BeautifulSoup element returns it;
+        with `limit`, only its first `limit` characters, without serializing the rest.
+        The document's `snippet_limit`, when set, caps `limit`.
+        """
+        if self.snippet_limit is not None:
+            limit = self.snippet_limit if limit is None else min(limit, self.snippet_limit)
+        kinds, ends, parents = self.kinds, self.ends, self.parents
+        output = []
+        # Characters in output[:counted], for `limit`
+        length = counted = 0
+        # Close tags pending at each end position, innermost last
+        closing = []
+        for current in range(node, ends[node]):
+            if limit is not None:
+                length += sum(map(len, output[counted:]))
+                counted = len(output)
+                if length >= limit:
+                    return ''.join(output)[:limit]
+            while closing and closing[-1][0] <= current:
+                output.append(closing.pop()[1])
+            kind = kinds[current]
+            if kind == ELEMENT:
+                name = self.name(current)
+                output.append('<' + name)
+                for key, value in self._output_attributes(current):
+                    output.append(f' {key}={_quote(value)}')
+                if ends[current] == current + 1 and name in VOID_ELEMENTS:
+                    output.append('/>')
+                else:
+                    output.append('>')
+                    closing.append((ends[current], f'</{name}>'))
+            elif kind == TEXT:
+                parent = parents[current]
+                text = self.node_text(current)
+                output.append(text if parent >= 0 and self.name(parent) in RAW_TEXT_ELEMENTS else _escape(text))
+            elif kind in _MARKUP:
+                prefix, suffix = _MARKUP[kind]
+                output.append(prefix + self.node_text(current) + suffix)
+        while closing:
+            output.append(closing.pop()[1])
+        return ''.join(output)[:limit]
+
+
+class _TreeBuilder(HTMLParser):
+    """
+    Builds a Document from html.parser events with BeautifulSoup's tree
+    construction rules: an end tag closes every element opened after its
+    start tag and is ignored when no such element is open, void elements
+    close at once, whitespace-only text collapses to ' ' or '\\n' outside
+    <pre> and <textarea>, and references are resolved the same way.
+    """
+
+    def __init__(self, document):
+        super().__init__(convert_charrefs=False)
+        self.document = document
+        # Open elements, the document first
+        self.open_nodes = [0]
+        self.open_names = ['']
+        self.open_counts = Counter()
+        self.preserve_whitespace = []
+        self.string_containers = []
+        self.data = []
+        self.closed_void_elements = []
+
+    def close(self):
+        super().close()
+        self.end_data()
+        while len(self.open_nodes) > 1:
+            self.pop()
+        return self.document._finish()
+
+    def push(self, node, name):
+        self.open_nodes.append(node)
+        self.open_names.append(name)
+        self.open_counts[name] += 1
+        if name in PRESERVE_WHITESPACE_ELEMENTS:
+            self.preserve_whitespace.append(node)
+        if name in STRING_CONTAINERS:
+            self.string_containers.append(node)
+
+    def pop(self):
+        node = self.open_nodes.pop()
+        self.open_counts[self.open_names.pop()] -= 1
+        if self.preserve_whitespace and self.preserve_whitespace[-1] == node:
+            self.preserve_whitespace.pop()
+        if self.string_containers and self.string_containers[-1] == node:
+            self.string_containers.pop()
+
+    def pop_to(self, name):
+        """Closes the most recent open `name` element and every element opened after it."""
+        for index in range(len(self.open_nodes) - 1, 0, -1):
+            if not self.open_counts[name]:
+                break
+            found = self.open_names[index] == name
+            self.pop()
+            if found:
+                break
+
+    def end_data(self, kind=TEXT):
+        if not self.data:
+            return
+        data = ''.join(self.data)
+        self.data = []
+        if not self.preserve_whitespace and not data.strip(_ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        container = ''
+        if kind == TEXT and self.string_containers:
+            container = self.document.name(self.string_containers[-1])
+        self.document._append(kind, self.open_nodes[-1], text=data, container=container)
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        multi_valued = MULTI_VALUED_ATTRIBUTES['*'] | MULTI_VALUED_ATTRIBUTES.get(tag, frozenset())
+        attributes = {}
+        for key, value in attrs:
+            value = '' if value is None else value
+            # A repeated attribute keeps its first position and its last value
+            attributes[key] = ' '.join(_NON_WHITESPACE.findall(value)) if key in multi_valued else value
+        self.end_data()
+        node = self.document._append(
+            ELEMENT, self.open_nodes[-1], name=tag, line=self.getpos()[0], attributes=attributes.items()
+        )
+        self.push(node, tag)
+        if handle_empty_element and tag in VOID_ELEMENTS:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.closed_void_elements.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        # The end tag of a void element already closed at its start tag (<br></br>) is dropped
+        if check_already_closed and tag in self.closed_void_elements:
+            self.closed_void_elements.remove(tag)
+        else:
+            self.end_data()
+            self.pop_to(tag)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        self.data.extend(_dereference(name))
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.data.append(character if character is not None else f'&{name}')
+
+    def _markup(self, kind, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data(kind)
+
+    def handle_comment(self, data):
+        self._markup(COMMENT, data)
+
+    def handle_decl(self, decl):
+        self._markup(DOCTYPE, decl[len('DOCTYPE '):])
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._markup(CDATA, data[len('CDATA['):])
+        else:
+            self._markup(DECLARATION, data)
+
+    def handle_pi(self, data):
+        self._markup(PROCESSING_INSTRUCTION, data)
@@ -0,0 +1,366 @@
+import re
+import sys
+from collections import Counter, namedtuple
+from collections.abc import Mapping
+
+"""
+Compact issue records shared by the WCAG 1.3.1 checks.
+
+Every kind of issue a check can report is registered once in ISSUE_KINDS
+with its WCAG code, message template and confidence weight. Issues are
+stored as slotted Issue records that reference their kind, and rendered
+messages are interned, so thousands of identical findings share one string.
+Scoring is a lookup of `issue.kind.weight` instead of scanning message text.
+
+Issue records behave as read-only mappings with the same keys the checks
+have always reported (e.g. "Line Number", "Issue", "Issue Code"), so the
+writers, grouping and JSON output see the familiar layout.
+
+Checks collect their issues in an IssueList. Given IssueLimits it keeps at
+most `per_kind` records of each kind while still counting every issue, and
+with `early_exit` a check may stop scanning once its verdict is settled.
+"""
+
+# Report layout of each check: output key -> Issue slot ("code" comes from the kind)
+LAYOUTS = {
+    "heading": {
+        "Line Number": "line", "Heading Tag": "tag", "Text Content": "text",
+        "Issue": "message", "Issue Code": "code",
+    },
+    "list": {
+        "List Index": "index", "List HTML": "snippet", "Issue": "message",
+        "Issue Code": "code", "Confidence Percentage": "confidence",
+    },
+    "table": {
+        "Table Index": "index", "Table HTML": "snippet", "Issue": "message",
+        "Confidence Percentage": "confidence",
+    },
+    "blockquote": {
+        "issue": "message",
+    },
+    "landmark": {
+        "Line Number": "line", "Landmark Tag": "tag", "HTML Snippet": "snippet",
+        "Issue": "message", "Issue Code": "code",
+    },
+    "structural": {
+        "Line Number": "line", "Structural Tag": "tag", "HTML Snippet": "snippet",
+        "Issue": "message", "Issue Code": "code",
+    },
+    "form": {
+        "Line Number": "line", "Input Type": "text", "Input HTML": "snippet",
+        "Issue": "message", "Issue Code": "code",
+    },
+}
+
+
+class IssueKind:
+    """A registered kind of issue: one entry of the enumerated registry."""
+
+    __slots__ = ("id", "name", "check", "code", "message", "weight", "layout")
+
+    def __init__(self, id, name, check, code, message, weight):
+        self.id = id
+        self.name = name
+        self.check = check
+        self.code = code
+        self.message = message
+        self.weight = weight
+        self.layout = LAYOUTS[check]
+
+    def format(self, **params):
+        """Renders the message template; the result is interned."""
+        return sys.intern(self.message.format(**params)) if params else self.message
+
+    def __reduce__(self):
+        # Unpickle to the registered instance rather than a copy
+        return (issue_kind, (self.name,))
+
+    def __repr__(self):
+        return f"IssueKind({self.name})"
+
+
+ISSUE_KINDS = []
+_KINDS_BY_NAME = {}
+# Kind id -> regex of its rendered messages, for kind_of()
+_MESSAGE_PATTERNS = []
+
+
+def _message_pattern(message):
+    # The template's fields match any text
+    parts = re.split(r"\{[^{}]*\}", message)
+    return re.compile(".*?".join(re.escape(part) for part in parts), re.DOTALL)
+
+
+def register_kind(name, check, code, message, weight=0):
+    """Adds an issue kind to the registry and returns it."""
+    kind = IssueKind(len(ISSUE_KINDS), name, check, code, sys.intern(message), weight)
+    ISSUE_KINDS.append(kind)
+    _KINDS_BY_NAME[name] = kind
+    _MESSAGE_PATTERNS.append(_message_pattern(kind.message))
+    return kind
+
+
+def issue_kind(name):
+    """Looks up a registered issue kind by name."""
+    return _KINDS_BY_NAME[name]
+
+
+_MISSING = object()
+
+
+class Issue(Mapping):
+    """One reported issue, stored in slots and exposed with its check's layout."""
+
+    __slots__ = ("kind", "message", "line", "index", "tag", "text", "snippet", "confidence")
+
+    def __init__(self, kind, message=None, line=_MISSING, index=_MISSING, tag=_MISSING,
+                 text=_MISSING, snippet=_MISSING, confidence=_MISSING):
+        self.kind = kind
+        self.message = kind.message if message is None else message
+        self.line = line
+        self.index = index
+        self.tag = tag
+        self.text = text
+        self.snippet = snippet
+        self.confidence = confidence
+
+    def _value(self, slot):
+        return self.kind.code if slot == "code" else getattr(self, slot)
+
+    def __getitem__(self, key):
+        value = self._value(self.kind.layout[key])
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        slot = self.kind.layout[key]
+        if slot == "code":
+            raise KeyError(f"{key} is defined by the issue kind")
+        setattr(self, slot, value)
+
+    def __iter__(self):
+        return (key for key, slot in self.kind.layout.items() if self._value(slot) is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        # Unset slots are left out: a copy of the _MISSING sentinel would read as a value
+        values = {slot: getattr(self, slot) for slot in self.__slots__[1:] if getattr(self, slot) is not _MISSING}
+        return (_restore_issue, (self.kind, values))
+
+    def __repr__(self):
+        return f"Issue({self.kind.name}, {dict(self)!r})"
+
+
+def _restore_issue(kind, values):
+    return Issue(kind, **values)
+
+
+def kind_of(issue):
+    """
+    Registered kind of an issue: an Issue's own kind, or for a plain dict (e.g.
+    a result read back from JSON) the kind whose message template its "Issue"
+    text fills; a joined table message counts under its first problem. None
+    if no kind matches.
+    """
+    if isinstance(issue, Issue):
+        return issue.kind
+    message = issue.get("Issue", issue.get("issue"))
+    if not isinstance(message, str):
+        return None
+    code = issue.get("Issue Code")
+    candidates = [kind for kind in ISSUE_KINDS if code is None or kind.code == code]
+    for kind in candidates:
+        if _MESSAGE_PATTERNS[kind.id].fullmatch(message):
+            return kind
+    prefixes = [
+        (match.end(), kind) for kind in candidates if (match := _MESSAGE_PATTERNS[kind.id].match(message))
+    ]
+    return max(prefixes, key=lambda prefix: prefix[0])[1] if prefixes else None
+
+
+def issue_weight(issue):
+    """Confidence weight of an issue; plain dicts (error entries) weigh nothing."""
+    kind = getattr(issue, "kind", None)
+    return kind.weight if kind is not None else 0
+
+
+# Per-kind cap on recorded issues and whether checks may stop once their verdict is settled
+IssueLimits = namedtuple("IssueLimits", ["per_kind", "early_exit"], defaults=(None, False))
+
+
+class IssueList(list):
+    """
+    Issues reported by one check.
+
+    Every issue is counted (in total, per kind and by weight), but only the
+    first `limits.per_kind` records of each kind are kept in the list.
+    """
+
+    def __init__(self, limits=None):
+        super().__init__()
+        self.per_kind = limits.per_kind if limits else None
+        self.early_exit = bool(limits and limits.early_exit)
+        self.counts = Counter()
+        self.total = 0
+        self.weight = 0
+        self.stopped = False
+
+    def append(self, issue, kind=None):
+        """Counts an issue and records it unless its kind is over the cap; `kind` overrides issue.kind."""
+        kind = kind or getattr(issue, "kind", None)
+        self.counts[kind] += 1
+        self.total += 1
+        self.weight += kind.weight if kind is not None else 0
+        if self.per_kind is None or self.counts[kind] <= self.per_kind:
+            super().append(issue)
+
+    def settled(self, baseline):
+        """
+        True when early exit is enabled and the issues so far already outweigh
+        `baseline`: the check fails with confidence 0 whatever else is found.
+        """
+        if self.early_exit and self.weight >= baseline:
+            self.stopped = True
+        return self.stopped
+
+    def limit_fields(self):
+        """Result fields that keep capped output truthful; empty when every issue is shown."""
+        if len(self) == self.total and not self.stopped:
+            return {}
+        fields = {"issue_count": self.total, "issues_shown": len(self)}
+        if self.stopped:
+            fields["early_exit"] = True
+        return fields
+
+
+def jsonable(obj):
+    """`default` hook for json.dump so Issue records serialize as objects."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Registry. Weights reproduce the scores of the earlier message-substring
+# matching exactly; where an old key never matched the message it was meant
+# for (e.g. "missing region" against "Missing Header region"), the weight is 0.
+
+# 1.3.1 (a) headings
+HEADING_REPETITIVE = register_kind(
+    "heading_repetitive", "heading", "1.3.1 (a)", "Repetitive heading detected.")
+HEADING_MISSING_ARIA_LEVEL = register_kind(
+    "heading_missing_aria_level", "heading", "ARIA12", "Missing aria-level on role='heading'.", weight=10)
+HEADING_INVALID_ARIA_LEVEL = register_kind(
+    "heading_invalid_aria_level", "heading", "ARIA12",
+    "Invalid aria-level '{level}'. Must be between 1 and 6.")
+HEADING_EMPTY = register_kind(
+    "heading_empty", "heading", "2.4.6", "Heading with role='heading' is empty or not descriptive.")
+HEADING_SKIPPED_LEVEL = register_kind(
+    "heading_skipped_level", "heading", "1.3.1 (a)",
+    "Skipped heading levels from <h{previous}> to <h{current}>.", weight=5)
+HEADING_NO_PRIMARY = register_kind(
+    "heading_no_primary", "heading", "1.3.1 (a)",
+    "No primary heading (e.g., <h1> or aria-level='1') found in the document.")
+
+# 1.3.1 (b) lists
+LIST_MALFORMED = register_kind(
+    "list_malformed", "list", "1.3.1 (b)", "List is malformed: no direct <li> elements found.", weight=20)
+LIST_MISSING_ROLE = register_kind(
+    "list_missing_role", "list", "1.3.1 (b)",
+    "Non-standard list container is missing role='list' for accessibility.")
+LIST_ARIA_MALFORMED = register_kind(
+    "list_aria_malformed", "list", "1.3.1 (b)", "ARIA list is malformed: no <li> elements found.", weight=20)
+LIST_BAD_NESTING = register_kind(
+    "list_bad_nesting", "list", "1.3.1 (b)",
+    "Nested list is not properly contained within its parent list item.", weight=15)
+LIST_ORPHANED_ITEMS = register_kind(
+    "list_orphaned_items", "list", "1.3.1 (b)",
+    "Orphaned <li> elements found: {count} outside of <ul> or <ol>.", weight=10)
+
+# 1.3.1 (c) tables; one record per table joins the messages of its problems
+TABLE_MISSING_HEADERS = register_kind(
+    "table_missing_headers", "table", "1.3.1 (c)", "Table is missing <th> header cells.")
+TABLE_HEADER_NOT_ASSOCIATED = register_kind(
+    "table_header_not_associated", "table", "1.3.1 (c)",
+    "Header cell is missing 'scope' or 'id' for association.")
+TABLE_MISSING_ROWS = register_kind(
+    "table_missing_rows", "table", "1.3.1 (c)", "Table is missing <tr> row elements.")
+TABLE_MISSING_ROLE = register_kind(
+    "table_missing_role", "table", "1.3.1 (c)", "Table is missing an ARIA role or a summary attribute.")
+TABLE_LAYOUT = register_kind(
+    "table_layout", "table", "1.3.1 (c)", "Table appears to be used for layout purposes.")
+
+# 1.3.1 (d) blockquotes
+BLOCKQUOTE_MISSING_CITE = register_kind(
+    "blockquote_missing_cite", "blockquote", "1.3.1 (d)",
+    "Blockquote is missing a cite attribute or <footer> for source attribution.", weight=20)
+BLOCKQUOTE_MISSING_ARIA = register_kind(
+    "blockquote_missing_aria", "blockquote", "1.3.1 (d)",
+    "Blockquote is missing an aria-labelledby or aria-describedby for better accessibility.", weight=15)
+
+# 1.3.1 (e) landmarks
+LANDMARK_EMPTY = register_kind(
+    "landmark_empty", "landmark", "1.3.1 (e)",
+    "Landmark element is empty or has no meaningful content.", weight=20)
+LANDMARK_NAV_WITHOUT_LINKS = register_kind(
+    "landmark_nav_without_links", "landmark", "1.3.1 (e)",
+    "Landmark <nav> should contain navigation links.", weight=10)
+LANDMARK_MAIN_TOO_SHORT = register_kind(
+    "landmark_main_too_short", "landmark", "1.3.1 (e)",
+    "Landmark <main> should contain the primary content of the page.", weight=10)
+LANDMARK_HEADER_WITHOUT_HEADING = register_kind(
+    "landmark_header_without_heading", "landmark", "1.3.1 (e)",
+    "Landmark <header> should include a heading element (e.g., <h1>).")
+LANDMARK_FOOTER_TOO_SHORT = register_kind(
+    "landmark_footer_too_short", "landmark", "1.3.1 (e)",
+    "Landmark <footer> should contain footer information.", weight=10)
+LANDMARK_ASIDE_TOO_SHORT = register_kind(
+    "landmark_aside_too_short", "landmark", "1.3.1 (e)", "Landmark <aside> should have meaningful content.")
+LANDMARK_SECTION_TOO_SHORT = register_kind(
+    "landmark_section_too_short", "landmark", "1.3.1 (e)",
+    "Landmark <section> should have a meaningful amount of content.")
+LANDMARK_ARTICLE_TOO_SHORT = register_kind(
+    "landmark_article_too_short", "landmark", "1.3.1 (e)",
+    "Landmark <article> should contain self-contained, detailed content.", weight=10)
+LANDMARK_FORM_WITHOUT_INPUTS = register_kind(
+    "landmark_form_without_inputs", "landmark", "1.3.1 (e)", "Landmark <form> should include input elements.")
+LANDMARK_FORM_UNLABELLED = register_kind(
+    "landmark_form_unlabelled", "landmark", "1.3.1 (e)",
+    "Landmark <form> should have labeled inputs using <label> elements or aria-label attributes.")
+LANDMARK_PROCESSING_ERROR = register_kind(
+    "landmark_processing_error", "landmark", "1.3.1 (e)", "Error processing landmark: {error}")
+
+# 1.3.1 (f) structural markup
+STRUCTURAL_EMPTY = register_kind(
+    "structural_empty", "structural", "1.3.1 (f)",
+    "Structural element is empty or lacks meaningful content.", weight=15)
+STRUCTURAL_SECTION_TOO_SHORT = register_kind(
+    "structural_section_too_short", "structural", "1.3.1 (f)",
+    "Section should contain a meaningful amount of content.")
+STRUCTURAL_ARTICLE_TOO_SHORT = register_kind(
+    "structural_article_too_short", "structural", "1.3.1 (f)",
+    "Article should contain self-contained, detailed content.")
+STRUCTURAL_DIV_TOO_SHORT = register_kind(
+    "structural_div_too_short", "structural", "1.3.1 (f)",
+    "Div should not be used solely for structural purposes without meaningful content.")
+STRUCTURAL_MISSING_ROLE = register_kind(
+    "structural_missing_role", "structural", "1.3.1 (f)",
+    "Structural element is missing an ARIA role for accessibility.", weight=10)
+STRUCTURAL_MISSING_REGION = register_kind(
+    "structural_missing_region", "structural", "1.3.1 (f)", "Missing {name} region (<{tag}> tag).")
+STRUCTURAL_MISSING_LANDMARK = register_kind(
+    "structural_missing_landmark", "structural", "1.3.1 (f)", "Missing {name} landmark (role='{role}').")
+
+# 1.3.1 (g) forms
+FORM_INPUT_UNLABELLED = register_kind(
+    "form_input_unlabelled", "form", "1.3.1 (g)",
+    "Input element of type '{input_type}' is missing a proper label or an accessible alternative "
+    "(aria-label or aria-labelledby).")
+FORM_MISSING_ARIA = register_kind(
+    "form_missing_aria", "form", "1.3.1 (g)",
+    "Form is missing an aria-labelledby or aria-describedby attribute for accessibility.", weight=10)
+FORM_NOT_GROUPED = register_kind(
+    "form_not_grouped", "form", "1.3.1 (g)",
+    "Form fields are not grouped (use <fieldset> or <optgroup> where appropriate).", weight=10)
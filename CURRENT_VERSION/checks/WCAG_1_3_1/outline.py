@@ -0,0 +1,90 @@
+import weakref
+from bisect import bisect_left
+from collections import namedtuple
+
+"""
+Per-document outline shared by the heading, landmark and structural checks.
+
+One scan of a Document collects what those checks each used to search for:
+the headings with their levels and positions, the landmark regions with
+their roles, and a presence bitmap of the page regions and landmark roles.
+The outline is built on first use and cached for as long as its Document
+lives, so every check of a page reads the same one.
+"""
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+# Elements that may act as headings (with role="heading")
+HEADING_CANDIDATE_TAGS = frozenset(HEADING_TAGS + ('div', 'span'))
+LANDMARK_TAGS = frozenset({'header', 'nav', 'main', 'footer', 'section', 'aside', 'article', 'form', 'hgroup'})
+
+# Presence bits: page regions by tag, landmarks by role
+REGION_TAGS = ('header', 'nav', 'main', 'footer', 'aside')
+LANDMARK_ROLES = ('banner', 'navigation', 'main', 'contentinfo')
+_REGION_BITS = {tag: 1 << bit for bit, tag in enumerate(REGION_TAGS)}
+_ROLE_BITS = {role: 1 << (bit + len(REGION_TAGS)) for bit, role in enumerate(LANDMARK_ROLES)}
+
+# A semantic (h1-h6) or ARIA (role="heading") heading; level is None for an invalid aria-level
+Heading = namedtuple("Heading", ["node", "tag", "level", "aria", "aria_level", "line"])
+
+# A landmark element and its role attribute ('' when none)
+Region = namedtuple("Region", ["node", "tag", "role"])
+
+
+def _aria_level(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class Outline:
+    """Headings, landmark regions and region/role presence of one Document."""
+
+    def __init__(self, document):
+        self.headings = []
+        self.heading_candidates = 0
+        self.regions = []
+        self.presence = 0
+        # Nodes of the h1-h6 elements, in document order
+        self._heading_nodes = []
+
+        for node in document.descendants():
+            tag = document.name(node)
+            role = document.get(node, 'role', '')
+            if tag in HEADING_CANDIDATE_TAGS:
+                self.heading_candidates += 1
+                if tag in HEADING_TAGS:
+                    self._heading_nodes.append(node)
+                # role="heading" takes its level from aria-level, even on h1-h6
+                aria = role == 'heading'
+                if aria or tag in HEADING_TAGS:
+                    aria_level = document.get(node, 'aria-level', '')
+                    level = _aria_level(aria_level) if aria else int(tag[1])
+                    self.headings.append(Heading(node, tag, level, aria, aria_level, document.line(node)))
+            if tag in LANDMARK_TAGS:
+                self.regions.append(Region(node, tag, role))
+            self.presence |= _REGION_BITS.get(tag, 0) | _ROLE_BITS.get(role, 0)
+
+    def has_region(self, tag):
+        """True if the page has an element of a REGION_TAGS tag."""
+        return bool(self.presence & _REGION_BITS[tag])
+
+    def has_role(self, role):
+        """True if the page has an element with one of LANDMARK_ROLES."""
+        return bool(self.presence & _ROLE_BITS[role])
+
+    def contains_heading(self, document, node):
+        """True if an h1-h6 element lies inside the subtree of `node`."""
+        index = bisect_left(self._heading_nodes, node + 1)
+        return index < len(self._heading_nodes) and self._heading_nodes[index] < document.ends[node]
+
+
+_outlines = weakref.WeakKeyDictionary()
+
+
+def document_outline(document):
+    """The Outline of a Document, built on first use and shared by the checks."""
+    outline = _outlines.get(document)
+    if outline is None:
+        outline = _outlines[document] = Outline(document)
+    return outline
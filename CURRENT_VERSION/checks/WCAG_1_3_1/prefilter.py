@@ -0,0 +1,37 @@
+import re
+from functools import lru_cache
+
+"""
+Raw-HTML prefilter for the checks that only apply to pages with given elements.
+
+An element can only come from a start tag in the source, which always begins
+with "<" and the tag name. A case-insensitive search for that prefix over the
+raw HTML is therefore enough to tell that a page has no <table>, <blockquote>
+or <form> at all, without parsing it. A match (even inside a comment or a
+script) only means the page has to be parsed; it never changes a result.
+"""
+
+
+@lru_cache(maxsize=None)
+def _pattern(names, binary):
+    pattern = "<(?:" + "|".join(re.escape(name) for name in names) + ")"
+    return re.compile(pattern.encode("ascii") if binary else pattern, re.IGNORECASE)
+
+
+def may_contain(html, names):
+    """
+    Tells whether the raw HTML may contain an element with one of the given names.
+
+    Args:
+        html (str or bytes): Raw HTML of the page.
+        names (tuple): Lowercase tag names, e.g. ('table',).
+
+    Returns:
+        bool: False only if no such element can exist in the parsed page.
+    """
+    if isinstance(html, (bytes, bytearray)):
+        # NUL bytes point to UTF-16/32, where tags are not spelled out in ASCII
+        if b"\x00" in html:
+            return True
+        return _pattern(tuple(names), True).search(html) is not None
+    return _pattern(tuple(names), False).search(html) is not None
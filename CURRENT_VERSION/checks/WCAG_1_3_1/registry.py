@@ -0,0 +1,78 @@
+import importlib
+from collections import namedtuple
+
+"""
+Registry of the WCAG 1.3.1 checks.
+
+Checks are described here by module and function name only; a check module
+is imported the first time one of its functions is requested, so a run that
+selects a subset never imports (or runs) the others. A check with a
+prefilter only applies to pages whose raw HTML has a start tag of one of
+those names (see checks.WCAG_1_3_1.prefilter); on other pages it returns
+its Not Applicable result without parsing.
+"""
+
+CheckSpec = namedtuple(
+    "CheckSpec", ["name", "code", "label", "module", "function", "writer", "prefilter"], defaults=[None]
+)
+
+CHECKS = [
+    CheckSpec("heading", "1.3.1 (a)", "Heading Markup",
+              "checks.WCAG_1_3_1.test_heading_markup", "check_heading_markup", "write_heading_info"),
+    CheckSpec("list", "1.3.1 (b)", "List Markup",
+              "checks.WCAG_1_3_1.test_list_markup", "test_list_markup", "write_list_info"),
+    CheckSpec("table", "1.3.1 (c)", "Table Markup",
+              "checks.WCAG_1_3_1.test_table_markup", "test_table_markup", "write_table_info", ('table',)),
+    CheckSpec("blockquote", "1.3.1 (d)", "Blockquote Markup",
+              "checks.WCAG_1_3_1.test_blockquote_markup", "test_blockquote_markup", "write_blockquote_info",
+              ('blockquote',)),
+    CheckSpec("landmark", "1.3.1 (e)", "Landmark Markup",
+              "checks.WCAG_1_3_1.test_landmark_markup", "test_landmark_markup", "write_landmark_info"),
+    CheckSpec("structural", "1.3.1 (f)", "Structural Markup",
+              "checks.WCAG_1_3_1.test_structural_markup", "test_structural_markup", "write_structural_info"),
+    CheckSpec("form", "1.3.1 (g)", "Form Markup",
+              "checks.WCAG_1_3_1.test_form_markup", "test_form_markup", "write_form_info", ('form',)),
+]
+
+_LOOKUP = {}
+for _spec in CHECKS:
+    for _key in (_spec.name, _spec.code, _spec.label, _spec.function):
+        _LOOKUP[_key.lower()] = _spec
+
+
+def find_check(key):
+    """Finds a check by name ("heading"), code ("1.3.1 (a)"), label or function name."""
+    try:
+        return _LOOKUP[key.strip().lower()]
+    except KeyError:
+        known = ", ".join(spec.name for spec in CHECKS)
+        raise ValueError(f"Unknown check '{key}'. Available checks: {known}.")
+
+
+def select_checks(selection=None):
+    """
+    Resolves a check selection in registry order.
+
+    Args:
+        selection (str or list, optional): Comma-separated string or list of names/codes.
+            None or empty selects every check.
+
+    Returns:
+        list: Selected CheckSpec entries, without duplicates.
+    """
+    if not selection:
+        return list(CHECKS)
+    if isinstance(selection, str):
+        selection = selection.split(",")
+    chosen = {find_check(key) for key in selection if key.strip()}
+    return [spec for spec in CHECKS if spec in chosen]
+
+
+def load_check(spec):
+    """Imports the check module (once) and returns its check function."""
+    return getattr(importlib.import_module(spec.module), spec.function)
+
+
+def load_writer(spec):
+    """Imports the check module (once) and returns its detail writer."""
+    return getattr(importlib.import_module(spec.module), spec.writer)
@@ -0,0 +1,131 @@
+import math
+import random
+from collections import defaultdict, namedtuple
+
+"""
+Stratified sampling for the per-element validators of very large documents.
+
+When a check has more candidate elements than `Sampling.size`, only a
+stratified random sample of them (strata: tag name, proportional allocation)
+is validated. Issue counts and weights found on the sample are extrapolated
+to the whole population with the usual stratified estimator, and a normal
+confidence interval on those totals is turned into an interval on the
+check's confidence score. Document-level validations always run in full.
+"""
+
+# Candidate elements validated per check (at most), and the random seed
+Sampling = namedtuple("Sampling", ["size", "seed"], defaults=(1000, 0))
+
+# Issue totals in the shape the confidence functions read from an IssueList
+IssueTotals = namedtuple("IssueTotals", ["total", "weight"])
+
+# Two-sided 95% normal quantile
+Z_95 = 1.96
+
+
+def _tag_name(element):
+    return element.name
+
+
+def _estimate(strata):
+    """Stratified estimate of a population total and its standard error."""
+    total = 0.0
+    variance = 0.0
+    for population, values in strata:
+        sampled = len(values)
+        if not sampled:
+            continue
+        mean = sum(values) / sampled
+        total += population * mean
+        if sampled > 1:
+            spread = sum((value - mean) ** 2 for value in values) / (sampled - 1)
+            variance += population ** 2 * (1 - sampled / population) * spread / sampled
+    return total, math.sqrt(variance)
+
+
+class ElementSample:
+    """
+    The candidate elements a check validates: all of them, or a stratified
+    sample when `sampling` is given and the document has more than
+    `sampling.size` candidates. Iterating yields (index, element) in
+    document order; `record` notes the issue kinds found on each element.
+    """
+
+    def __init__(self, elements, sampling=None, key=_tag_name):
+        self.population = len(elements)
+        self.key = key
+        self.active = sampling is not None and self.population > sampling.size
+        if not self.active:
+            self.items = list(enumerate(elements))
+            return
+
+        strata = defaultdict(list)
+        for index, element in enumerate(elements):
+            strata[key(element)].append(index)
+
+        generator = random.Random(sampling.seed)
+        chosen = []
+        self.strata = {}
+        for stratum, indices in strata.items():
+            share = round(sampling.size * len(indices) / self.population)
+            size = min(len(indices), max(share, 2))
+            chosen.extend(generator.sample(indices, size))
+            self.strata[stratum] = (len(indices), [], [])
+        self.items = [(index, elements[index]) for index in sorted(chosen)]
+        self.sampled_total = 0
+        self.sampled_weight = 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def record(self, element, kinds):
+        """Notes the issue kinds a sampled element produced (no-op when not sampling)."""
+        if not self.active:
+            return
+        _, counts, weights = self.strata[self.key(element)]
+        weight = sum(kind.weight for kind in kinds)
+        counts.append(len(kinds))
+        weights.append(weight)
+        self.sampled_total += len(kinds)
+        self.sampled_weight += weight
+
+    def extrapolate(self, issues, score, z=Z_95):
+        """
+        Extrapolates the sampled issues to the whole document.
+
+        Args:
+            issues (IssueList): Every issue recorded by the check, sampled and document-level.
+            score (callable): Maps IssueTotals to the check's confidence score.
+            z (float): Normal quantile of the interval.
+
+        Returns:
+            tuple: (confidence, fields); confidence is the lower bound of the interval and
+            fields are the extra result entries describing the sample and the estimate.
+        """
+        exact_total = issues.total - self.sampled_total
+        exact_weight = issues.weight - self.sampled_weight
+        count, count_error = _estimate((population, counts) for population, counts, _ in self.strata.values())
+        weight, weight_error = _estimate((population, weights) for population, _, weights in self.strata.values())
+
+        # Never below what the sample actually found
+        low = IssueTotals(
+            exact_total + max(count - z * count_error, self.sampled_total),
+            exact_weight + max(weight - z * weight_error, self.sampled_weight),
+        )
+        point = IssueTotals(exact_total + count, exact_weight + weight)
+        high = IssueTotals(exact_total + count + z * count_error, exact_weight + weight + z * weight_error)
+
+        confidence_low, confidence_high = score(high), score(low)
+        return confidence_low, {
+            "confidence_interval": [round(confidence_low, 2), round(confidence_high, 2)],
+            "sample": {
+                "elements": self.population,
+                "sampled": len(self.items),
+                "estimated_issue_count": round(point.total),
+                "issue_count_interval": [math.floor(low.total), math.ceil(high.total)],
+                "point_confidence": round(score(point), 2),
+            },
+        }
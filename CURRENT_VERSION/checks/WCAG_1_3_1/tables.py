@@ -0,0 +1,57 @@
+"""
+Single-pass table analysis for the table check.
+
+Every table of a Document is summarized in one scan of the document: its
+rows and its header cells, which is all the table validators read. Rows and
+cells belong to their nearest table, so a nested table is analyzed on its
+own and never counted inside the table around it. The cost is linear in the
+number of elements.
+"""
+
+
+class TableSummary:
+    """The rows and header cells of one table."""
+
+    def __init__(self, node):
+        self.node = node
+        # Number of <tr> elements of this table (not of tables nested in it)
+        self.rows = 0
+        # <th> elements of this table
+        self.headers = []
+
+    def unassociated_headers(self, document):
+        """Header cells that data cells cannot refer to: neither a scope nor an id."""
+        return [
+            header for header in self.headers
+            if not document.get(header, 'scope') and not document.get(header, 'id')
+        ]
+
+
+def analyze_tables(document):
+    """
+    Summarizes every table of a Document in one pass.
+
+    Args:
+        document (Document): The parsed page.
+
+    Returns:
+        list: TableSummary of each table, in document order.
+    """
+    tables = []
+    # Tables enclosing the current node, innermost last, with their subtree ends
+    open_tables = []
+    for node in document.descendants(0, {'table', 'tr', 'th'}):
+        while open_tables and open_tables[-1][1] <= node:
+            open_tables.pop()
+        name = document.name(node)
+        if name == 'table':
+            table = TableSummary(node)
+            tables.append(table)
+            open_tables.append((table, document.ends[node]))
+        elif open_tables:
+            table = open_tables[-1][0]
+            if name == 'tr':
+                table.rows += 1
+            else:
+                table.headers.append(node)
+    return tables
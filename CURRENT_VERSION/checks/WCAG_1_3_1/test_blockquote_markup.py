@@ -2,7 +2,11 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.prefilter import may_contain
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList, issue_weight, BLOCKQUOTE_MISSING_CITE, BLOCKQUOTE_MISSING_ARIA,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -43,67 +47,76 @@ def write_blockquote_info(file_path, blockquote_info, format="csv"):
         logging.error(f"Error writing blockquote info to {file_path}: {e}")
         return False
 
-def validate_blockquote(blockquote):
-    """Validates a blockquote for source attribution and accessibility."""
+def validate_blockquote(document, blockquote):
+    """Validates a blockquote for source attribution and accessibility; returns an issue kind."""
     match {
-        "missing_cite": not blockquote.get('cite') and not blockquote.find('footer'),
-        "missing_aria": not blockquote.get('aria-labelledby') and not blockquote.get('aria-describedby')
+        "missing_cite": not document.get(blockquote, 'cite') and document.find(blockquote, {'footer'}) is None,
+        "missing_aria": (
+            not document.get(blockquote, 'aria-labelledby') and not document.get(blockquote, 'aria-describedby')
+        )
     }:
         case {"missing_cite": True}:
-            return "Blockquote is missing a cite attribute or <footer> for source attribution."
+            return BLOCKQUOTE_MISSING_CITE
         case {"missing_aria": True}:
-            return "Blockquote is missing an aria-labelledby or aria-describedby for better accessibility."
+            return BLOCKQUOTE_MISSING_ARIA
     return None
 
 def calculate_confidence(blockquote_issues, total_checks):
     """Calculates confidence for blockquote accessibility compliance."""
     baseline_confidence = 95.0
     for issue in blockquote_issues:
-        match issue.get('issue', '').lower():
-            case issue if "missing a cite" in issue:
-                baseline_confidence -= 20
-            case issue if "missing an aria" in issue:
-                baseline_confidence -= 15
+        baseline_confidence -= issue_weight(issue)
     return max(baseline_confidence - (len(blockquote_issues) / total_checks) * 5, 0)
 
-def test_blockquote_markup(html):
-    """Tests for proper usage of blockquote elements in the HTML."""
-    soup = BeautifulSoup(html, 'html.parser')
-    blockquotes = soup.find_all('blockquote')
+def test_blockquote_markup(html, limits=None, document=None):
+    """
+    Tests for proper usage of blockquote elements in the HTML; `limits` caps recorded issues.
+    Given the page's Document (e.g. from a DOM snapshot), the HTML is not parsed;
+    neither is HTML without a <blockquote> tag.
+    """
+    if document is None and not may_contain(html, ('blockquote',)):
+        blockquotes = []
+    else:
+        if document is None:
+            document = Document.from_html(html)
+        blockquotes = document.find_all({'blockquote'})
     logging.info(f"Found {len(blockquotes)} blockquote elements.")
 
     if not blockquotes:
         logging.warning("No blockquote elements found. Markup not applicable.")
         return {"status": "Not Applicable", "details": [], "confidence": 100.0}
 
-    issues = []
+    issues = IssueList(limits)
+    confidence_sum = 0.0
     for blockquote_index, blockquote in enumerate(blockquotes):
-        blockquote_html = str(blockquote)
-
         # Validate blockquote for issues
         blockquote_issues = []
-        issue = validate_blockquote(blockquote)
+        issue = validate_blockquote(document, blockquote)
         if issue:
-            blockquote_issues.append({"issue": issue})
+            blockquote_issues.append(Issue(issue))
 
         # Calculate confidence for the current blockquote
         confidence_percentage = calculate_confidence(blockquote_issues, 1)
 
         if blockquote_issues:
+            # Counted under the kind of the blockquote's issue
             issues.append({
                 "blockquote_index": blockquote_index + 1,
-                "blockquote_html": blockquote_html,
+                "blockquote_html": document.decode(blockquote),
                 "issues": blockquote_issues,
                 "confidence_percentage": confidence_percentage
-            })
+            }, kind=blockquote_issues[0].kind)
+            confidence_sum += confidence_percentage
 
             for issue_detail in blockquote_issues:
                 logging.warning(f"Blockquote {blockquote_index + 1}: {issue_detail['issue']}")
 
     # Calculate overall confidence
-    overall_confidence = (
-        sum(blockquote.get("confidence_percentage", 0) for blockquote in issues) / len(issues)
-        if issues else 100.0
-    )
+    overall_confidence = confidence_sum / issues.total if issues.total else 100.0
 
-    return {"status": "Malformed" if issues else "Passed", "details": issues, "confidence": overall_confidence}
+    return {
+        "status": "Malformed" if issues.total else "Passed",
+        "details": issues,
+        "confidence": overall_confidence,
+        **issues.limit_fields()
+    }
@@ -2,7 +2,11 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.prefilter import may_contain
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList, FORM_INPUT_UNLABELLED, FORM_MISSING_ARIA, FORM_NOT_GROUPED,
+)
 from collections import defaultdict
 
 # Configure logging
@@ -58,92 +62,92 @@ def group_issues(details):
         grouped[issue_key].append(detail)
     return grouped
 
-def validate_input_field(input_element):
+def validate_input_field(document, input_element):
     """Validates individual input elements for accessibility compliance."""
     exempt_types = {'image', 'submit', 'reset', 'button', 'hidden'}
-    input_type = input_element.get('type', '').lower()
+    input_type = document.get(input_element, 'type', '').lower()
 
     # Skip exempt input types
     if input_type in exempt_types:
         return None
 
     match {
-        "id_present": bool(input_element.get('id')),
-        "wrapped_by_label": bool(input_element.find_parent('label')),
-        "aria_present": bool(input_element.get('aria-label') or input_element.get('aria-labelledby'))
+        "id_present": bool(document.get(input_element, 'id')),
+        "wrapped_by_label": document.find_parent(input_element, {'label'}) is not None,
+        "aria_present": bool(
+            document.get(input_element, 'aria-label') or document.get(input_element, 'aria-labelledby')
+        )
     }:
         case {"id_present": True}:
-            form = input_element.find_parent('form')
-            label = form.find('label', {'for': input_element['id']}) if form else None
-            if label:
+            form = document.find_parent(input_element, {'form'})
+            label = None
+            if form is not None:
+                label = document.find(form, {'label'}, {'for': document.get(input_element, 'id')})
+            if label is not None:
                 return None
         case {"wrapped_by_label": True} | {"aria_present": True}:
             return None
 
     # Issue if no valid labeling is found
-    return (
-        f"Input element of type '{input_type}' is missing a proper label or an accessible alternative "
-        f"(aria-label or aria-labelledby)."
-    )
+    return FORM_INPUT_UNLABELLED.format(input_type=input_type)
 
-def validate_aria_attributes(form):
+def validate_aria_attributes(document, form):
     """Checks ARIA attributes on forms for compliance."""
-    if not form.get('aria-labelledby') and not form.get('aria-describedby'):
-        return "Form is missing an aria-labelledby or aria-describedby attribute for accessibility."
+    if not document.get(form, 'aria-labelledby') and not document.get(form, 'aria-describedby'):
+        return FORM_MISSING_ARIA
     return None
 
-def validate_form_grouping(form):
+def validate_form_grouping(document, form):
     """Checks for proper grouping of form fields."""
-    if not form.find_all('fieldset') and not form.find_all('optgroup'):
-        return "Form fields are not grouped (use <fieldset> or <optgroup> where appropriate)."
+    if document.find(form, {'fieldset', 'optgroup'}) is None:
+        return FORM_NOT_GROUPED
     return None
 
 def calculate_confidence(issues, total_checks):
     """Calculates confidence for form accessibility."""
-    baseline_confidence = 100.0
-    weight_map = {
-        "missing a label": 20,
-        "missing a name": 15,
-        "not grouped": 10,
-        "missing an aria": 10,
-    }
-    for issue in issues:
-        for key, weight in weight_map.items():
-            if key in issue.get('issue', '').lower():
-                baseline_confidence -= weight
+    baseline_confidence = 100.0 - issues.weight
     return max(baseline_confidence, 0)
 
-def test_form_markup(html):
-    """Tests for form accessibility compliance."""
+def test_form_markup(html, limits=None, document=None):
+    """
+    Tests for form accessibility compliance; `limits` caps recorded issues.
+    Given the page's Document (e.g. from a DOM snapshot), the HTML is not parsed;
+    neither is HTML without a <form> tag.
+    """
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        forms = soup.find_all('form')
+        if document is None and not may_contain(html, ('form',)):
+            forms = []
+        else:
+            if document is None:
+                document = Document.from_html(html)
+            forms = document.find_all({'form'})
         logging.info(f"Found {len(forms)} forms.")
 
-        issues = []
+        issues = IssueList(limits)
 
         for form_index, form in enumerate(forms):
             try:
-                inputs = form.find_all(['input', 'textarea', 'select'])
+                inputs = document.find_all({'input', 'textarea', 'select'}, form)
                 for input_index, input_element in enumerate(inputs):
-                    if (input_issue := validate_input_field(input_element)):
-                        issues.append({
-                            "Line Number": getattr(input_element, "sourceline", "Unknown"),
-                            "Input Type": input_element.get("type", "N/A"),
-                            "Input HTML": str(input_element),
-                            "Issue": input_issue,
-                            "Issue Code": "1.3.1 (g)"
-                        })
+                    if (input_issue := validate_input_field(document, input_element)):
+                        issues.append(Issue(
+                            FORM_INPUT_UNLABELLED,
+                            input_issue,
+                            line=document.line(input_element, "Unknown"),
+                            text=document.get(input_element, "type", "N/A"),
+                            snippet=document.decode(input_element)
+                        ))
 
             except Exception as e:
                 logging.error(f"Error processing form {form_index + 1}: {e}")
 
         confidence = calculate_confidence(issues, len(forms))
         return {
-            "status": "Malformed" if issues else "Passed",
+            "status": "Malformed" if issues.total else "Passed",
             "details": issues,
             "confidence": confidence,
-            "issue_count": len(issues)
+            "issue_count": issues.total,
+            **issues.limit_fields()
         }
 
     except Exception as e:
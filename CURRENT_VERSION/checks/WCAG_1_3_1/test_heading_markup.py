@@ -2,7 +2,14 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList, jsonable,
+    HEADING_REPETITIVE, HEADING_MISSING_ARIA_LEVEL, HEADING_INVALID_ARIA_LEVEL,
+    HEADING_EMPTY, HEADING_SKIPPED_LEVEL, HEADING_NO_PRIMARY,
+)
+from checks.WCAG_1_3_1.accessibility_tree import iter_nodes
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.outline import document_outline
 
 """
 1.3.1 (a) Heading markup is used appropriately
@@ -10,16 +17,21 @@ from bs4 import BeautifulSoup
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
-def check_heading_markup(html):
+def check_heading_markup(html, limits=None, accessibility_tree=None, document=None):
     """
-    Validates heading markup for WCAG compliance.
+    Validates heading markup for WCAG compliance; `limits` caps recorded issues.
+    Given the page's accessibility snapshot, the headings are read from it instead of the HTML;
+    given its Document (e.g. from a DOM snapshot), the HTML is not parsed.
     """
+    if accessibility_tree is not None:
+        return check_heading_tree(accessibility_tree, limits)
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'span'])
-        logging.info(f"Found {len(headings)} elements potentially acting as headings.")
+        if document is None:
+            document = Document.from_html(html)
+        outline = document_outline(document)
+        logging.info(f"Found {outline.heading_candidates} elements potentially acting as headings.")
 
-        if not headings:
+        if not outline.heading_candidates:
             return {
                 "status": "Not Applicable",
                 "details": [],
@@ -27,45 +39,24 @@ def check_heading_markup(html):
                 "issue_count": 0
             }
 
-        issues = []
+        issues = IssueList(limits)
         has_primary_heading = False
 
         # Helper to add an issue
-        def add_issue(line, tag, text, issue, code):
-            issues.append({
-                "Line Number": line,
-                "Heading Tag": tag,
-                "Text Content": text.strip(),
-                "Issue": issue,
-                "Issue Code": code
-            })
+        def add_issue(line, tag, text, kind, **params):
+            issues.append(Issue(kind, kind.format(**params), line=line, tag=tag, text=text.strip()))
 
         # Track hierarchy levels
         prev_level = 0
         seen_texts = set()  # To detect repetition
-        for heading in headings:
-            line_number = getattr(heading, "sourceline", "Unknown")
-            heading_tag = heading.name
-            heading_text = heading.get_text(strip=True)
-            role = heading.get('role', '')
-            aria_level = heading.get('aria-level', '')
-
-            # Check if the element is intended to act as a heading
-            is_aria_heading = role == 'heading'
-
-            # Skip elements that are neither semantic headings nor ARIA headings
-            if heading_tag not in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6'] and not is_aria_heading:
-                continue
-
-            # Determine the current heading level
-            current_level = None
-            if is_aria_heading:
-                try:
-                    current_level = int(aria_level)
-                except ValueError:
-                    current_level = None
-            else:
-                current_level = int(heading_tag[1])
+        # Semantic and ARIA headings, with their levels, from the shared outline
+        for heading in outline.headings:
+            heading_tag = heading.tag
+            is_aria_heading = heading.aria
+            aria_level = heading.aria_level
+            current_level = heading.level
+            line_number = heading.line or "Unknown"
+            heading_text = document.get_text(heading.node, strip=True)
 
             # Check for a primary heading
             if (heading_tag == 'h1' or (is_aria_heading and current_level == 1)):
@@ -85,40 +76,38 @@ def check_heading_markup(html):
                         line_number,
                         heading_tag,
                         heading_text,
-                        "Repetitive heading detected.",
-                        "1.3.1 (a)"
+                        HEADING_REPETITIVE
                     )
                 case {"is_aria_heading": True, "missing_aria_level": True}:
                     add_issue(
                         line_number,
                         heading_tag,
                         heading_text,
-                        "Missing aria-level on role='heading'.",
-                        "ARIA12"
+                        HEADING_MISSING_ARIA_LEVEL
                     )
                 case {"is_aria_heading": True, "invalid_aria_level": True}:
                     add_issue(
                         line_number,
                         heading_tag,
                         heading_text,
-                        f"Invalid aria-level '{aria_level}'. Must be between 1 and 6.",
-                        "ARIA12"
+                        HEADING_INVALID_ARIA_LEVEL,
+                        level=aria_level
                     )
                 case {"is_aria_heading": True, "is_empty": True}:
                     add_issue(
                         line_number,
                         heading_tag,
                         heading_text,
-                        "Heading with role='heading' is empty or not descriptive.",
-                        "2.4.6"
+                        HEADING_EMPTY
                     )
                 case {"hierarchy_skip": True}:
                     add_issue(
                         line_number,
                         heading_tag,
                         heading_text,
-                        f"Skipped heading levels from <h{prev_level}> to <h{current_level}>.",
-                        "1.3.1 (a)"
+                        HEADING_SKIPPED_LEVEL,
+                        previous=prev_level,
+                        current=current_level
                     )
 
             # Update previous level for hierarchy tracking
@@ -134,18 +123,18 @@ def check_heading_markup(html):
                 "N/A",
                 "N/A",
                 "N/A",
-                "No primary heading (e.g., <h1> or aria-level='1') found in the document.",
-                "1.3.1 (a)"
+                HEADING_NO_PRIMARY
             )
 
         # Calculate confidence score
-        confidence = calculate_heading_confidence(issues, len(headings))
+        confidence = calculate_heading_confidence(issues, outline.heading_candidates)
 
         return {
-            "status": "Malformed" if issues else "Passed",
+            "status": "Malformed" if issues.total else "Passed",
             "details": issues,
             "confidence": confidence,
-            "issue_count": len(issues)
+            "issue_count": issues.total,
+            **issues.limit_fields()
         }
 
     except Exception as e:
@@ -158,37 +147,91 @@ def check_heading_markup(html):
         }
 
 
-def calculate_heading_confidence(issues, total_headings):
+def check_heading_tree(tree, limits=None):
     """
-    Calculates confidence score for heading compliance.
+    Validates the headings of an accessibility snapshot: the roles and levels
+    the browser computed, as assistive technology sees them.
     """
-    baseline_confidence = 95.0
-    for issue in issues:
-        if "multiple <h1>" in issue.get('Issue', '').lower():
-            baseline_confidence -= 15
-        elif "missing aria-level" in issue.get('Issue', '').lower():
-            baseline_confidence -= 10
-        elif "skipped heading levels" in issue.get('Issue', '').lower():
-            baseline_confidence -= 5
-    if total_headings > 0:
-        baseline_confidence *= (1 - len(issues) / total_headings)
-    return max(baseline_confidence, 0)
+    try:
+        headings = [node for node in iter_nodes(tree) if node.get("role") == "heading"]
+        logging.info(f"Found {len(headings)} headings in the accessibility tree.")
+
+        if not headings:
+            return {
+                "status": "Not Applicable",
+                "details": [],
+                "confidence": 100.0,
+                "issue_count": 0,
+                "source": "accessibility_tree"
+            }
+
+        issues = IssueList(limits)
+        has_primary_heading = False
+        prev_level = 0
+        seen_texts = set()
+        for heading in headings:
+            heading_text = heading.get("name", "").strip()
+            level = heading.get("level")
+            valid_level = isinstance(level, int) and 1 <= level <= 6
+            heading_tag = f"h{level}" if valid_level else "heading"
+
+            if level == 1:
+                has_primary_heading = True
+
+            def add_issue(kind, **params):
+                issues.append(Issue(kind, kind.format(**params), line="N/A", tag=heading_tag, text=heading_text))
+
+            match {
+                "is_repetitive": heading_text in seen_texts,
+                "missing_level": level is None,
+                "invalid_level": not valid_level,
+                "is_empty": not heading_text,
+                "hierarchy_skip": valid_level and prev_level and level > prev_level + 1
+            }:
+                case {"is_repetitive": True}:
+                    add_issue(HEADING_REPETITIVE)
+                case {"missing_level": True}:
+                    add_issue(HEADING_MISSING_ARIA_LEVEL)
+                case {"invalid_level": True}:
+                    add_issue(HEADING_INVALID_ARIA_LEVEL, level=level)
+                case {"is_empty": True}:
+                    add_issue(HEADING_EMPTY)
+                case {"hierarchy_skip": True}:
+                    add_issue(HEADING_SKIPPED_LEVEL, previous=prev_level, current=level)
+
+            if valid_level:
+                prev_level = level
+            seen_texts.add(heading_text)
+
+        if not has_primary_heading:
+            issues.append(Issue(HEADING_NO_PRIMARY, line="N/A", tag="N/A", text="N/A"))
+
+        return {
+            "status": "Malformed" if issues.total else "Passed",
+            "details": issues,
+            "confidence": calculate_heading_confidence(issues, len(headings)),
+            "issue_count": issues.total,
+            "source": "accessibility_tree",
+            **issues.limit_fields()
+        }
+
+    except Exception as e:
+        logging.error(f"Error while checking headings in the accessibility tree: {e}")
+        return {
+            "status": "Error",
+            "details": [{"Issue": "An unexpected error occurred.", "Issue Code": "1.3.1 (a)"}],
+            "confidence": 50.0,
+            "issue_count": 1
+        }
 
 
 def calculate_heading_confidence(issues, total_headings):
     """
     Calculates confidence score for heading compliance.
     """
-    baseline_confidence = 95.0
-    for issue in issues:
-        if "multiple <h1>" in issue.get('Issue', '').lower():
-            baseline_confidence -= 15
-        elif "missing aria-level" in issue.get('Issue', '').lower():
-            baseline_confidence -= 10
-        elif "skipped heading levels" in issue.get('Issue', '').lower():
-            baseline_confidence -= 5
+    baseline_confidence = 95.0 - issues.weight
     if total_headings > 0:
-        baseline_confidence *= (1 - len(issues) / total_headings)
+        baseline_confidence *= (1 - issues.total / total_headings)
     return max(baseline_confidence, 0)
 
 def write_heading_info(file_path, heading_info, format="csv"):
@@ -205,9 +248,9 @@ def write_heading_info(file_path, heading_info, format="csv"):
                 writer.writerows(heading_info)
         elif format == "json":
             with open(file_path, 'w', encoding='utf-8') as jsonfile:
-                json.dump(heading_info, jsonfile, indent=4)
+                json.dump(heading_info, jsonfile, indent=4, default=jsonable)
         elif format == "excel":
-            df = pd.DataFrame(heading_info)
+            df = pd.DataFrame([dict(info) for info in heading_info])
             df.to_excel(file_path, index=False)
         else:
             raise ValueError("Unsupported file format.")
@@ -2,7 +2,19 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.outline import document_outline
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList,
+    LANDMARK_EMPTY, LANDMARK_NAV_WITHOUT_LINKS, LANDMARK_MAIN_TOO_SHORT, LANDMARK_HEADER_WITHOUT_HEADING,
+    LANDMARK_FOOTER_TOO_SHORT, LANDMARK_ASIDE_TOO_SHORT, LANDMARK_SECTION_TOO_SHORT,
+    LANDMARK_ARTICLE_TOO_SHORT, LANDMARK_FORM_WITHOUT_INPUTS, LANDMARK_FORM_UNLABELLED,
+    LANDMARK_PROCESSING_ERROR,
+)
+from checks.WCAG_1_3_1.sampling import ElementSample
+from checks.WCAG_1_3_1.accessibility_tree import (
+    INPUT_ROLES, LANDMARK_ROLE_TAGS, has_descendant, iter_nodes, node_label, subtree_text,
+)
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -48,58 +60,73 @@ def write_landmark_info(file_path, landmark_info, format="csv"):
 
 
 def check_empty_landmark(landmark_content):
-    """Checks if the landmark element is empty or lacks meaningful content."""
+    """Checks if the landmark element is empty or lacks meaningful content; returns an issue kind."""
     if not landmark_content.strip():
-        return "Landmark element is empty or has no meaningful content."
+        return LANDMARK_EMPTY
     return None
 
-def check_landmark_content(landmark):
-    """Validates the content of a landmark element based on its type."""
-    tag = landmark.name
-    content = landmark.get_text(strip=True)
+def check_landmark_content(document, landmark, content):
+    """Validates the content of a landmark element based on its type; returns an issue kind."""
+    tag = document.name(landmark)
 
     match tag:
-        case 'nav' if not landmark.find_all('a', href=True):
-            return "Landmark <nav> should contain navigation links."
+        case 'nav' if document.find(landmark, {'a'}, {'href': True}) is None:
+            return LANDMARK_NAV_WITHOUT_LINKS
         case 'main' if len(content.split()) < 20:
-            return "Landmark <main> should contain the primary content of the page."
-        case 'header' if not landmark.find(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            return "Landmark <header> should include a heading element (e.g., <h1>)."
+            return LANDMARK_MAIN_TOO_SHORT
+        case 'header' if not document_outline(document).contains_heading(document, landmark):
+            return LANDMARK_HEADER_WITHOUT_HEADING
         case 'footer' if len(content.split()) < 5:
-            return "Landmark <footer> should contain footer information."
+            return LANDMARK_FOOTER_TOO_SHORT
         case 'aside' if len(content.split()) < 10:
-            return "Landmark <aside> should have meaningful content."
+            return LANDMARK_ASIDE_TOO_SHORT
         case 'section' if len(content.split()) < 10:
-            return "Landmark <section> should have a meaningful amount of content."
+            return LANDMARK_SECTION_TOO_SHORT
         case 'article' if len(content.split()) < 50:
-            return "Landmark <article> should contain self-contained, detailed content."
-        case 'form' if not landmark.find(['input', 'textarea', 'select']):
-            return "Landmark <form> should include input elements."
-        case 'form' if not landmark.find_all('label') and not any(
-            inp.get('aria-label') for inp in landmark.find_all(['input', 'textarea', 'select'])
+            return LANDMARK_ARTICLE_TOO_SHORT
+        case 'form' if document.find(landmark, {'input', 'textarea', 'select'}) is None:
+            return LANDMARK_FORM_WITHOUT_INPUTS
+        case 'form' if document.find(landmark, {'label'}) is None and not any(
+            document.get(inp, 'aria-label') for inp in document.descendants(landmark, {'input', 'textarea', 'select'})
         ):
-            return "Landmark <form> should have labeled inputs using <label> elements or aria-label attributes."
+            return LANDMARK_FORM_UNLABELLED
+        case _:
+            return None
+
+def check_landmark_node(node):
+    """Validates a landmark of the accessibility tree the way check_landmark_content does its element."""
+    words = len(subtree_text(node).split())
+    inputs = [descendant for descendant in iter_nodes(node) if descendant.get("role") in INPUT_ROLES]
+
+    match node.get("role"):
+        case 'navigation' if not has_descendant(node, {'link'}):
+            return LANDMARK_NAV_WITHOUT_LINKS
+        case 'main' if words < 20:
+            return LANDMARK_MAIN_TOO_SHORT
+        case 'banner' if not has_descendant(node, {'heading'}):
+            return LANDMARK_HEADER_WITHOUT_HEADING
+        case 'contentinfo' if words < 5:
+            return LANDMARK_FOOTER_TOO_SHORT
+        case 'complementary' if words < 10:
+            return LANDMARK_ASIDE_TOO_SHORT
+        case 'region' if words < 10:
+            return LANDMARK_SECTION_TOO_SHORT
+        case 'article' if words < 50:
+            return LANDMARK_ARTICLE_TOO_SHORT
+        case 'form' if not inputs:
+            return LANDMARK_FORM_WITHOUT_INPUTS
+        case 'form' if any(not control.get("name") for control in inputs):
+            return LANDMARK_FORM_UNLABELLED
         case _:
             return None
 
 def calculate_landmark_confidence(landmark_issues, total_landmarks):
     """Calculates confidence for landmark compliance."""
-    baseline_confidence = 100.0
-    weight_map = {
-        "empty": 20,
-        "should contain": 10,
-    }
-
-    for issue in landmark_issues:
-        # Extract the issue text if it's a dictionary
-        issue_text = issue if isinstance(issue, str) else issue.get("Issue", "")
-        for key, weight in weight_map.items():
-            if key in issue_text.lower():
-                baseline_confidence -= weight
+    baseline_confidence = 100.0 - landmark_issues.weight
 
     # Adjust confidence by issue density
     if total_landmarks > 0:
-        confidence_penalty = (len(landmark_issues) / total_landmarks) * 10  # Proportional penalty
+        confidence_penalty = (landmark_issues.total / total_landmarks) * 10  # Proportional penalty
         baseline_confidence -= confidence_penalty
 
     return max(baseline_confidence, 0)
@@ -118,11 +145,19 @@ def generate_suggestion(issue, tag):
     return "Review and correct the landmark element."
 
 
-def test_landmark_markup(html):
-    """Tests for proper usage of landmark elements in the HTML."""
+def test_landmark_markup(html, limits=None, sampling=None, accessibility_tree=None, document=None):
+    """
+    Tests for proper usage of landmark elements in the HTML; `limits` caps recorded issues
+    and `sampling` validates a stratified sample of the landmarks on very large pages.
+    Given the page's accessibility snapshot, the landmarks are read from it instead of the HTML;
+    given its Document (e.g. from a DOM snapshot), the HTML is not parsed.
+    """
+    if accessibility_tree is not None:
+        return test_landmark_tree(accessibility_tree, limits)
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        landmarks = soup.find_all(['header', 'nav', 'main', 'footer', 'section', 'aside', 'article', 'form', 'hgroup'])
+        if document is None:
+            document = Document.from_html(html)
+        landmarks = [region.node for region in document_outline(document).regions]
         logging.info(f"Found {len(landmarks)} landmark elements.")
 
         if not landmarks:
@@ -134,41 +169,46 @@ def test_landmark_markup(html):
                 "issue_count": 1
             }
 
-        issues = []
+        issues = IssueList(limits)
+        sample = ElementSample(landmarks, sampling, key=document.name)
 
-        for index, landmark in enumerate(landmarks):
+        for index, landmark in sample:
+            if issues.settled(100.0):
+                logging.info(f"Landmark verdict settled after {index} elements; stopping early.")
+                break
             try:
-                content = landmark.get_text(strip=True)
-                html_snippet = str(landmark)[:100]
-                line_number = getattr(landmark, "sourceline", "Unknown")
+                content = document.get_text(landmark, strip=True)
+                html_snippet = document.decode(landmark, 100)
+                line_number = document.line(landmark, "Unknown")
 
                 # Check for issues
                 landmark_issues = []
                 if (empty_issue := check_empty_landmark(content)):
-                    landmark_issues.append({"Issue": empty_issue})
-                if (content_issue := check_landmark_content(landmark)):
-                    landmark_issues.append({"Issue": content_issue})
-
-                for issue in landmark_issues:
-                    issues.append({
-                        "Line Number": line_number,
-                        "Landmark Tag": landmark.name if landmark.name else "Unknown",
-                        "HTML Snippet": html_snippet,
-                        "Issue": issue["Issue"],
-                        "Issue Code": "1.3.1 (e)"
-                    })
+                    landmark_issues.append(empty_issue)
+                if (content_issue := check_landmark_content(document, landmark, content)):
+                    landmark_issues.append(content_issue)
+                sample.record(landmark, landmark_issues)
+
+                for kind in landmark_issues:
+                    issues.append(Issue(
+                        kind,
+                        line=line_number,
+                        tag=document.name(landmark) or "Unknown",
+                        snippet=html_snippet
+                    ))
 
             except Exception as e:
                 logging.error(f"Error processing landmark at index {index}: {e}")
-                issues.append({
-                    "Line Number": "Unknown",
-                    "Landmark Tag": "Unknown",
-                    "HTML Snippet": str(landmark)[:100],
-                    "Issue": f"Error processing landmark: {str(e)}",
-                    "Issue Code": "1.3.1 (e)"
-                })
-
-        if not issues:
+                sample.record(landmark, [LANDMARK_PROCESSING_ERROR])
+                issues.append(Issue(
+                    LANDMARK_PROCESSING_ERROR,
+                    LANDMARK_PROCESSING_ERROR.format(error=e),
+                    line="Unknown",
+                    tag="Unknown",
+                    snippet=document.decode(landmark, 100)
+                ))
+
+        if not issues.total:
             logging.info("No issues detected for landmark markup.")
             return {
                 "status": "Passed",
@@ -177,12 +217,20 @@ def test_landmark_markup(html):
                 "issue_count": 0
             }
 
-        confidence = calculate_landmark_confidence(issues, len(landmarks))
+        sample_fields = {}
+        if sample.active:
+            confidence, sample_fields = sample.extrapolate(
+                issues, lambda totals: calculate_landmark_confidence(totals, len(landmarks))
+            )
+        else:
+            confidence = calculate_landmark_confidence(issues, len(landmarks))
         result = {
             "status": "Malformed",
             "details": issues,
             "confidence": confidence,
-            "issue_count": len(issues)
+            "issue_count": issues.total,
+            **issues.limit_fields(),
+            **sample_fields
         }
         logging.debug(f"Landmark test result: {result}")
         return result
@@ -195,3 +243,63 @@ def test_landmark_markup(html):
             "confidence": 50.0,
             "issue_count": 1
         }
+
+
+def test_landmark_tree(tree, limits=None):
+    """Tests the landmarks of an accessibility snapshot, as assistive technology exposes them."""
+    try:
+        landmarks = [node for node in iter_nodes(tree) if node.get("role") in LANDMARK_ROLE_TAGS]
+        logging.info(f"Found {len(landmarks)} landmarks in the accessibility tree.")
+
+        if not landmarks:
+            return {
+                "status": "Not Applicable",
+                "details": [{"Issue": "No landmark elements found in the document.", "Issue Code": "1.3.1 (e)"}],
+                "confidence": 100.0,
+                "issue_count": 1,
+                "source": "accessibility_tree"
+            }
+
+        issues = IssueList(limits)
+        for landmark in landmarks:
+            if issues.settled(100.0):
+                break
+            landmark_issues = []
+            if (empty_issue := check_empty_landmark(subtree_text(landmark))):
+                landmark_issues.append(empty_issue)
+            if (content_issue := check_landmark_node(landmark)):
+                landmark_issues.append(content_issue)
+            for kind in landmark_issues:
+                issues.append(Issue(
+                    kind,
+                    line="N/A",
+                    tag=LANDMARK_ROLE_TAGS[landmark["role"]],
+                    snippet=node_label(landmark)
+                ))
+
+        if not issues.total:
+            return {
+                "status": "Passed",
+                "details": [{"Issue": "All landmark elements are valid.", "Issue Code": "1.3.1 (e)"}],
+                "confidence": 100.0,
+                "issue_count": 0,
+                "source": "accessibility_tree"
+            }
+
+        return {
+            "status": "Malformed",
+            "details": issues,
+            "confidence": calculate_landmark_confidence(issues, len(landmarks)),
+            "issue_count": issues.total,
+            "source": "accessibility_tree",
+            **issues.limit_fields()
+        }
+
+    except Exception as e:
+        logging.error(f"Unexpected error in landmark tree test: {e}")
+        return {
+            "status": "Error",
+            "details": [{"Issue": f"Unexpected error occurred: {e}", "Issue Code": "1.3.1 (e)"}],
+            "confidence": 50.0,
+            "issue_count": 1
+        }
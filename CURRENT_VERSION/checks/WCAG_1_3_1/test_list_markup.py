@@ -2,7 +2,12 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList, jsonable,
+    LIST_MALFORMED, LIST_MISSING_ROLE, LIST_ARIA_MALFORMED, LIST_BAD_NESTING, LIST_ORPHANED_ITEMS,
+)
+from checks.WCAG_1_3_1.sampling import ElementSample
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -27,10 +32,10 @@ def write_list_info(file_path, list_info, format="csv"):
 
     def write_json():
         with open(file_path, 'w', encoding='utf-8') as jsonfile:
-            json.dump(list_info, jsonfile, indent=4)
+            json.dump(list_info, jsonfile, indent=4, default=jsonable)
 
     def write_excel():
-        df = pd.DataFrame(list_info)
+        df = pd.DataFrame([dict(lst) for lst in list_info])
         df.to_excel(file_path, index=False)
 
     format_dispatch = {
@@ -51,112 +56,107 @@ def write_list_info(file_path, list_info, format="csv"):
         return False
 
 # Validation Functions
-def validate_list_element(lst):
-    """Validates a list element for proper structure and semantics."""
-    match lst.name:
+def validate_list_element(document, lst):
+    """Validates a list element for proper structure and semantics; returns an issue kind."""
+    match document.name(lst):
         case 'ul' | 'ol':
             # Standard list: Ensure it contains <li> elements
-            if not lst.find_all('li', recursive=False):
-                return "List is malformed: no direct <li> elements found."
+            if next(document.children(lst, {'li'}), None) is None:
+                return LIST_MALFORMED
         case _:
             # Non-standard list container must use role="list"
-            if lst.get('role') != 'list':
-                return "Non-standard list container is missing role='list' for accessibility."
-            if not lst.find_all('li', recursive=False):
-                return "ARIA list is malformed: no <li> elements found."
+            if document.get(lst, 'role') != 'list':
+                return LIST_MISSING_ROLE
+            if next(document.children(lst, {'li'}), None) is None:
+                return LIST_ARIA_MALFORMED
     return None
 
-def validate_list_nesting(lst):
-    """Checks for improper nesting of lists."""
-    nested_lists = lst.find_all(['ul', 'ol'], recursive=False)
-    for nested in nested_lists:
-        if nested.find_parent(['ul', 'ol']) != lst:
-            return "Nested list is not properly contained within its parent list item."
+def validate_list_nesting(document, lst):
+    """Checks for improper nesting of lists; returns an issue kind."""
+    for nested in document.children(lst, {'ul', 'ol'}):
+        if document.find_parent(nested, {'ul', 'ol'}) != lst:
+            return LIST_BAD_NESTING
     return None
 
-def validate_orphan_list_items(soup):
-    """Checks for orphaned <li> elements outside a list container."""
-    orphaned_items = [
-        str(li) for li in soup.find_all('li') if not li.find_parent(['ul', 'ol'])
-    ]
-    if orphaned_items:
-        return f"Orphaned <li> elements found: {len(orphaned_items)} outside of <ul> or <ol>."
+def validate_orphan_list_items(document):
+    """Checks for orphaned <li> elements outside a list container; returns the message."""
+    orphaned_count = sum(
+        1 for li in document.descendants(0, {'li'}) if document.find_parent(li, {'ul', 'ol'}) is None
+    )
+    if orphaned_count:
+        return LIST_ORPHANED_ITEMS.format(count=orphaned_count)
     return None
 
 # Confidence Calculation
 def calculate_list_confidence(issues, total_lists):
     """Calculates confidence for the list test."""
-    baseline_confidence = 100.0
-    weight_map = {
-        "malformed": 20,
-        "nested": 15,
-        "orphaned": 10,
-    }
-    for issue in issues:
-        for key, weight in weight_map.items():
-            if key in issue['Issue'].lower():
-                baseline_confidence -= weight
-    return max(baseline_confidence - (len(issues) / total_lists) * 20, 0)
+    baseline_confidence = 100.0 - issues.weight
+    return max(baseline_confidence - (issues.total / total_lists) * 20, 0)
 
 # Main Function
-def test_list_markup(html):
-    """Tests for proper usage of list markup (ul, ol, li) in the HTML."""
-    soup = BeautifulSoup(html, 'html.parser')
-    lists = soup.find_all(['ul', 'ol', 'div', 'section'])
+def test_list_markup(html, limits=None, sampling=None, document=None):
+    """
+    Tests for proper usage of list markup (ul, ol, li) in the HTML; `limits` caps recorded issues
+    and `sampling` validates a stratified sample of the candidate lists on very large pages.
+    Given the page's Document (e.g. from a DOM snapshot), the HTML is not parsed.
+    """
+    if document is None:
+        document = Document.from_html(html)
+    lists = document.find_all({'ul', 'ol', 'div', 'section'})
     logging.info(f"Found {len(lists)} potential list elements.")
 
     if not lists:
         logging.warning("No lists found. Markup not applicable.")
         return {"status": "Not Applicable", "details": [], "confidence": 100.0}
 
-    issues = []
+    issues = IssueList(limits)
     total_lists = len(lists)
 
     # Check for orphaned <li> elements
-    orphan_issue = validate_orphan_list_items(soup)
+    orphan_issue = validate_orphan_list_items(document)
     if orphan_issue:
-        issues.append({
-            "List Index": "N/A",
-            "List HTML": "N/A",
-            "Issue": orphan_issue,
-            "Issue Code": "1.3.1 (b)"
-        })
+        issues.append(Issue(LIST_ORPHANED_ITEMS, orphan_issue, index="N/A", snippet="N/A"))
         logging.warning(orphan_issue)
 
-    # Validate each list element
-    for index, lst in enumerate(lists):
+    # Validate each list element (or a sample of them)
+    sample = ElementSample(lists, sampling, key=document.name)
+    for index, lst in sample:
+        if issues.settled(100.0):
+            logging.info(f"List verdict settled after {index} elements; stopping early.")
+            break
+
         # Validate the list structure
-        list_issue = validate_list_element(lst)
+        list_issue = validate_list_element(document, lst)
         if list_issue:
-            issues.append({
-                "List Index": index + 1,
-                "List HTML": str(lst),
-                "Issue": list_issue,
-                "Issue Code": "1.3.1 (b)"
-            })
-            logging.warning(f"List {index + 1} issue: {list_issue}")
+            issues.append(Issue(list_issue, index=index + 1, snippet=document.decode(lst)))
+            logging.warning(f"List {index + 1} issue: {list_issue.message}")
 
         # Validate nested lists
-        nesting_issue = validate_list_nesting(lst)
+        nesting_issue = validate_list_nesting(document, lst)
         if nesting_issue:
-            issues.append({
-                "List Index": index + 1,
-                "List HTML": str(lst),
-                "Issue": nesting_issue,
-                "Issue Code": "1.3.1 (b)"
-            })
-            logging.warning(f"List {index + 1} issue: {nesting_issue}")
+            issues.append(Issue(nesting_issue, index=index + 1, snippet=document.decode(lst)))
+            logging.warning(f"List {index + 1} issue: {nesting_issue.message}")
+
+        sample.record(lst, [kind for kind in (list_issue, nesting_issue) if kind])
 
     # Calculate overall confidence
-    confidence = calculate_list_confidence(issues, total_lists)
+    sample_fields = {}
+    if sample.active:
+        confidence, sample_fields = sample.extrapolate(
+            issues, lambda totals: calculate_list_confidence(totals, total_lists)
+        )
+    else:
+        confidence = calculate_list_confidence(issues, total_lists)
 
     # Attach confidence to each issue
     for issue in issues:
-        issue["Confidence Percentage"] = confidence
+        issue.confidence = confidence
 
     # Return structured results
     return {
-        "status": "Malformed" if issues else "Passed",
+        "status": "Malformed" if issues.total else "Passed",
         "details": issues,
-        "confidence": confidence
+        "confidence": confidence,
+        **issues.limit_fields(),
+        **sample_fields
     }
@@ -2,7 +2,14 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.outline import document_outline
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList, jsonable,
+    STRUCTURAL_EMPTY, STRUCTURAL_SECTION_TOO_SHORT, STRUCTURAL_ARTICLE_TOO_SHORT, STRUCTURAL_DIV_TOO_SHORT,
+    STRUCTURAL_MISSING_ROLE, STRUCTURAL_MISSING_REGION, STRUCTURAL_MISSING_LANDMARK,
+)
+from checks.WCAG_1_3_1.sampling import ElementSample
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -27,7 +34,7 @@ def write_structural_info(file_path, structural_info, format="csv"):
 
     def write_json():
         with open(file_path, 'w', encoding='utf-8') as jsonfile:
-            json.dump(structural_info, jsonfile, indent=4)
+            json.dump(structural_info, jsonfile, indent=4, default=jsonable)
 
     def write_excel():
         rows = [
@@ -61,133 +68,127 @@ def write_structural_info(file_path, structural_info, format="csv"):
         logging.error(f"Error writing structural info to {file_path}: {e}")
         return False
 
-def validate_structural_element(tag, content, structural):
-    """Validates structural elements for empty content, ARIA roles, and proper usage."""
+def validate_structural_element(tag, content, document, structural):
+    """Validates structural elements for empty content, ARIA roles, and proper usage; returns issue kinds."""
     issues = []
 
     # Check if structural element is empty
-    if not content and not structural.find_all(recursive=False):
-        issues.append("Structural element is empty or lacks meaningful content.")
+    if not content and next(document.children(structural), None) is None:
+        issues.append(STRUCTURAL_EMPTY)
 
     # Check for purpose-specific validation
     match tag:
         case 'section' if len(content.split()) < 10:
-            issues.append("Section should contain a meaningful amount of content.")
+            issues.append(STRUCTURAL_SECTION_TOO_SHORT)
         case 'article' if len(content.split()) < 50:
-            issues.append("Article should contain self-contained, detailed content.")
+            issues.append(STRUCTURAL_ARTICLE_TOO_SHORT)
         case 'div' if len(content.split()) < 5:
-            issues.append("Div should not be used solely for structural purposes without meaningful content.")
+            issues.append(STRUCTURAL_DIV_TOO_SHORT)
 
     # Check for ARIA roles in structural elements
-    if tag in ['div', 'section'] and not structural.get('role'):
-        issues.append("Structural element is missing an ARIA role for accessibility.")
+    if tag in ['div', 'section'] and not document.get(structural, 'role'):
+        issues.append(STRUCTURAL_MISSING_ROLE)
 
     return issues
 
-def validate_missing_regions(soup):
+def validate_missing_regions(document):
     """Checks for missing important page regions."""
+    outline = document_outline(document)
     missing_regions = []
     required_regions = {'header': 'Header', 'nav': 'Navigation', 'main': 'Main Content', 'footer': 'Footer', 'aside': 'Aside'}
 
     for tag, region_name in required_regions.items():
-        if not soup.find(tag):
-            missing_regions.append(f"Missing {region_name} region (<{tag}> tag).")
+        if not outline.has_region(tag):
+            missing_regions.append(STRUCTURAL_MISSING_REGION.format(name=region_name, tag=tag))
 
     return missing_regions
 
-def validate_missing_landmarks(soup):
+def validate_missing_landmarks(document):
     """Checks for missing ARIA landmarks."""
     required_landmarks = {'banner': 'Banner', 'navigation': 'Navigation', 'main': 'Main Content', 'contentinfo': 'Content Info'}
+    outline = document_outline(document)
     missing_landmarks = []
 
     for role, landmark_name in required_landmarks.items():
-        if not soup.find(attrs={'role': role}):
-            missing_landmarks.append(f"Missing {landmark_name} landmark (role='{role}').")
+        if not outline.has_role(role):
+            missing_landmarks.append(STRUCTURAL_MISSING_LANDMARK.format(name=landmark_name, role=role))
 
     return missing_landmarks
 
 def calculate_structural_confidence(issues, total_structures):
     """Calculates confidence for the structural markup test."""
-    baseline_confidence = 100.0
-    severity_map = {
-        "empty or lacks meaningful content": 15,
-        "missing an aria role": 10,
-        "should contain meaningful content": 20,
-        "missing region": 15,
-        "missing landmark": 10
-    }
-
-    for issue in issues:
-        # Extract the issue text if it's a dictionary
-        issue_text = issue if isinstance(issue, str) else issue.get("Issue", "")
-        for key, weight in severity_map.items():
-            if key in issue_text.lower():
-                baseline_confidence -= weight
+    baseline_confidence = 100.0 - issues.weight
 
     if total_structures > 0:
-        confidence_penalty = (len(issues) / total_structures) * 30  # Additional penalty for proportion of issues
+        confidence_penalty = (issues.total / total_structures) * 30  # Additional penalty for proportion of issues
         baseline_confidence -= confidence_penalty
 
     return max(baseline_confidence, 0)
 
 
-def test_structural_markup(html):
-    """Tests for proper usage of structural elements in the HTML."""
+def test_structural_markup(html, limits=None, sampling=None, document=None):
+    """
+    Tests for proper usage of structural elements in the HTML; `limits` caps recorded issues
+    and `sampling` validates a stratified sample of the elements on very large pages.
+    Given the page's Document (e.g. from a DOM snapshot), the HTML is not parsed.
+    """
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        structural_elements = soup.find_all(['article', 'section', 'div'])
+        if document is None:
+            document = Document.from_html(html)
+        structural_elements = document.find_all({'article', 'section', 'div'})
         logging.info(f"Found {len(structural_elements)} structural elements.")
 
-        issues = []
+        issues = IssueList(limits)
+        sample = ElementSample(structural_elements, sampling, key=document.name)
 
-        for index, element in enumerate(structural_elements):
+        for index, element in sample:
+            if issues.settled(100.0):
+                logging.info(f"Structural verdict settled after {index} elements; stopping early.")
+                break
             try:
-                tag = element.name
-                content = element.get_text(strip=True)
-                html_snippet = str(element)[:100]
-                line_number = getattr(element, "sourceline", "Unknown")
+                tag = document.name(element)
+                content = document.get_text(element, strip=True)
+                html_snippet = document.decode(element, 100)
+                line_number = document.line(element, "Unknown")
 
                 # Check for issues
-                element_issues = validate_structural_element(tag, content, element)
+                element_issues = validate_structural_element(tag, content, document, element)
+                sample.record(element, element_issues)
 
                 if element_issues:
-                    for issue in element_issues:
-                        issues.append({
-                            "Line Number": line_number,
-                            "Structural Tag": tag,
-                            "HTML Snippet": html_snippet,
-                            "Issue": issue,
-                            "Issue Code": "1.3.1 (f)"
-                        })
+                    for kind in element_issues:
+                        issues.append(Issue(kind, line=line_number, tag=tag, snippet=html_snippet))
 
             except Exception as e:
                 logging.error(f"Error processing structural element at index {index}: {e}")
 
         # Additional validations for regions and landmarks
-        for validation_func, tag_name in [
-            (validate_missing_regions, "Region"),
-            (validate_missing_landmarks, "Landmark")
+        for validation_func, tag_name, kind in [
+            (validate_missing_regions, "Region", STRUCTURAL_MISSING_REGION),
+            (validate_missing_landmarks, "Landmark", STRUCTURAL_MISSING_LANDMARK)
         ]:
             try:
-                missing_issues = validation_func(soup)
+                missing_issues = validation_func(document)
                 for issue in missing_issues:
-                    issues.append({
-                        "Line Number": "N/A",
-                        "Structural Tag": tag_name,
-                        "HTML Snippet": "N/A",
-                        "Issue": issue,
-                        "Issue Code": "1.3.1 (f)"
-                    })
+                    issues.append(Issue(kind, issue, line="N/A", tag=tag_name, snippet="N/A"))
             except Exception as e:
                 logging.error(f"Error validating {tag_name}: {e}")
 
         logging.debug(f"Collected issues: {issues}")
-        confidence = calculate_structural_confidence(issues, len(structural_elements))
+        sample_fields = {}
+        if sample.active:
+            confidence, sample_fields = sample.extrapolate(
+                issues, lambda totals: calculate_structural_confidence(totals, len(structural_elements))
+            )
+        else:
+            confidence = calculate_structural_confidence(issues, len(structural_elements))
         result = {
-            "status": "Malformed" if issues else "Passed",
+            "status": "Malformed" if issues.total else "Passed",
             "details": issues,
             "confidence": confidence,
-            "issue_count": len(issues)
+            "issue_count": issues.total,
+            **issues.limit_fields(),
+            **sample_fields
         }
         logging.debug(f"Test Result for Structural Markup: {result}")
         return result
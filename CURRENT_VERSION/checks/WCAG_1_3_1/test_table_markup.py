@@ -2,7 +2,14 @@ import logging
 import csv
 import json
 import pandas as pd
-from bs4 import BeautifulSoup
+import sys
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.prefilter import may_contain
+from checks.WCAG_1_3_1.tables import analyze_tables
+from checks.WCAG_1_3_1.issues import (
+    Issue, IssueList, jsonable,
+    TABLE_MISSING_HEADERS, TABLE_HEADER_NOT_ASSOCIATED, TABLE_MISSING_ROWS, TABLE_MISSING_ROLE, TABLE_LAYOUT,
+)
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -25,7 +32,7 @@ def write_table_info(file_path, table_info, format="csv"):
 
     def write_json():
         with open(file_path, 'w', encoding='utf-8') as jsonfile:
-            json.dump(table_info, jsonfile, indent=4)
+            json.dump(table_info, jsonfile, indent=4, default=jsonable)
 
     def write_excel():
         rows = [
@@ -58,32 +65,30 @@ def write_table_info(file_path, table_info, format="csv"):
         return False
 
 # Validation Functions
-def validate_headers(table):
+def validate_headers(document, table):
     """Ensures the table has <th> headers and appropriate attributes."""
-    headers = table.find_all('th')
-    if not headers:
-        return "Table is missing <th> header cells."
-    for header in headers:
-        if not header.get('scope') and not header.get('id'):
-            return "Header cell is missing 'scope' or 'id' for association."
+    if not table.headers:
+        return TABLE_MISSING_HEADERS
+    if table.unassociated_headers(document):
+        return TABLE_HEADER_NOT_ASSOCIATED
     return None
 
-def validate_rows(table):
+def validate_rows(document, table):
     """Checks if the table contains rows (<tr>)."""
-    if not table.find_all('tr'):
-        return "Table is missing <tr> row elements."
+    if not table.rows:
+        return TABLE_MISSING_ROWS
     return None
 
-def validate_aria_role(table):
+def validate_aria_role(document, table):
     """Validates the presence of ARIA roles or summary for accessibility."""
-    if not table.get('role') and not table.get('summary'):
-        return "Table is missing an ARIA role or a summary attribute."
+    if not document.get(table.node, 'role') and not document.get(table.node, 'summary'):
+        return TABLE_MISSING_ROLE
     return None
 
-def validate_layout_table(table):
+def validate_layout_table(document, table):
     """Detects if the table is improperly used for layout purposes."""
-    if not table.find_all('th') and len(table.find_all('tr')) <= 2:
-        return "Table appears to be used for layout purposes."
+    if not table.headers and table.rows <= 2:
+        return TABLE_LAYOUT
     return None
 
 def calculate_table_confidence(num_issues, num_checks):
@@ -93,46 +98,58 @@ def calculate_table_confidence(num_issues, num_checks):
     return max(baseline_confidence - confidence_penalty, 0)
 
 # Main Function
-def test_table_markup(html):
-    """Tests for proper usage of table markup (table, th, tr, td) in the HTML."""
-    soup = BeautifulSoup(html, 'html.parser')
-    tables = soup.find_all('table')
+def test_table_markup(html, limits=None, document=None):
+    """
+    Tests for proper usage of table markup (table, th, tr, td) in the HTML; `limits` caps recorded issues.
+    Given the page's Document (e.g. from a DOM snapshot), the HTML is not parsed;
+    neither is HTML without a <table> tag.
+    """
+    if document is None and not may_contain(html, ('table',)):
+        tables = []
+    else:
+        if document is None:
+            document = Document.from_html(html)
+        # Each table's rows and headers, found once; nested tables are separate tables
+        tables = analyze_tables(document)
     logging.info(f"Found {len(tables)} table elements.")
 
     if not tables:
         logging.warning("No tables found. Markup not applicable.")
         return {"status": "Not Applicable", "details": [], "confidence": 100.0}
 
-    issues = []
+    issues = IssueList(limits)
     total_tables = len(tables)
 
     for index, table in enumerate(tables):
         table_issues = [
             validation_issue
             for validation_issue in [
-                validate_headers(table),
-                validate_rows(table),
-                validate_aria_role(table),
-                validate_layout_table(table)
+                validate_headers(document, table),
+                validate_rows(document, table),
+                validate_aria_role(document, table),
+                validate_layout_table(document, table)
             ]
             if validation_issue is not None
         ]
 
         if table_issues:
-            issues.append({
-                "Table Index": index + 1,
-                "Table HTML": str(table),
-                "Issue": " ".join(table_issues),
-                "Confidence Percentage": calculate_table_confidence(len(table_issues), 4)
-            })
+            # One record per table, keyed by its first problem
+            issues.append(Issue(
+                table_issues[0],
+                sys.intern(" ".join(kind.message for kind in table_issues)),
+                index=index + 1,
+                snippet=document.decode(table.node),
+                confidence=calculate_table_confidence(len(table_issues), 4)
+            ))
             for issue in table_issues:
-                logging.warning(f"Table {index + 1} issue: {issue}")
+                logging.warning(f"Table {index + 1} issue: {issue.message}")
 
     # Calculate overall confidence
-    overall_confidence = calculate_table_confidence(len(issues), total_tables)
+    overall_confidence = calculate_table_confidence(issues.total, total_tables)
 
     return {
-        "status": "Malformed" if issues else "Passed",
+        "status": "Malformed" if issues.total else "Passed",
         "details": issues,
-        "confidence": overall_confidence
+        "confidence": overall_confidence,
+        **issues.limit_fields()
     }
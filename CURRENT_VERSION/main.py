@@ -1,170 +1,595 @@
 import os
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import re
+import time
+import socket
+import argparse
+import contextlib
 import asyncio
+import itertools
+from functools import partial
 from openpyxl import Workbook
 from playwright.async_api import async_playwright
 from datetime import datetime
-from checks.WCAG_1_3_1.test_blockquote_markup import test_blockquote_markup
-from checks.WCAG_1_3_1.test_form_markup import test_form_markup
-from checks.WCAG_1_3_1.test_heading_markup import check_heading_markup
-from checks.WCAG_1_3_1.test_landmark_markup import test_landmark_markup
-from checks.WCAG_1_3_1.test_list_markup import test_list_markup
-from checks.WCAG_1_3_1.test_structural_markup import test_structural_markup
-from checks.WCAG_1_3_1.test_table_markup import test_table_markup
-
-
-def create_results_workbook():
+from utils.aggregate import append_batch_records, write_site_summary
+from utils.html_batch import audit_html_files
+from utils.incremental import run_checks_incrementally
+from utils.isolation import WorkerTimeout, run_in_killable_worker
+from utils.memory import MB, MEMORY_HEADERS, MemoryMonitor, memory_row
+from utils.page_capture import capture_inputs
+from utils.web_archive import audit_archive
+from utils.pipeline import TEST_NAMES, load_tests, run_checks
+from utils.profiling import PROFILE_HEADERS, CheckProfiler, load_profile_summary, profile_rows
+from utils.sharding import iter_urls, merge_shard_results, parse_shard, shard_results_file
+from utils.snippet_store import SnippetStore, snippet_store_path
+from utils.work_queue import DONE, FAILED, LeaseKeeper, open_queue
+from checks.WCAG_1_3_1.issues import IssueLimits
+from checks.WCAG_1_3_1.sampling import Sampling
+from checks.WCAG_1_3_1.registry import select_checks
+
+# Summary sheet columns (status, confidence, details) for each test
+SUMMARY_HEADERS = {
+    "Heading Markup": ["Heading markup", "Heading Confidence", "Heading Details"],
+    "List Markup": ["List markup", "List Confidence", "List Details"],
+    "Table Markup": ["Table markup", "Table Confidence", "Table Details"],
+    "Blockquote Markup": ["Block-quote markup", "Block-quote Confidence", "Block-quote Details"],
+    "Landmark Markup": ["Landmarks", "Landmark Confidence", "Landmark Details"],
+    "Structural Markup": ["Structural markup", "Structural Confidence", "Structural Details"],
+    "Form Markup": ["Forms", "Form Confidence", "Form Details"],
+}
+
+
+def create_results_workbook(test_names=TEST_NAMES):
     """Initialize an Excel workbook with the desired column format."""
     workbook = Workbook()
     summary_sheet = workbook.active
     summary_sheet.title = "Summary"
-    # Column headers: URL, status, confidence score, and details for each WCAG test
-    summary_sheet.append([
-        "Tested URL",
-        "Heading markup", "Heading Confidence", "Heading Details",
-        "List markup", "List Confidence", "List Details",
-        "Table markup", "Table Confidence", "Table Details",
-        "Block-quote markup", "Block-quote Confidence", "Block-quote Details",
-        "Landmarks", "Landmark Confidence", "Landmark Details",
-        "Structural markup", "Structural Confidence", "Structural Details",
-        "Forms", "Form Confidence", "Form Details",
-    ])
+    # Column headers: URL, status, confidence score, and details for each selected WCAG test
+    summary_sheet.append(["Tested URL"] + [header for name in test_names for header in SUMMARY_HEADERS[name]])
+    # URLs stopped by the hard timeout and the phase they stalled in
+    timeouts_sheet = workbook.create_sheet("Timeouts")
+    timeouts_sheet.append(["Tested URL", "Stalled Phase", "Timeout (s)"])
     return workbook
 
 
-async def fetch_html_content(url):
-    """Fetch HTML content from the given URL."""
+async def fetch_html_content(url, capture=()):
+    """Fetch HTML content from the given URL, with the page inputs named in `capture`."""
     try:
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
             await page.goto(url)
             content = await page.content()
+            inputs = await capture_inputs(page, capture)
             await browser.close()
-            return content
+            return content, inputs
     except Exception as e:
         raise RuntimeError(f"Error fetching HTML content for {url}: {e}")
 
 
-def process_url(url, workbook, results_file):
-    """Process a single URL and log detailed issues into Excel."""
-    try:
-        html_content = asyncio.run(fetch_html_content(url))
+# Mapping for formatting details based on test name
+FORMAT_DETAILS = {
+    "Table Markup": lambda details: "\n".join(
+        f"Table Index: {detail.get('Table Index', 'N/A')}, "
+        f"Issue: {detail.get('Issue', 'N/A')}, "
+        f"Code: {detail.get('Issue Code', 'N/A')}, "
+        f"Confidence: {detail.get('Confidence Percentage', 'N/A')}%, "
+        f"HTML: {detail.get('Table HTML', 'N/A')}"
+        for detail in details
+    ),
+    # Other formatters for different tests go here
+}
+
+
+def build_summary_row(url, results, test_names=TEST_NAMES, snippets=None):
+    """
+    Build the summary sheet row for one page from its test results; given a
+    SnippetStore, the details quote their HTML snippets by reference.
+    """
+    row = [url]  # Initialize row with the URL
+
+    for test_name in test_names:
+        try:
+            result = results[test_name]
+
+            # Extract and append the test status
+            test_status = result.get("status", "N/A")
+            row.append(test_status)
+
+            # Extract and append the overall confidence score
+            overall_confidence = result.get("confidence", 100.0)
+            row.append(f"{overall_confidence:.2f}%")
+
+            # Extract and append formatted details
+            details = result.get("details", [])
+            if snippets is not None and details:
+                details = snippets.reference(details)
+            if test_status == "Timeout":
+                issue_text = details[0]["Issue"]
+            elif details:
+                issue_text = FORMAT_DETAILS.get(test_name, lambda x: "No formatter available")(details)
+            else:
+                issue_text = "No issues found"
+            # Capped or early-stopped results say how much was left out
+            if "issues_shown" in result:
+                issue_text += f"\n{result['issues_shown']} shown of {result['issue_count']} issues"
+                if result.get("early_exit"):
+                    issue_text += " (scan stopped once the verdict was settled)"
+            if "sample" in result:
+                sample = result["sample"]
+                low, high = result["confidence_interval"]
+                issue_text += (
+                    f"\nSampled {sample['sampled']} of {sample['elements']} elements: "
+                    f"~{sample['estimated_issue_count']} issues, confidence {low:.2f}-{high:.2f}%"
+                )
+            row.append(issue_text)
+
+        except Exception as test_error:
+            print(f"Error during {test_name} for {url}: {test_error}")
+            row.extend(["Error", "0.00%", "Error details unavailable"])
+
+    return row
+
+
+def audit_url(url, cache_dir=None, report=None, checks=None, capture=(), profiler=None, memory_budget=None,
+              trace_memory=False):
+    """Fetch a URL and run the selected checks, reporting each phase through `report`.
+
+    Given a CheckProfiler, each check is profiled and the URL's profile summary saved.
+    With a `memory_budget` or `trace_memory`, the URL's peak memory is reported as a
+    "memory" message; past `memory_budget` bytes the remaining checks run in lean
+    mode (see utils.memory).
+    """
+    report = report or (lambda *message: None)
+
+    if memory_budget or trace_memory:
+        monitor = MemoryMonitor(memory_budget, trace_memory)
+    else:
+        monitor = contextlib.nullcontext()
+    with monitor as memory:
+        report("phase", "fetch")
+        html_content, inputs = asyncio.run(fetch_html_content(url, capture))
         if html_content is None:
-            print(f"Failed to retrieve HTML content for {url}.")
-            return
-
-        # Tests and their respective functions
-        tests_and_functions = {
-            "heading_markup": check_heading_markup,
-            "list_markup": test_list_markup,
-            "table_markup": test_table_markup,
-            "blockquote_markup": test_blockquote_markup,
-            "landmark_markup": test_landmark_markup,
-            "structural_markup": test_structural_markup,
-            "form_markup": test_form_markup,
-        }
+            raise RuntimeError(f"Failed to retrieve HTML content for {url}.")
 
-        # Mapping for formatting details based on test name
-        format_details = {
-            "table_markup": lambda details: "\n".join(
-                f"Table Index: {detail.get('Table Index', 'N/A')}, "
-                f"Issue: {detail.get('Issue', 'N/A')}, "
-                f"Code: {detail.get('Issue Code', 'N/A')}, "
-                f"Confidence: {detail.get('Confidence Percentage', 'N/A')}%, "
-                f"HTML: {detail.get('Table HTML', 'N/A')}"
-                for detail in details
-            ),
-            # Other formatters for different tests go here
+        callbacks = {
+            "on_phase": lambda name: report("phase", name if name == "parse" else f"check: {name}"),
+            "on_result": lambda name, result: report("check_result", name, result),
         }
+        tests = load_tests(checks)
+        if profiler is not None:
+            tests = profiler.wrap(tests, url)
+        try:
+            if cache_dir:
+                results = run_checks_incrementally(
+                    url, html_content, tests, cache_dir, inputs=inputs, memory=memory, **callbacks
+                )
+            else:
+                results = run_checks(html_content, tests, inputs=inputs, memory=memory, **callbacks)
+        finally:
+            if profiler is not None:
+                profiler.save(url)
+    if memory is not None:
+        report("memory", memory.usage())
+    return results
+
+
+def record_timeout(workbook, url, timeout_error):
+    """Log a URL that was stopped by the hard timeout, with the phase it stalled in."""
+    workbook["Timeouts"].append([url, timeout_error.phase, timeout_error.timeout])
+
+
+def process_url(url, workbook, results_file, cache_dir=None, timeout=120, checks=None, capture=(), snippets=None,
+                profiler=None, memory_budget=None, trace_memory=False):
+    """Process a single URL and log detailed issues into Excel.
+
+    The fetch and checks run in a separate worker process that is killed,
+    together with its browser, if it exceeds `timeout` seconds. Checks that
+    finished before the timeout keep their results. When `cache_dir` is
+    given, checks unaffected by changes since the previous run of the same
+    URL reuse their cached results. `checks` selects a subset of the checks
+    (see utils.pipeline.load_tests) and `capture` names extra page inputs to
+    take from the browser (see utils.page_capture). Given a SnippetStore, the
+    row references the HTML snippets stored there. Given a CheckProfiler,
+    the checks are profiled and their hottest functions added to the
+    "Profile" sheet. With a `memory_budget` or `trace_memory`, the URL's peak
+    memory goes to the "Memory" sheet; past `memory_budget` bytes its
+    remaining checks run lean (see utils.memory).
+    Returns the results, or None if the URL could not be audited.
+    """
+    test_names = list(load_tests(checks))
+    completed = {}
+    memory = []
+
+    def on_message(kind, *payload):
+        if kind == "check_result":
+            test_name, result = payload
+            completed[test_name] = result
+        elif kind == "memory":
+            memory.append(payload[0])
 
-        # Prepare a row for the current URL
-        row = [url]  # Initialize row with the URL
-
-        for test_name, test_function in tests_and_functions.items():
-            try:
-                # Run the test function
-                result = test_function(html_content)
-
-                # Extract and append the test status
-                test_status = result.get("status", "N/A")
-                row.append(test_status)
-
-                # Extract and append the overall confidence score
-                overall_confidence = result.get("confidence", 100.0)
-                row.append(f"{overall_confidence:.2f}%")
-
-                # Extract and append formatted details
-                details = result.get("details", [])
-                if details:
-                    issue_text = format_details.get(test_name, lambda x: "No formatter available")(details)
-                else:
-                    issue_text = "No issues found"
-                row.append(issue_text)
-
-            except Exception as test_error:
-                print(f"Error during {test_name} for {url}: {test_error}")
-                row.extend(["Error", "0.00%", "Error details unavailable"])
-
-        # Append the row to the Excel summary sheet
-        summary_sheet = workbook["Summary"]
-        summary_sheet.append(row)
-
-        # Save workbook after processing each URL
-        workbook.save(results_file)
-
-        print(f"Completed processing {url}. Results saved in Excel.")
-
+    try:
+        results = run_in_killable_worker(
+            partial(
+                audit_url, checks=checks, capture=capture, profiler=profiler,
+                memory_budget=memory_budget, trace_memory=trace_memory,
+            ),
+            (url, cache_dir),
+            timeout=timeout, on_message=on_message,
+        )
+    except WorkerTimeout as e:
+        print(f"Timeout: Test for {url} stalled during {e.phase} and was stopped.")
+        record_timeout(workbook, url, e)
+        timed_out = {"status": "Timeout", "details": [{"Issue": str(e)}], "confidence": 0.0}
+        results = {test_name: completed.get(test_name, timed_out) for test_name in test_names}
     except Exception as e:
         print(f"Unexpected error for {url}: {e}")
+        return
+
+    # Append the row to the Excel summary sheet
+    summary_sheet = workbook["Summary"]
+    summary_sheet.append(build_summary_row(url, results, test_names, snippets))
+    append_batch_records(results_file, url, results)
+    if profiler is not None:
+        record_profile(workbook, url, profiler)
+    if memory:
+        record_memory(workbook, url, memory[0])
+
+    # Save workbook after processing each URL
+    workbook.save(results_file)
+    if snippets is not None:
+        snippets.save()
+
+    print(f"Completed processing {url}. Results saved in Excel.")
+    return results
+
+
+def record_memory(workbook, url, usage):
+    """Log the peak memory of a URL, and whether it was audited lean, into the "Memory" sheet."""
+    if "Memory" not in workbook.sheetnames:
+        workbook.create_sheet("Memory").append(MEMORY_HEADERS)
+    workbook["Memory"].append(memory_row(url, usage))
+
+
+def record_profile(workbook, url, profiler):
+    """Log the hottest functions of each profiled check of a URL into the "Profile" sheet."""
+    if "Profile" not in workbook.sheetnames:
+        workbook.create_sheet("Profile").append(PROFILE_HEADERS)
+    for row in profile_rows(url, load_profile_summary(profiler.directory, url)):
+        workbook["Profile"].append(row)
+
+
+def run_queue_worker(queue, worker, workbook, results_file, poll_interval=10, **options):
+    """
+    Leases URLs from a work queue (see utils.work_queue) and audits them until
+    the queue is drained; `options` are passed on to process_url.
+
+    Returns:
+        int: Number of URLs this worker audited.
+    """
+    processed = 0
+    while True:
+        urls = queue.lease(worker)
+        if not urls:
+            stats = queue.stats()
+            if not stats["pending"] and not stats["leased"]:
+                return processed
+            # Leases held by other workers may still expire and come back
+            time.sleep(poll_interval)
+            continue
+        url = urls[0]
+        processed += 1
+        print(f"\nTesting URL {processed} (worker {worker}): {url}")
+        with LeaseKeeper(queue, worker, urls):
+            results = process_url(url, workbook, results_file, **options)
+        summary = {test_name: result.get("status") for test_name, result in results.items()} if results else None
+        # A page stopped at the hard timeout is retried while it has attempts left
+        timed_out = summary is not None and "Timeout" in summary.values()
+        queue.report(worker, url, DONE if results is not None and not timed_out else FAILED, summary)
+
+
+def record_results(audited_pages, workbook, results_file, label="pages", save_every=50, test_names=TEST_NAMES,
+                   snippets=None):
+    """Log (source, results) pairs from an offline audit into Excel."""
+    summary_sheet = workbook["Summary"]
+    processed = 0
+    for source, results in audited_pages:
+        if results is None:
+            print(f"Skipped {source}: content could not be read.")
+            continue
+        summary_sheet.append(build_summary_row(source, results, test_names, snippets))
+        append_batch_records(results_file, source, results)
+        processed += 1
+        # Saving an xlsx rewrites the whole file, so only do it periodically
+        if processed % save_every == 0:
+            workbook.save(results_file)
+            if snippets is not None:
+                snippets.save()
+            print(f"Processed {processed} {label}.")
+    workbook.save(results_file)
+    if snippets is not None:
+        snippets.save()
+    print(f"\nAudited {processed} {label}. Results saved to {results_file}.")
+
+
+def process_html_files(inputs, workbook, results_file, workers=None, checks=None, snippets=None):
+    """Audit saved HTML files without a browser and log their rows into Excel."""
+    test_names = list(load_tests(checks))
+    audited_pages = audit_html_files(inputs, workers=workers, checks=checks)
+    record_results(audited_pages, workbook, results_file, "HTML files", test_names=test_names, snippets=snippets)
+
+
+def process_archives(paths, workbook, results_file, workers=None, checks=None, snippets=None):
+    """Audit the HTML responses stored in WARC/HAR archives and log their rows into Excel."""
+    test_names = list(load_tests(checks))
+    for path in paths:
+        print(f"\nReading archive {path}")
+        audited_pages = audit_archive(path, workers=workers, checks=checks)
+        record_results(
+            audited_pages, workbook, results_file, "archived responses", test_names=test_names, snippets=snippets
+        )
+
+
+def report_site_summary(results_file):
+    """Roll the batch datasets up into the site-level summary workbook."""
+    try:
+        site_summary_file = write_site_summary(results_file)
+        if site_summary_file:
+            print(f"Site summary saved to {site_summary_file}.")
+    except Exception as e:
+        print(f"Failed to build the site summary: {e}")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Batch WCAG 1.3.1 audit over urls.txt.")
+    parser.add_argument(
+        "--urls", default=None, metavar="PATH",
+        help="URL list to audit, one per line (default: urls.txt next to this script).",
+    )
+    parser.add_argument(
+        "--shard", default=None, metavar="I/N",
+        help="Audit only shard I of N of the URL list (URLs are assigned by a stable hash, "
+             "so N hosts running 1/N..N/N cover every URL once).",
+    )
+    parser.add_argument(
+        "--queue", default=None, metavar="DB_OR_URL",
+        help="Work-queue mode: lease URLs from the SQLite queue file or coordinator URL "
+             "(see utils.work_queue) until it is drained, instead of reading the URL list.",
+    )
+    parser.add_argument(
+        "--enqueue", action="store_true",
+        help="With --queue: add the URL list (or this --shard of it) to the queue and exit.",
+    )
+    parser.add_argument(
+        "--worker-id", default=None,
+        help="Name of this worker in the queue (default: <hostname>-<pid>).",
+    )
+    parser.add_argument(
+        "--merge", nargs="+", metavar="WORKBOOK",
+        help="Merge the summary workbooks (and datasets) of the shards of a run into one, "
+             "then build its site summary; no audit is run.",
+    )
+    parser.add_argument(
+        "--html", nargs="+", metavar="PATH",
+        help="Audit saved .html/.html.gz files (files, directories or glob patterns) "
+             "instead of urls.txt; no browser is started.",
+    )
+    parser.add_argument(
+        "--archive", nargs="+", metavar="PATH",
+        help="Audit the HTML responses in .warc, .warc.gz or .har archives instead of urls.txt.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes for --html and --archive modes (default: one per CPU core).",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120,
+        help="Hard limit in seconds per URL; the worker and its browser are killed when exceeded.",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Re-run only the checks affected by page changes since the previous run.",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="Directory for the incremental audit cache (default: audit_cache next to this script).",
+    )
+    parser.add_argument(
+        "--checks", default=None,
+        help="Comma-separated checks to run, by name or code, e.g. 'heading,table,form' or "
+             "'1.3.1 (a)'. Unselected checks are never imported. Default: all checks.",
+    )
+    parser.add_argument(
+        "--max-issues", type=int, default=None, metavar="N",
+        help="Record at most N issues of each kind per check; totals are still counted exactly.",
+    )
+    parser.add_argument(
+        "--early-exit", action="store_true",
+        help="Stop a check as soon as its verdict can no longer change (it fails with confidence 0).",
+    )
+    parser.add_argument(
+        "--accessibility-tree", action="store_true",
+        help="Also capture the browser's accessibility tree; the heading and landmark checks then "
+             "read roles and levels from it, as assistive technology does.",
+    )
+    parser.add_argument(
+        "--dom-snapshot", action="store_true",
+        help="Run the checks on the browser's live DOM (a DevTools DOM snapshot) instead of "
+             "re-parsing the page's serialized HTML. Chromium only; source lines are not reported.",
+    )
+    parser.add_argument(
+        "--inline-snippets", action="store_true",
+        help="Quote HTML snippets in the summary instead of referencing them in the "
+             "<results>_snippets.jsonl store next to the workbook.",
+    )
+    parser.add_argument(
+        "--profile", default=None, metavar="DIR",
+        help="Profile every check of every URL into DIR: collapsed stacks (<url>/<Test>.collapsed) for "
+             "flame graph tools, cProfile stats, and the hottest functions in the workbook's Profile sheet.",
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=20, metavar="N",
+        help="Functions listed per check in the Profile sheet (default: 20).",
+    )
+    parser.add_argument(
+        "--memory-budget", type=float, default=None, metavar="MB",
+        help="Memory budget per URL. A page that exceeds it is finished in lean mode: fewer issues "
+             "per kind, shortened snippets and the parsed page released early.",
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="Also trace Python allocations (tracemalloc) for the Memory sheet; slower.",
+    )
+    parser.add_argument(
+        "--sample", type=int, default=None, metavar="N",
+        help="On pages with more than N candidate elements, validate a stratified sample of N "
+             "(structural, list and landmark checks) and report confidence bounds.",
+    )
+    args = parser.parse_args()
+    try:
+        select_checks(args.checks)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.max_issues is not None and args.max_issues < 1:
+        parser.error("--max-issues must be at least 1.")
+    if args.sample is not None and args.sample < 2:
+        parser.error("--sample must be at least 2.")
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.enqueue and not args.queue:
+        parser.error("--enqueue needs --queue.")
+    if args.profile and (args.html or args.archive):
+        parser.error("--profile only applies to URL audits, not to --html or --archive.")
+    if args.profile_top < 1:
+        parser.error("--profile-top must be at least 1.")
+    if args.memory_budget is not None and args.memory_budget <= 0:
+        parser.error("--memory-budget must be positive.")
+    if (args.memory_budget or args.trace_memory) and (args.html or args.archive):
+        parser.error("--memory-budget and --trace-memory only apply to URL audits, not to --html or --archive.")
+    return args
+
+
+def page_captures(args):
+    """Names of the page inputs to capture next to the HTML (see utils.page_capture)."""
+    capture = []
+    if args.accessibility_tree:
+        capture.append("accessibility_tree")
+    if args.dom_snapshot:
+        capture.append("document")
+    return capture
 
 
 def main():
+    args = parse_arguments()
+
     # File containing the list of URLs
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    urls_file = os.path.join(script_dir, "urls.txt")
+    urls_file = args.urls or os.path.join(script_dir, "urls.txt")
+
+    if args.merge:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results_file = os.path.join(script_dir, f"WCAG1.3.1_{timestamp}_merged.xlsx")
+        site_summary_file = merge_shard_results(args.merge, results_file)
+        print(f"Merged {len(args.merge)} shards into {results_file}.")
+        if site_summary_file:
+            print(f"Site summary saved to {site_summary_file}.")
+        return
 
-    # Timeout duration in seconds
-    timeout_duration = 120
+    cache_dir = None
+    if args.incremental:
+        cache_dir = args.cache_dir or os.path.join(script_dir, "audit_cache")
+
+    limits = None
+    if args.max_issues is not None or args.early_exit:
+        limits = IssueLimits(per_kind=args.max_issues, early_exit=args.early_exit)
+    sampling = Sampling(size=args.sample) if args.sample else None
+    checks = load_tests(args.checks, limits, sampling)
+    test_names = list(checks)
+    capture = page_captures(args)
+    profiler = CheckProfiler(args.profile, top=args.profile_top) if args.profile else None
+    memory_budget = int(args.memory_budget * MB) if args.memory_budget else None
+
+    if args.html or args.archive:
+        workbook = create_results_workbook(test_names)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results_file = os.path.join(script_dir, f"WCAG1.3.1_{timestamp}.xlsx")
+        snippets = None if args.inline_snippets else SnippetStore(snippet_store_path(results_file))
+        if args.html:
+            process_html_files(
+                args.html, workbook, results_file, workers=args.workers, checks=checks, snippets=snippets
+            )
+        if args.archive:
+            process_archives(
+                args.archive, workbook, results_file, workers=args.workers, checks=checks, snippets=snippets
+            )
+        report_site_summary(results_file)
+        return
+
+    if args.queue and not args.enqueue:
+        queue = open_queue(args.queue)
+        worker = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        workbook = create_results_workbook(test_names)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        worker_name = re.sub(r"[^A-Za-z0-9_.-]", "_", worker)
+        results_file = os.path.join(script_dir, f"WCAG1.3.1_{timestamp}_{worker_name}.xlsx")
+        workbook.save(results_file)
+        snippets = None if args.inline_snippets else SnippetStore(snippet_store_path(results_file))
+        processed = run_queue_worker(
+            queue, worker, workbook, results_file,
+            cache_dir=cache_dir, timeout=args.timeout, checks=checks, capture=capture, snippets=snippets,
+            profiler=profiler, memory_budget=memory_budget, trace_memory=args.trace_memory,
+        )
+        queue.close()
+        print(f"\nQueue drained; this worker audited {processed} URLs. Results saved to {results_file}.")
+        print("Combine the workers' workbooks with --merge.")
+        report_site_summary(results_file)
+        return
 
     # Verify if urls.txt exists
     if not os.path.exists(urls_file):
         print(f"File {urls_file} not found.")
         return
 
-    # Read URLs from the file
-    with open(urls_file, "r") as file:
-        urls = [url.strip() for url in file.readlines() if url.strip()]
+    if args.enqueue:
+        queue = open_queue(args.queue)
+        added = queue.enqueue(iter_urls(urls_file, args.shard))
+        print(f"Queued {added} new URLs from {urls_file}: {queue.stats()}")
+        queue.close()
+        return
 
-    if not urls:
+    # Stream the URLs (of this shard) from the file, each one once
+    urls = iter_urls(urls_file, args.shard)
+    first_url = next(urls, None)
+    if first_url is None:
         print("No URLs found in the file. Exiting.")
         return
 
     # Prepare Excel workbook
-    workbook = create_results_workbook()
+    workbook = create_results_workbook(test_names)
 
     # Define the results file location at the start
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     results_file = os.path.join(script_dir, f"WCAG1.3.1_{timestamp}.xlsx")
+    if args.shard:
+        results_file = shard_results_file(results_file, args.shard)
     workbook.save(results_file)  # Save the initial workbook structure
+    snippets = None if args.inline_snippets else SnippetStore(snippet_store_path(results_file))
 
     # Process each URL with a timeout
-    for i, url in enumerate(urls, start=1):
-        print(f"\nTesting URL {i}/{len(urls)}: {url}")
-
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(process_url, url, workbook, results_file)
-
-            try:
-                # Run the URL processing with a timeout
-                future.result(timeout=timeout_duration)
-            except TimeoutError:
-                print(f"Timeout: Test for {url} took too long and was skipped.")
-                future.cancel()
-            except Exception as e:
-                print(f"Unexpected error for {url}: {e}")
+    for i, url in enumerate(itertools.chain([first_url], urls), start=1):
+        print(f"\nTesting URL {i}: {url}")
+        process_url(
+            url, workbook, results_file, cache_dir,
+            timeout=args.timeout, checks=checks, capture=capture, snippets=snippets, profiler=profiler,
+            memory_budget=memory_budget, trace_memory=args.trace_memory,
+        )
 
     print(f"\nBatch test completed. Final results saved to {results_file}.")
+    if profiler is not None:
+        print(f"Check profiles saved to {args.profile}.")
+    report_site_summary(results_file)
 
 
 if __name__ == "__main__":
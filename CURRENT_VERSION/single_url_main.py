@@ -1,21 +1,25 @@
 import os
+import argparse
 import subprocess
+import contextlib
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font
 from collections import defaultdict
-import pandas as pd
 
 from playwright.async_api import async_playwright
 import asyncio
-import json
 import logging
-from checks.WCAG_1_3_1.test_blockquote_markup import test_blockquote_markup, write_blockquote_info
-from checks.WCAG_1_3_1.test_form_markup import test_form_markup, write_form_info
-from checks.WCAG_1_3_1.test_heading_markup import check_heading_markup, write_heading_info
-from checks.WCAG_1_3_1.test_landmark_markup import test_landmark_markup, write_landmark_info
-from checks.WCAG_1_3_1.test_list_markup import test_list_markup, write_list_info
-from checks.WCAG_1_3_1.test_structural_markup import test_structural_markup, write_structural_info
-from checks.WCAG_1_3_1.test_table_markup import test_table_markup, write_table_info
+from checks.WCAG_1_3_1.issues import IssueLimits
+from checks.WCAG_1_3_1.sampling import Sampling
+from checks.WCAG_1_3_1.registry import load_writer, select_checks
+from utils.incremental import run_checks_incrementally
+from utils.memory import BYTES_PER_HTML_CHAR, MB, MEMORY_HEADERS, MemoryMonitor, memory_row
+from utils.page_capture import capture_inputs
+from utils.pipeline import check_inputs, last_document_reader, load_tests, page_inputs
+from utils.profiling import PROFILE_HEADERS, CheckProfiler, load_profile_summary, profile_rows
+from utils.report_writer import COMPRESSIONS, ReportWriter, check_compression
+from utils.result_bundle import BundleWriter
+from utils.snippet_store import SnippetStore
 
 def create_results_workbook():
     """Initialize an Excel workbook with the desired column format."""
@@ -31,18 +35,6 @@ def create_results_workbook():
     ])
     return workbook
 
-def save_json(file_path, data):
-
-    try:
-        with open(file_path, "w", encoding="utf-8") as json_file:
-            json.dump(data, json_file, indent=4)
-        logging.info(f"JSON file saved: {file_path}")
-        return True
-    except Exception as e:
-        logging.error(f"Error saving JSON to {file_path}: {e}")
-        return False
-
-
 def add_section_header(sheet, test_name):
     """Adds a greyed-out section header for a test type."""
     header_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
@@ -57,21 +49,22 @@ def add_section_header(sheet, test_name):
             cell.font = header_font
 
 
-async def fetch_html_content(url):
-    """Fetch HTML content from the given URL."""
+async def fetch_html_content(url, capture=()):
+    """Fetch HTML content from the given URL, with the page inputs named in `capture`."""
     try:
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
             await page.goto(url)
             content = await page.content()
+            inputs = await capture_inputs(page, capture)
             await browser.close()
-            return content
+            return content, inputs
     except Exception as e:
         raise RuntimeError(f"Error fetching HTML content for {url}: {e}")
 
 
-def save_results(base_dir, test_name, results):
+def save_results(base_dir, test_name, results, write_function, compression=None, indent=False, snippets=None):
     """
     Saves results in CSV and JSON formats.
 
@@ -79,22 +72,15 @@ def save_results(base_dir, test_name, results):
         base_dir (str): Directory to save results.
         test_name (str): Name of the test.
         results (list): List of dictionaries representing test results.
+        write_function (callable): The check's CSV writer (see the registry).
+        compression (str, optional): "gzip" or "zstd" to compress both files.
+        indent (bool): Indent the JSON instead of writing it compactly.
+        snippets (SnippetStore, optional): Store that replaces the HTML snippets by references.
     """
-    try:
-        os.makedirs(base_dir, exist_ok=True)
-        csv_path = os.path.join(base_dir, f"{test_name}_details.csv")
-        json_path = os.path.join(base_dir, f"{test_name}_details.json")
-
-        # Save to CSV
-        pd.DataFrame(results).to_csv(csv_path, index=False)
-
-        # Save to JSON
-        with open(json_path, "w", encoding="utf-8") as json_file:
-            json.dump(results, json_file, indent=4)
-
-        print(f"Results saved for {test_name}: {csv_path}, {json_path}")
-    except Exception as e:
-        print(f"Failed to save results for {test_name}: {e}")
+    os.makedirs(base_dir, exist_ok=True)
+    with ReportWriter(compression, indent, snippets=snippets) as writer:
+        writer.submit(base_dir, test_name, results, write_function)
+    print(f"Results saved for {test_name} in {base_dir}")
 
 
 def group_issues(details):
@@ -122,7 +108,8 @@ def group_issues(details):
     ]
 
 
-def process_url(url, workbook, results_dir):
+def process_url(url, workbook, results_dir, cache_dir=None, checks=None, limits=None, sampling=None, capture=(),
+                compression=None, indent=False, snippets=None, bundle=None, profiler=None, memory=None):
     """
     Processes the given URL, performs tests, and saves results in separate folders for each test.
 
@@ -130,45 +117,77 @@ def process_url(url, workbook, results_dir):
         url (str): URL to process.
         workbook (Workbook): Excel workbook for results.
         results_dir (str): Directory to save results.
+        cache_dir (str, optional): Audit cache directory; when set, unchanged checks reuse previous results.
+        checks (str or list, optional): Checks to run, by name or code. Defaults to all checks.
+        limits (IssueLimits, optional): Per-kind issue cap and early-exit setting for the checks.
+        sampling (Sampling, optional): Sample size for the per-element validators on very large pages.
+        capture (iterable, optional): Extra page inputs to take from the browser (see utils.page_capture).
+        compression (str, optional): "gzip" or "zstd" to compress the detail files.
+        indent (bool): Indent the detail JSON instead of writing it compactly.
+        snippets (SnippetStore, optional): Store the detail files reference their HTML snippets in.
+        bundle (BundleWriter, optional): Bundle the detail files are appended to as one record
+            per URL, instead of per-test folders (see utils.result_bundle).
+        profiler (CheckProfiler, optional): Profiles each test; the hottest functions go to a Profile sheet.
+        memory (MemoryMonitor, optional): Tracks the audit's memory, entered by the caller; past its
+            budget the remaining tests run in lean mode (see utils.memory).
 
     Returns:
         str: Path to the summary Excel file.
     """
     try:
         # Fetch HTML content
-        html_content = asyncio.run(fetch_html_content(url))
+        html_content, inputs = asyncio.run(fetch_html_content(url, capture))
         if not html_content:
             print(f"Failed to fetch HTML content for {url}.")
             return
 
         summary_sheet = workbook["Summary"]
 
-        # Define tests and their associated functions
-        tests = {
-            "Heading Markup": (check_heading_markup, write_heading_info),
-            "List Markup": (test_list_markup, write_list_info),
-            "Table Markup": (test_table_markup, write_table_info),
-            "Blockquote Markup": (test_blockquote_markup, write_blockquote_info),
-            "Landmark Markup": (test_landmark_markup, write_landmark_info),
-            "Structural Markup": (test_structural_markup, write_structural_info),
-            "Form Markup": (test_form_markup, write_form_info),
-        }
-
-        # Create folders for each test before running them
+        # Load the selected tests and their associated functions
+        test_functions = load_tests(checks, limits, sampling)
+        if profiler is not None:
+            test_functions = profiler.wrap(test_functions, url)
+        tests = {spec.label: (test_functions[spec.label], load_writer(spec)) for spec in select_checks(checks)}
+
+        # Create folders for each test before running them (bundles only name them)
         test_folders = {}
         for test_name in tests.keys():
             test_folder = os.path.join(results_dir, test_name.replace(" ", "_"))
-            os.makedirs(test_folder, exist_ok=True)
+            if bundle is None:
+                os.makedirs(test_folder, exist_ok=True)
             test_folders[test_name] = test_folder
 
+        cached_results = {}
+        if cache_dir:
+            cached_results = run_checks_incrementally(
+                url, html_content, {name: functions[0] for name, functions in tests.items()}, cache_dir,
+                inputs=inputs, memory=memory
+            )
+        else:
+            if memory is not None:
+                memory.check("parse", len(html_content) * BYTES_PER_HTML_CHAR)
+            # Parse the page once for all the tests
+            inputs = page_inputs(html_content, test_functions, inputs)
+        last_reader = last_document_reader(test_functions) if memory is not None and not cache_dir else None
+
+        # Detail files are written in the background while the next test runs
+        report_writer = ReportWriter(compression, indent, snippets=snippets, bundle=bundle, key=url)
+
         # Run each test and save results
         for test_name, (test_function, write_function) in tests.items():
             try:
                 # Add section header in Excel
                 add_section_header(summary_sheet, test_name)
 
-                # Run the test
-                result = test_function(html_content)
+                # Run the test, unless the incremental run already did
+                if memory is not None and test_name not in cached_results:
+                    memory.check(test_name)
+                    test_function = memory.prepare(test_function, inputs)
+                result = cached_results.get(test_name) or test_function(
+                    html_content, **check_inputs(test_function, inputs)
+                )
+                if test_name == last_reader:
+                    memory.release(inputs)
                 logging.debug(f"Test Result for {test_name}: {result}")
 
                 # Extract test results
@@ -191,17 +210,15 @@ def process_url(url, workbook, results_dir):
                         ])
                 else:
                     summary_sheet.append([url, test_name, status, f"{confidence:.2f}%", "No issues found."])
+                if "issues_shown" in result:
+                    note = f"{result['issues_shown']} shown of {result['issue_count']} issues"
+                    if result.get("early_exit"):
+                        note += " (scan stopped once the verdict was settled)"
+                    summary_sheet.append([url, test_name, status, f"{confidence:.2f}%", note])
 
-                # Save results to test-specific folder
-                test_folder = test_folders[test_name]
-                csv_file_path = os.path.join(test_folder, f"{test_name.replace(' ', '_')}_details.csv")
-                json_file_path = os.path.join(test_folder, f"{test_name.replace(' ', '_')}_details.json")
-
+                # Save CSV and JSON to the test-specific folder
                 try:
-                    # Save CSV and JSON
-                    write_function(csv_file_path, grouped_results)
-                    save_json(json_file_path, grouped_results)
-                    logging.info(f"Saved results for {test_name} in {test_folder}")
+                    report_writer.submit(test_folders[test_name], test_name, grouped_results, write_function)
                 except Exception as file_write_error:
                     logging.error(f"Error saving results for {test_name}: {file_write_error}")
 
@@ -211,6 +228,21 @@ def process_url(url, workbook, results_dir):
                 logging.error(error_message)
                 summary_sheet.append([url, test_name, "Error", "0.00%", error_message])
 
+        written = report_writer.close()
+        logging.info(f"Saved {len(written)} detail files in {results_dir}")
+
+        if memory is not None:
+            memory_sheet = workbook.create_sheet("Memory")
+            memory_sheet.append(MEMORY_HEADERS)
+            memory_sheet.append(memory_row(url, memory.usage()))
+
+        if profiler is not None:
+            profiler.save(url)
+            profile_sheet = workbook.create_sheet("Profile")
+            profile_sheet.append(PROFILE_HEADERS)
+            for row in profile_rows(url, load_profile_summary(profiler.directory, url)):
+                profile_sheet.append(row)
+
         # Save the Excel summary file
         excel_path = os.path.join(results_dir, "wcag1.3.1_summary.xlsx")
         workbook.save(excel_path)
@@ -233,8 +265,122 @@ def open_results_file(file_path):
     except Exception as e:
         print(f"Failed to open the file {file_path}: {e}")
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="WCAG 1.3.1 audit of a single URL.")
+    parser.add_argument("url", nargs="?", help="URL to test (prompted for when omitted).")
+    parser.add_argument(
+        "--no-open", action="store_true",
+        help="Do not open the summary workbook when the test completes.",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Re-run only the checks affected by page changes since the previous run.",
+    )
+    parser.add_argument(
+        "--cache-dir", default=os.path.join("output", "audit_cache"),
+        help="Directory for the incremental audit cache.",
+    )
+    parser.add_argument(
+        "--checks", default=None,
+        help="Comma-separated checks to run, by name or code, e.g. 'heading,table,form'. Default: all checks.",
+    )
+    parser.add_argument(
+        "--max-issues", type=int, default=None, metavar="N",
+        help="Record at most N issues of each kind per check; totals are still counted exactly.",
+    )
+    parser.add_argument(
+        "--early-exit", action="store_true",
+        help="Stop a check as soon as its verdict can no longer change (it fails with confidence 0).",
+    )
+    parser.add_argument(
+        "--accessibility-tree", action="store_true",
+        help="Also capture the browser's accessibility tree; the heading and landmark checks then "
+             "read roles and levels from it, as assistive technology does.",
+    )
+    parser.add_argument(
+        "--dom-snapshot", action="store_true",
+        help="Run the checks on the browser's live DOM (a DevTools DOM snapshot) instead of "
+             "re-parsing the page's serialized HTML. Chromium only; source lines are not reported.",
+    )
+    parser.add_argument(
+        "--compress", choices=[name for name in COMPRESSIONS if name], default=None,
+        help="Compress the per-test detail files (zstd needs the 'zstandard' package).",
+    )
+    parser.add_argument(
+        "--pretty-json", action="store_true",
+        help="Indent the per-test detail JSON (compact by default).",
+    )
+    parser.add_argument(
+        "--bundle", default=None, metavar="DIR",
+        help="Append the detail files of the URL as one compressed record to the result bundle "
+             "in DIR (indexed by URL) instead of writing per-test folders.",
+    )
+    parser.add_argument(
+        "--inline-snippets", action="store_true",
+        help="Quote HTML snippets in the detail files instead of referencing them in output/snippets.jsonl.",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Profile each test into <results>/profile: collapsed stacks (<Test>.collapsed) for flame "
+             "graph tools, cProfile stats, and the hottest functions in the workbook's Profile sheet.",
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=20, metavar="N",
+        help="Functions listed per test in the Profile sheet (default: 20).",
+    )
+    parser.add_argument(
+        "--memory-budget", type=float, default=None, metavar="MB",
+        help="Memory budget for the audit. Past it, the remaining tests run in lean mode: fewer "
+             "issues per kind, shortened snippets and the parsed page released early.",
+    )
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="Also trace Python allocations (tracemalloc) for the Memory sheet; slower.",
+    )
+    parser.add_argument(
+        "--sample", type=int, default=None, metavar="N",
+        help="On pages with more than N candidate elements, validate a stratified sample of N "
+             "(structural, list and landmark checks) and report confidence bounds.",
+    )
+    args = parser.parse_args()
+    try:
+        select_checks(args.checks)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.max_issues is not None and args.max_issues < 1:
+        parser.error("--max-issues must be at least 1.")
+    if args.sample is not None and args.sample < 2:
+        parser.error("--sample must be at least 2.")
+    if args.profile_top < 1:
+        parser.error("--profile-top must be at least 1.")
+    if args.memory_budget is not None and args.memory_budget <= 0:
+        parser.error("--memory-budget must be positive.")
+    try:
+        check_compression(args.compress)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def page_captures(args):
+    """Names of the page inputs to capture next to the HTML (see utils.page_capture)."""
+    capture = []
+    if args.accessibility_tree:
+        capture.append("accessibility_tree")
+    if args.dom_snapshot:
+        capture.append("document")
+    return capture
+
+
 def main():
-    url = None
+    args = parse_arguments()
+    cache_dir = args.cache_dir if args.incremental else None
+    limits = None
+    if args.max_issues is not None or args.early_exit:
+        limits = IssueLimits(per_kind=args.max_issues, early_exit=args.early_exit)
+    sampling = Sampling(size=args.sample) if args.sample else None
+
+    url = (args.url or "").strip()
     while not url:
         url = input("Enter the URL to test: ").strip()
         if not url:
@@ -248,11 +394,32 @@ def main():
     os.makedirs(url_results_dir, exist_ok=True)
 
     workbook = create_results_workbook()
+    # Snippets are stored once for every URL audited into this output directory
+    snippets = None if args.inline_snippets else SnippetStore(os.path.join(base_results_dir, "snippets.jsonl"))
+    bundle = BundleWriter(args.bundle, compression=args.compress or "gzip") if args.bundle else None
+    profiler = None
+    if args.profile:
+        profiler = CheckProfiler(os.path.join(url_results_dir, "profile"), top=args.profile_top)
 
     print(f"\nTesting URL: {url}")
-    results_file = process_url(url, workbook, url_results_dir)
-
-    if results_file:
+    capture = page_captures(args)
+    memory_budget = int(args.memory_budget * MB) if args.memory_budget else None
+    # Memory is only monitored (and reported) when a budget or tracing asks for it
+    if memory_budget or args.trace_memory:
+        monitor = MemoryMonitor(memory_budget, args.trace_memory)
+    else:
+        monitor = contextlib.nullcontext()
+    with monitor as memory:
+        results_file = process_url(
+            url, workbook, url_results_dir, cache_dir,
+            checks=args.checks, limits=limits, sampling=sampling, capture=capture,
+            compression=args.compress, indent=args.pretty_json, snippets=snippets, bundle=bundle,
+            profiler=profiler, memory=memory,
+        )
+    if bundle is not None:
+        bundle.close()
+
+    if results_file and not args.no_open:
         open_results_file(results_file)
 
     print(f"\nTest completed. Results saved in {results_file}.")
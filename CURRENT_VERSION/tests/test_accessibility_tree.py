@@ -0,0 +1,56 @@
+from checks.WCAG_1_3_1.accessibility_tree import iter_nodes, subtree_text, tree_from_ax_nodes
+from checks.WCAG_1_3_1.issues import HEADING_SKIPPED_LEVEL
+from checks.WCAG_1_3_1.test_heading_markup import check_heading_tree
+
+
+def ax_node(node_id, role, name="", children=(), parent=None, ignored=False, **properties):
+    node = {
+        "nodeId": node_id,
+        "ignored": ignored,
+        "role": {"type": "role", "value": role},
+        "name": {"type": "computedString", "value": name},
+        "properties": [
+            {"name": key, "value": {"type": "integer", "value": value}} for key, value in properties.items()
+        ],
+        "childIds": list(children),
+    }
+    if parent is not None:
+        node["parentId"] = parent
+    return node
+
+
+# A page with an <h1>, an <h3> inside an ignored <div>, and a <main> with text
+FULL_AX_TREE = [
+    ax_node("1", "RootWebArea", "Page", children=["2", "4", "7"]),
+    ax_node("2", "heading", "Title", children=["3"], parent="1", level=1),
+    ax_node("3", "StaticText", "Title", children=["10"], parent="2"),
+    ax_node("10", "InlineTextBox", "Title", parent="3"),
+    ax_node("4", "generic", ignored=True, children=["5"], parent="1"),
+    ax_node("5", "heading", "Sub", children=["6"], parent="4", level=3),
+    ax_node("6", "StaticText", "Sub", parent="5"),
+    ax_node("7", "main", children=["8"], parent="1"),
+    ax_node("8", "StaticText", "Some main content", parent="7"),
+]
+
+
+def test_tree_from_ax_nodes_has_the_snapshot_form():
+    tree = tree_from_ax_nodes(FULL_AX_TREE)
+    assert [(node["role"], node["name"]) for node in iter_nodes(tree)] == [
+        ("WebArea", "Page"),
+        ("heading", "Title"), ("text", "Title"),
+        ("heading", "Sub"), ("text", "Sub"),
+        ("main", ""), ("text", "Some main content"),
+    ]
+    headings = [node for node in iter_nodes(tree) if node["role"] == "heading"]
+    assert [heading["level"] for heading in headings] == [1, 3]
+    assert subtree_text(tree["children"][2]) == "Some main content"
+
+
+def test_tree_from_ax_nodes_feeds_the_heading_check():
+    result = check_heading_tree(tree_from_ax_nodes(FULL_AX_TREE))
+    assert result["status"] == "Malformed"
+    assert [issue.kind for issue in result["details"]] == [HEADING_SKIPPED_LEVEL]
+
+
+def test_empty_tree():
+    assert tree_from_ax_nodes([]) is None
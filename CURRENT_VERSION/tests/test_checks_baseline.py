@@ -0,0 +1,55 @@
+"""
+Differential tests of the checks against their BeautifulSoup-based baseline.
+
+data/baseline_results.json holds what the checks returned, for each page
+in data/pages, before they moved from BeautifulSoup to the Document model
+(the baseline tree, run on the raw bytes of each page). The checks must
+still return exactly that, both when called on their own and when run
+together through the pipeline on one shared Document.
+"""
+
+import json
+import logging
+from collections.abc import Mapping
+from pathlib import Path
+
+import pytest
+
+from utils.pipeline import load_tests, run_checks
+
+DATA = Path(__file__).parent / "data"
+PAGES = sorted((DATA / "pages").glob("*.html"))
+BASELINE = json.loads((DATA / "baseline_results.json").read_text(encoding="utf-8"))
+
+
+def plain(value):
+    """Results as the baseline stored them: Issue records and lists as JSON values."""
+    if isinstance(value, Mapping):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    return json.loads(json.dumps(value, default=str))
+
+
+@pytest.fixture(autouse=True)
+def quiet_checks():
+    # The check modules log every element at DEBUG level
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def test_every_page_has_baseline_results():
+    assert sorted(BASELINE) == [path.name for path in PAGES]
+
+
+@pytest.mark.parametrize("path", PAGES, ids=lambda path: path.name)
+def test_checks_match_baseline(path):
+    html = path.read_bytes()
+    results = {test_name: plain(test(html)) for test_name, test in load_tests().items()}
+    assert results == BASELINE[path.name]
+
+
+@pytest.mark.parametrize("path", PAGES, ids=lambda path: path.name)
+def test_pipeline_matches_baseline(path):
+    assert plain(run_checks(path.read_bytes())) == BASELINE[path.name]
@@ -0,0 +1,103 @@
+"""
+Differential tests of the Document model against BeautifulSoup.
+
+Document.from_html is meant to build exactly the tree that
+BeautifulSoup(html, 'html.parser') builds, which the checks were written
+against. Every element of each page is compared with its BeautifulSoup
+counterpart: name, source line, children, text and serialized markup.
+"""
+
+import random
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from checks.WCAG_1_3_1.document import Document
+
+PAGES = sorted((Path(__file__).parent / "data" / "pages").glob("*.html"))
+
+SNIPPETS = {
+    "misnested inline": "<div><b>bold <i>both</b> italic</i></div>",
+    "stray end tags": "</p></div><span>text</span></li></table>",
+    "unclosed elements": "<div><section><p>never closed",
+    "paragraph auto-close": "<p>one<p>two<div>three</div>",
+    "list item auto-close": "<ul><li>one<li>two<li><p>three</ul>",
+    "table auto-close": "<table><tr><td>1<td>2<tr><td>3</table><table><td>bare cell</table>",
+    "nested tables": "<table><tr><td><table><tr><td>inner</td></tr></table></td></tr></table>",
+    "table in paragraph": "<p>before<table><tr><td>cell</td></tr></table>after</p>",
+    "options": "<select><option>a<option>b<optgroup><option>c</select>",
+    "void elements": "<br></br><img src=x><input type=text></input><hr/><p/>",
+    "raw text": "<script>if (a < b && c) { x = '</div>' }</script><style>p > a {}</style>",
+    "entities": "<p title='&quot;a&amp;b&quot;'>&lt;tag&gt; &amp; &copy; &#169; &#xa9; &bogus; &amp</p>",
+    "comments and declarations": "<!DOCTYPE html><!-- c --><![CDATA[data]]><?pi x?><p>text</p>",
+    "whitespace": "<pre>\n  kept  </pre><textarea>\n\n</textarea><div>\n\n   </div><span> </span>",
+    "attributes": "<div class='  a   b ' id=x data-q='a\"b' hidden CLASS=dup ID=second>t</div>",
+    "string containers": "<ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby><template><div>in</div></template>",
+    "meta charset": '<meta charset="latin-1"><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1">',
+    "uppercase tags": "<DIV><P>Upper</P><Ul><LI>mixed</lI></uL></DIV>",
+}
+
+FUZZ_TAGS = [
+    "div", "section", "article", "header", "nav", "main", "footer", "aside", "form", "ul", "ol", "li",
+    "table", "tr", "th", "td", "thead", "tbody", "blockquote", "label", "input", "select", "option",
+    "fieldset", "h1", "h2", "h3", "span", "p", "a", "br", "img", "script", "rt", "template",
+]
+FUZZ_ATTRIBUTES = [
+    ("role", ["list", "heading", "main", ""]), ("id", ["a", "b", ""]), ("class", ["x  y", "z"]),
+    ("type", ["text", "submit", "hidden"]), ("scope", ["col", "row"]), ("aria-level", ["1", "x"]),
+]
+FUZZ_WORDS = "lorem ipsum dolor & < > sit amet".split()
+
+
+def fuzz_markup(rng, depth=0):
+    """Random, often malformed markup: unclosed and misnested elements, stray text."""
+    parts = []
+    for _ in range(rng.randint(0, 5 if depth < 6 else 0)):
+        roll = rng.random()
+        if roll < 0.35:
+            parts.append(" ".join(rng.choice(FUZZ_WORDS) for _ in range(rng.randint(0, 8))))
+        elif roll < 0.38:
+            parts.append("<!-- c -->")
+        elif roll < 0.42:
+            parts.append(f"</{rng.choice(FUZZ_TAGS)}>")
+        else:
+            tag = rng.choice(FUZZ_TAGS)
+            attributes = "".join(
+                f' {name}="{rng.choice(values)}"' for name, values in rng.sample(FUZZ_ATTRIBUTES, rng.randint(0, 2))
+            )
+            close = f"</{tag}>" if rng.random() > 0.15 else ""
+            parts.append(f"<{tag}{attributes}>{fuzz_markup(rng, depth + 1)}{close}")
+    return "".join(parts)
+
+
+def assert_same_tree(html):
+    soup = BeautifulSoup(html, "html.parser")
+    document = Document.from_html(html)
+    tags = soup.find_all(True)
+    elements = list(document.find_all())
+    assert [tag.name for tag in tags] == [document.name(node) for node in elements]
+    for tag, node in zip(tags, elements):
+        assert document.line(node) == tag.sourceline
+        assert [document.name(child) for child in document.children(node)] == [
+            child.name for child in tag.find_all(True, recursive=False)
+        ]
+        assert document.get_text(node) == tag.get_text()
+        assert document.get_text(node, strip=True) == tag.get_text(strip=True)
+        assert document.decode(node) == str(tag)
+
+
+@pytest.mark.parametrize("html", SNIPPETS.values(), ids=SNIPPETS.keys())
+def test_snippets_match_beautifulsoup(html):
+    assert_same_tree(html)
+
+
+@pytest.mark.parametrize("path", PAGES, ids=lambda path: path.name)
+def test_pages_match_beautifulsoup(path):
+    # Bytes: the encoding is sniffed from the BOM or <meta> the same way
+    assert_same_tree(path.read_bytes())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_fuzzed_markup_matches_beautifulsoup(seed):
+    assert_same_tree("<!DOCTYPE html><html><body>" + fuzz_markup(random.Random(seed)) + "</body></html>")
@@ -0,0 +1,28 @@
+from utils.memory import MB, MEMORY_HEADERS, MemoryMonitor, MemoryUsage, memory_row
+
+
+def test_monitor_records_the_rss_it_started_from():
+    with MemoryMonitor(interval=0.01) as memory:
+        block = b"\1" * (32 * MB)
+        memory.sample()
+    usage = memory.usage()
+    del block
+
+    assert usage.start_rss is not None
+    assert usage.peak_rss >= usage.start_rss + 16 * MB
+
+
+def test_memory_row_reports_growth_over_the_start():
+    usage = MemoryUsage(start_rss=100 * MB, peak_rss=150 * MB, peak_traced=None, budget=200 * MB, lean_from=None)
+
+    row = dict(zip(MEMORY_HEADERS, memory_row("https://example.com", usage)))
+
+    assert row["Peak RSS (MB)"] == 150.0
+    assert row["RSS Growth (MB)"] == 50.0
+    assert row["Budget (MB)"] == 200.0
+
+
+def test_memory_row_without_a_start_leaves_growth_empty():
+    usage = MemoryUsage(start_rss=None, peak_rss=0, peak_traced=None, budget=None, lean_from=None)
+
+    assert memory_row("https://example.com", usage)[2] is None
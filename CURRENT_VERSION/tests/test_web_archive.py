@@ -0,0 +1,76 @@
+import gzip
+
+import pytest
+
+from utils.web_archive import iter_warc_html, split_warc
+
+
+def response_record(index):
+    body = f"<html><body><h1>Page {index}</h1></body></html>".encode("utf-8")
+    http = b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n" + body
+    head = (
+        "WARC/1.0\r\n"
+        "WARC-Type: response\r\n"
+        f"WARC-Target-URI: https://example.com/{index}\r\n"
+        f"Content-Length: {len(http)}\r\n"
+    ).encode("ascii")
+    return head + b"\r\n" + http + b"\r\n\r\n"
+
+
+def request_record(index):
+    http = f"GET /{index} HTTP/1.1\r\nHost: example.com\r\n\r\n".encode("ascii")
+    head = (
+        "WARC/1.0\r\n"
+        "WARC-Type: request\r\n"
+        f"WARC-Target-URI: https://example.com/{index}\r\n"
+        f"Content-Length: {len(http)}\r\n"
+    ).encode("ascii")
+    return head + b"\r\n" + http + b"\r\n\r\n"
+
+
+RECORDS = [record for index in range(5) for record in (request_record(index), response_record(index))]
+URIS = [f"https://example.com/{index}" for index in range(5)]
+
+
+def write_archive(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def uris(path, start=0, end=None):
+    return [uri for uri, _ in iter_warc_html(path, start, end)]
+
+
+@pytest.mark.parametrize("members", [
+    [[record] for record in RECORDS],                      # one record per member
+    [RECORDS],                                             # the whole file as one stream
+    [RECORDS[:3], RECORDS[3:4], RECORDS[4:]],              # several records per member
+], ids=["per-record", "single-stream", "mixed"])
+def test_gzip_members_yield_every_record(tmp_path, members):
+    data = b"".join(gzip.compress(b"".join(records)) for records in members)
+    assert uris(write_archive(tmp_path, "pages.warc.gz", data)) == URIS
+
+
+def test_plain_and_gzip_archives_agree(tmp_path):
+    plain = write_archive(tmp_path, "pages.warc", b"".join(RECORDS))
+    compressed = write_archive(tmp_path, "pages.warc.gz", gzip.compress(b"".join(RECORDS)))
+    assert uris(plain) == uris(compressed) == URIS
+
+
+@pytest.mark.parametrize("members", [
+    [[record] for record in RECORDS],
+    [RECORDS[:4], RECORDS[4:7], RECORDS[7:]],
+], ids=["per-record", "mixed"])
+def test_ranges_read_every_record_once(tmp_path, members):
+    data = b"".join(gzip.compress(b"".join(records)) for records in members)
+    path = write_archive(tmp_path, "pages.warc.gz", data)
+    found = [uri for start, end in split_warc(path, 4) for uri in uris(path, start, end)]
+    assert found == URIS
+
+
+def test_bytes_after_the_last_record_are_reported(tmp_path, caplog):
+    data = gzip.compress(b"".join(RECORDS[:2]) + b"trailing garbage")
+    path = write_archive(tmp_path, "pages.warc.gz", data)
+    assert uris(path) == URIS[:1]
+    assert "Ignored" in caplog.text
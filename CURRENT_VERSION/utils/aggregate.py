@@ -0,0 +1,220 @@
+# utils/aggregate.py
+
+import os
+import argparse
+from collections import Counter
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from checks.WCAG_1_3_1.issues import Issue, IssueList, kind_of
+from utils.csv_handler import flush_appenders, get_appender
+
+"""
+Batch-level aggregation of WCAG 1.3.1 results.
+
+While a batch runs, every page adds flat records (through buffered appenders
+that keep the files open) to two CSV datasets next to the summary workbook:
+one row per (URL, test) and one row per (URL, test, issue kind) with its
+count. After the run the datasets are loaded into pandas and rolled up per
+site, per check and per issue code with grouped, vectorized operations, so
+the summary stays fast for 100k URLs.
+"""
+
+RESULT_FIELDS = ["URL", "Site", "Test", "Status", "Confidence", "Issue Count"]
+ISSUE_FIELDS = ["URL", "Site", "Test", "Issue Code", "Issue Kind", "Count"]
+
+
+def dataset_paths(results_file):
+    """Returns the (results, issues) dataset paths that belong to a summary workbook."""
+    base, _ = os.path.splitext(results_file)
+    return f"{base}_results.csv", f"{base}_issues.csv"
+
+
+def site_of(source):
+    """Site of a URL (its host); offline inputs such as files group under '(local)'."""
+    return urlparse(source).netloc or "(local)"
+
+
+def issue_counts(result):
+    """Counts the issues of one test result by (issue code, issue kind)."""
+    counts = Counter()
+    if result.get("status") != "Malformed":
+        return counts
+    details = result.get("details", [])
+    if isinstance(details, IssueList):
+        # Capped lists count every issue, including those not recorded
+        for kind, count in details.counts.items():
+            key = (kind.code, kind.name) if kind is not None else ("N/A", "unregistered")
+            counts[key] += count
+        return counts
+    for detail in details:
+        # Blockquote results nest their issues under each blockquote
+        entries = detail.get("issues", [detail]) if not isinstance(detail, Issue) else [detail]
+        for entry in entries:
+            # Plain dicts (e.g. results reused from the incremental cache) are matched to their kind
+            kind = kind_of(entry)
+            if kind is not None:
+                counts[(kind.code, kind.name)] += 1
+            else:
+                counts[(entry.get("Issue Code", "N/A"), "unregistered")] += 1
+    return counts
+
+
+def append_batch_records(results_file, source, results):
+    """Appends the flat records of one page to the batch datasets."""
+    results_csv, issues_csv = dataset_paths(results_file)
+    site = site_of(source)
+    result_rows, issue_rows = [], []
+    for test_name, result in results.items():
+        counts = issue_counts(result)
+        result_rows.append({
+            "URL": source,
+            "Site": site,
+            "Test": test_name,
+            "Status": result.get("status", "N/A"),
+            "Confidence": round(float(result.get("confidence", 0.0)), 2),
+            "Issue Count": sum(counts.values()),
+        })
+        issue_rows.extend(
+            {"URL": source, "Site": site, "Test": test_name, "Issue Code": code, "Issue Kind": kind, "Count": count}
+            for (code, kind), count in counts.items()
+        )
+    get_appender(results_csv, RESULT_FIELDS).append(result_rows)
+    if issue_rows:
+        get_appender(issues_csv, ISSUE_FIELDS).append(issue_rows)
+
+
+def load_batch(results_csv, issues_csv=None):
+    """Loads the batch datasets into DataFrames with compact column types."""
+    # Rows still buffered by this process belong in the files first
+    flush_appenders()
+    results = pd.read_csv(
+        results_csv,
+        dtype={"URL": "string", "Site": "category", "Test": "category", "Status": "category",
+               "Confidence": "float32", "Issue Count": "int32"},
+    )
+    issues = None
+    if issues_csv and os.path.exists(issues_csv):
+        issues = pd.read_csv(
+            issues_csv,
+            dtype={"URL": "string", "Site": "category", "Test": "category", "Issue Code": "category",
+                   "Issue Kind": "category", "Count": "int32"},
+        )
+    return results, issues
+
+
+def _with_flags(results):
+    status = results["Status"].astype("string")
+    return results.assign(
+        passed=(status == "Passed").to_numpy(dtype=np.int32),
+        failed=(status == "Malformed").to_numpy(dtype=np.int32),
+        applicable=(~status.isin(["Not Applicable", "Error", "Timeout"])).to_numpy(dtype=np.int32),
+    )
+
+
+def _confidence_stats(grouped):
+    confidence = grouped["Confidence"]
+    return pd.DataFrame({
+        "mean_confidence": confidence.mean(),
+        "p10_confidence": confidence.quantile(0.1),
+        "median_confidence": confidence.median(),
+    })
+
+
+def site_summary(results):
+    """Per-site URL counts, pass rates and confidence distribution."""
+    flagged = _with_flags(results)
+    grouped = flagged.groupby("Site", observed=True)
+    summary = grouped.agg(
+        urls=("URL", "nunique"),
+        tests=("Test", "size"),
+        passed=("passed", "sum"),
+        applicable=("applicable", "sum"),
+        issues=("Issue Count", "sum"),
+    )
+    summary["pass_rate"] = np.divide(
+        summary["passed"], summary["applicable"],
+        out=np.zeros(len(summary)), where=summary["applicable"].to_numpy() > 0,
+    )
+    return summary.join(_confidence_stats(grouped)).reset_index()
+
+
+def check_summary(results):
+    """Per-site, per-check pass rates and confidence distribution."""
+    flagged = _with_flags(results)
+    grouped = flagged.groupby(["Site", "Test"], observed=True)
+    summary = grouped.agg(
+        urls=("URL", "size"),
+        passed=("passed", "sum"),
+        applicable=("applicable", "sum"),
+        issues=("Issue Count", "sum"),
+    )
+    summary["pass_rate"] = np.divide(
+        summary["passed"], summary["applicable"],
+        out=np.zeros(len(summary)), where=summary["applicable"].to_numpy() > 0,
+    )
+    return summary.join(_confidence_stats(grouped)).reset_index()
+
+
+def issue_code_summary(issues):
+    """Per-site, per-issue-code totals and the number of affected URLs."""
+    grouped = issues.groupby(["Site", "Test", "Issue Code", "Issue Kind"], observed=True)
+    summary = grouped.agg(occurrences=("Count", "sum"), affected_urls=("URL", "nunique"))
+    return summary.reset_index().sort_values("occurrences", ascending=False)
+
+
+def worst_offenders(results, limit=50):
+    """URLs with the lowest mean confidence, ties broken by the most issues."""
+    per_url = _with_flags(results).groupby(["Site", "URL"], observed=True).agg(
+        mean_confidence=("Confidence", "mean"),
+        issues=("Issue Count", "sum"),
+        failed_tests=("failed", "sum"),
+    )
+    return per_url.sort_values(["mean_confidence", "issues"], ascending=[True, False]).head(limit).reset_index()
+
+
+def write_site_summary(results_file, output_file=None, limit=50):
+    """
+    Writes the site-level summary workbook for a batch.
+
+    Args:
+        results_file (str): Summary workbook of the batch; its datasets are found next to it.
+        output_file (str, optional): Destination. Defaults to `<workbook>_site_summary.xlsx`.
+        limit (int): Number of worst-offender URLs to list.
+
+    Returns:
+        str: Path of the written workbook, or None when the batch has no records.
+    """
+    results_csv, issues_csv = dataset_paths(results_file)
+    if not os.path.exists(results_csv):
+        return None
+    results, issues = load_batch(results_csv, issues_csv)
+    output_file = output_file or f"{os.path.splitext(results_file)[0]}_site_summary.xlsx"
+
+    with pd.ExcelWriter(output_file, engine="openpyxl") as writer:
+        site_summary(results).to_excel(writer, sheet_name="Site Summary", index=False)
+        check_summary(results).to_excel(writer, sheet_name="Check Summary", index=False)
+        if issues is not None:
+            issue_code_summary(issues).to_excel(writer, sheet_name="Issue Codes", index=False)
+        worst_offenders(results, limit).to_excel(writer, sheet_name="Worst Offenders", index=False)
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the site-level summary of a batch run.")
+    parser.add_argument("results_file", help="Summary workbook (WCAG1.3.1_<timestamp>.xlsx) of the batch.")
+    parser.add_argument("--output", help="Destination workbook.")
+    parser.add_argument("--worst", type=int, default=50, help="Number of worst-offender URLs to list.")
+    args = parser.parse_args()
+
+    output_file = write_site_summary(args.results_file, args.output, args.worst)
+    if output_file:
+        print(f"Site summary saved to {output_file}.")
+    else:
+        print(f"No batch records found next to {args.results_file}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# utils/browser_pool.py
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from playwright.async_api import async_playwright
+from utils.page_capture import capture_inputs
+
+
+class BrowserPool:
+    """
+    Keeps one headless Chromium warm and serves page fetches from any thread.
+
+    Playwright's async API runs on a private event loop in a background
+    thread; each fetch gets its own browser context so pages never share
+    cookies or storage. At most `size` pages are open at the same time. A
+    fetch that outlasts its timeout is cancelled and its context closed, so
+    a hung page never blocks the calling thread for good.
+    """
+
+    def __init__(self, size=4, navigation_timeout=60):
+        self.size = size
+        self.navigation_timeout = navigation_timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+        self._playwright = None
+        self._browser = None
+        self._slots = None
+
+    def start(self):
+        """Starts the event loop thread and launches the browser."""
+        self._thread.start()
+        self._call(self._start())
+        logging.info(f"Browser pool started with {self.size} slots.")
+        return self
+
+    def stop(self):
+        """Closes the browser and stops the event loop thread."""
+        try:
+            self._call(self._stop())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+
+    def fetch(self, url, timeout=None):
+        """Fetches the rendered HTML of `url`, blocking the calling thread for at most `timeout` seconds."""
+        return self.fetch_page(url, timeout=timeout)[0]
+
+    def fetch_page(self, url, capture=(), timeout=None):
+        """Fetches the rendered HTML of `url` and the page inputs named in `capture`."""
+        try:
+            return self._call(self._fetch(url, capture), timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Fetching {url} did not finish in {timeout} seconds.")
+
+    def _call(self, coroutine, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # Cancelling the task closes its browser context (and page) on the loop
+            future.cancel()
+            raise
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Semaphore(self.size)
+        await self._launch()
+
+    async def _launch(self):
+        self._browser = await self._playwright.chromium.launch(headless=True)
+
+    async def _stop(self):
+        if self._browser:
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+
+    async def _fetch(self, url, capture=()):
+        async with self._slots:
+            # Relaunch if the browser crashed since the last fetch
+            if not self._browser.is_connected():
+                logging.warning("Browser disconnected; relaunching.")
+                await self._launch()
+            context = await self._browser.new_context()
+            try:
+                page = await context.new_page()
+                await page.goto(url, timeout=self.navigation_timeout * 1000)
+                return await page.content(), await capture_inputs(page, capture)
+            except Exception as e:
+                raise RuntimeError(f"Error fetching HTML content for {url}: {e}")
+            finally:
+                try:
+                    await asyncio.wait_for(context.close(), self.navigation_timeout)
+                except Exception as e:
+                    logging.warning(f"Error closing the browser context of {url}: {e}")
@@ -1,13 +1,32 @@
+"""
+CSV helpers for URL inventories and result logs.
+
+iter_csv() reads a file as a stream, one row at a time, so memory stays flat
+however long the file is. Result logs that grow row by row use a
+CsvAppender: the file stays open, rows are buffered and written once enough
+have gathered or a few seconds have passed.
+"""
+
 import csv
+import io
+import os
+import atexit
 import shutil
+import threading
+
+# Rows a CsvAppender buffers before writing them, and seconds it may hold them
+APPEND_BUFFER_ROWS = 1000
+APPEND_MAX_DELAY = 5.0
 
 # Function to read from a CSV file and return the rows
 def read_csv(file_path):
     """Reads a CSV file and returns a list of rows as dictionaries."""
+    return list(iter_csv(file_path))
+
+def iter_csv(file_path):
+    """Yields the rows of a CSV file as dictionaries, reading it as a stream."""
     with open(file_path, newline='', encoding='utf-8-sig') as csvfile:
-        reader = csv.DictReader(csvfile)
-        rows = list(reader)
-    return rows
+        yield from csv.DictReader(csvfile)
 
 # Function to write to a CSV file
 def write_csv(file_path, rows, fieldnames):
@@ -28,6 +47,101 @@ def append_csv(file_path, rows, fieldnames):
         for row in rows:
             writer.writerow(row)
 
+class CsvAppender:
+    """
+    Long-lived, buffered appender for a CSV file.
+
+    The file is opened once (the header is written if it is empty). Rows are
+    formatted into a buffer and written when `buffer_rows` have gathered, or
+    `max_delay` seconds after the first buffered row, whichever comes first;
+    flush() and close() write them at once.
+    """
+
+    def __init__(self, file_path, fieldnames, buffer_rows=APPEND_BUFFER_ROWS, max_delay=APPEND_MAX_DELAY):
+        self.file_path = file_path
+        self.buffer_rows = buffer_rows
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._file = open(file_path, 'a', newline='', encoding='utf-8')
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=fieldnames)
+        self._buffered = 0
+        self._timer = None
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+            self._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, rows):
+        """Buffers rows (dictionaries) for writing."""
+        with self._lock:
+            for row in rows:
+                self._writer.writerow(row)
+                self._buffered += 1
+            if self._buffered >= self.buffer_rows:
+                self._flush()
+            elif self._buffered and self._timer is None and self.max_delay is not None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        data = self._buffer.getvalue()
+        if data:
+            self._file.write(data)
+            self._file.flush()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        self._buffered = 0
+
+    def flush(self):
+        """Writes the buffered rows to the file."""
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+_appenders = {}
+_appenders_lock = threading.Lock()
+
+def get_appender(file_path, fieldnames):
+    """The shared CsvAppender of a file, opened on first use and closed at exit."""
+    key = os.path.abspath(file_path)
+    with _appenders_lock:
+        appender = _appenders.get(key)
+        if appender is None:
+            appender = _appenders[key] = CsvAppender(file_path, fieldnames)
+        return appender
+
+def flush_appenders():
+    """Writes the rows buffered by every shared appender, e.g. before the files are read."""
+    with _appenders_lock:
+        appenders = list(_appenders.values())
+    for appender in appenders:
+        appender.flush()
+
+@atexit.register
+def close_appenders():
+    """Writes and closes every shared appender."""
+    with _appenders_lock:
+        appenders = list(_appenders.values())
+        _appenders.clear()
+    for appender in appenders:
+        appender.close()
+
 # Function to create a backup of a CSV file
 def backup_csv(original_file, backup_file):
     """Backs up the original CSV file to a backup location."""
@@ -1,13 +1,113 @@
 # utils/file_manager.py
 
+"""
+Timestamped archive folders with an index, retention and compaction.
+
+Each page's archive directory keeps an `archive_index.json` listing its
+archives oldest first, with their creation time, size in bytes and whether
+they have been compacted into a `<timestamp>.tar.gz` bundle. Listing and
+rotation read that one small file instead of listing the directory and
+stat-ing every archive; the index is rebuilt from the directory once if it
+is missing. apply_retention() removes archives beyond a count, a total size
+or an age, and compacts all but the newest few into compressed bundles;
+create_archive_folders() runs it when given a retention policy, and it can
+be run over a whole report directory:
+
+    python -m utils.file_manager reports/ --keep-last 10 --compact-after 3
+"""
+
 import os
+import json
+import argparse
+import time
+import shutil
+import tarfile
 import logging
-from datetime import datetime
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+ARCHIVE_INDEX = "archive_index.json"
+BUNDLE_SUFFIX = ".tar.gz"
+
+
+def _index_path(archive_path):
+    return os.path.join(archive_path, ARCHIVE_INDEX)
 
-def create_archive_folders(report_directory, page_name):
-    # Create a timestamped folder to store archives
+
+def _folder_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _rebuild_index(archive_path):
+    # One-time scan for archive directories created before the index existed
+    entries = []
+    for name in os.listdir(archive_path):
+        path = os.path.join(archive_path, name)
+        compacted = name.endswith(BUNDLE_SUFFIX)
+        if not (os.path.isdir(path) or compacted):
+            continue
+        entries.append({
+            "name": name[:-len(BUNDLE_SUFFIX)] if compacted else name,
+            "created": os.path.getctime(path),
+            "bytes": _folder_size(path),
+            "compacted": compacted,
+        })
+    entries.sort(key=lambda entry: entry["created"])
+    return entries
+
+
+def load_archive_index(archive_path):
+    """Returns the archive entries of an archive directory, oldest first."""
+    if not os.path.exists(archive_path):
+        return []
+    try:
+        with open(_index_path(archive_path), encoding="utf-8") as index_file:
+            return json.load(index_file)
+    except FileNotFoundError:
+        entries = _rebuild_index(archive_path)
+        save_archive_index(archive_path, entries)
+        return entries
+    except ValueError as e:
+        logging.error(f"Archive index of {archive_path} is damaged, rebuilding it: {e}")
+        entries = _rebuild_index(archive_path)
+        save_archive_index(archive_path, entries)
+        return entries
+
+
+def save_archive_index(archive_path, entries):
+    # Written to a temporary file and swapped in, so readers never see a partial index
+    os.makedirs(archive_path, exist_ok=True)
+    temporary_path = _index_path(archive_path) + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as index_file:
+        json.dump(entries, index_file)
+    os.replace(temporary_path, _index_path(archive_path))
+
+
+def archive_entry_path(archive_path, entry):
+    """Path of an indexed archive: its folder, or its bundle once compacted."""
+    return os.path.join(archive_path, entry["name"] + (BUNDLE_SUFFIX if entry["compacted"] else ""))
+
+
+def create_archive_folders(report_directory, page_name, retention=None):
+    """
+    Creates a timestamped archive folder (code, images, media reports) and registers it in the index.
+
+    Earlier archives of the page are complete by then, so any whose size was never
+    recorded by finalize_archive() are measured now. Given `retention` (keyword
+    arguments of apply_retention), old archives are removed or compacted afterwards.
+    """
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    archive_folder = os.path.join(report_directory, page_name, 'archive', timestamp)
+    archive_path = os.path.join(report_directory, page_name, 'archive')
+    archive_folder = os.path.join(archive_path, timestamp)
 
     code_folder = os.path.join(archive_folder, 'code')
     image_folder = os.path.join(archive_folder, 'images')
@@ -19,18 +119,152 @@ def create_archive_folders(report_directory, page_name):
         os.makedirs(media_report_folder, exist_ok=True)
         # Highlight: Added logging to verify folder creation
         logging.debug(f"Created folders: code - {code_folder}, images - {image_folder}, media reports - {media_report_folder}")
+        entries = load_archive_index(archive_path)
+        if not entries or entries[-1]["name"] != timestamp:
+            _measure_unsized(archive_path, entries)
+            entries.append({"name": timestamp, "created": time.time(), "bytes": 0, "compacted": False})
+            save_archive_index(archive_path, entries)
+        if retention:
+            apply_retention(archive_path, **retention)
     except Exception as e:
         # Highlight: Added error handling for folder creation
         logging.error(f"Error creating archive folders: {e}")
 
     return code_folder, image_folder, media_report_folder
 
-def list_sorted_archives(archive_path):
-    if not os.path.exists(archive_path):
-        return []
 
-    # List all directories within the archive folder
-    archives = [os.path.join(archive_path, d) for d in os.listdir(archive_path) if os.path.isdir(os.path.join(archive_path, d))]
-    # Sort archives by creation time, newest first
-    archives.sort(key=os.path.getctime, reverse=True)
-    return archives
+def _measure_unsized(archive_path, entries):
+    # Sizes of archive folders registered but never finalized
+    for entry in entries:
+        if not entry["bytes"] and not entry["compacted"]:
+            entry["bytes"] = _folder_size(archive_entry_path(archive_path, entry))
+
+
+def finalize_archive(archive_folder):
+    """Records the size of a written archive folder in its index; returns the size in bytes."""
+    archive_path, name = os.path.split(os.path.normpath(archive_folder))
+    size = _folder_size(archive_folder)
+    entries = load_archive_index(archive_path)
+    for entry in reversed(entries):
+        if entry["name"] == name:
+            entry["bytes"] = size
+            save_archive_index(archive_path, entries)
+            break
+    return size
+
+
+def list_sorted_archives(archive_path, include_compacted=False):
+    """
+    Archive folders of a page, newest first, read from the index rather than stat-ing every folder.
+
+    Compacted archives are `<timestamp>.tar.gz` files rather than folders, so they
+    are only listed with `include_compacted`.
+    """
+    return [
+        archive_entry_path(archive_path, entry)
+        for entry in reversed(load_archive_index(archive_path))
+        if include_compacted or not entry["compacted"]
+    ]
+
+
+def compact_archive(archive_path, entry):
+    """Packs an archive folder into `<name>.tar.gz` and removes the folder; updates the entry."""
+    folder = os.path.join(archive_path, entry["name"])
+    bundle_path = folder + BUNDLE_SUFFIX
+    temporary_path = bundle_path + ".tmp"
+    with tarfile.open(temporary_path, "w:gz") as bundle:
+        bundle.add(folder, arcname=entry["name"])
+    os.replace(temporary_path, bundle_path)
+    shutil.rmtree(folder)
+    entry["compacted"] = True
+    entry["bytes"] = os.path.getsize(bundle_path)
+    return bundle_path
+
+
+def _remove_archive(archive_path, entry):
+    path = archive_entry_path(archive_path, entry)
+    try:
+        if entry["compacted"]:
+            os.remove(path)
+        else:
+            shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    logging.info(f"Removed archive {path}")
+
+
+def apply_retention(archive_path, keep_last=None, max_bytes=None, max_age=None, compact_after=None):
+    """
+    Removes old archives and compacts the rest of the older ones.
+
+    Args:
+        archive_path (str): Archive directory of a page (holding the index).
+        keep_last (int, optional): Keep at most this many archives.
+        max_bytes (int, optional): Remove the oldest archives until the total size fits.
+        max_age (timedelta or float, optional): Remove archives older than this (seconds if a number).
+        compact_after (int, optional): Compact every archive but the newest `compact_after` ones.
+
+    Returns:
+        dict: Number of archives "removed" and "compacted".
+    """
+    entries = load_archive_index(archive_path)
+    expired = 0
+    if max_age is not None:
+        seconds = max_age.total_seconds() if isinstance(max_age, timedelta) else max_age
+        # Entries are oldest first, so the expired ones are a prefix
+        expired = bisect_left(entries, time.time() - seconds, key=lambda entry: entry["created"])
+    if keep_last is not None:
+        expired = max(expired, len(entries) - keep_last)
+    # The newest archive is always kept: it may be the one just created
+    expired = max(min(expired, len(entries) - 1), 0)
+    if max_bytes is not None:
+        # Archives whose size was never recorded would otherwise count as empty
+        _measure_unsized(archive_path, entries)
+        total = sum(entry["bytes"] for entry in entries[expired:])
+        while expired < len(entries) - 1 and total > max_bytes:
+            total -= entries[expired]["bytes"]
+            expired += 1
+
+    for entry in entries[:expired]:
+        _remove_archive(archive_path, entry)
+    entries = entries[expired:]
+
+    compacted = 0
+    if compact_after is not None:
+        for entry in entries[:max(len(entries) - compact_after, 0)]:
+            if entry["compacted"]:
+                continue
+            try:
+                compact_archive(archive_path, entry)
+                compacted += 1
+            except Exception as e:
+                logging.error(f"Error compacting archive {entry['name']}: {e}")
+
+    save_archive_index(archive_path, entries)
+    return {"removed": expired, "compacted": compacted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a retention policy to the page archives of a report directory.")
+    parser.add_argument("report_directory", help="Directory holding one folder per page.")
+    parser.add_argument("--keep-last", type=int, help="Archives kept per page (at least the newest one is kept).")
+    parser.add_argument("--max-mb", type=float, help="Total size of a page's archives, in MB.")
+    parser.add_argument("--max-days", type=float, help="Remove archives older than this many days.")
+    parser.add_argument("--compact-after", type=int, help="Compact every archive but the newest N into .tar.gz.")
+    args = parser.parse_args()
+
+    retention = {
+        "keep_last": args.keep_last,
+        "max_bytes": None if args.max_mb is None else int(args.max_mb * 1024 * 1024),
+        "max_age": None if args.max_days is None else timedelta(days=args.max_days),
+        "compact_after": args.compact_after,
+    }
+    for page_name in sorted(os.listdir(args.report_directory)):
+        archive_path = os.path.join(args.report_directory, page_name, 'archive')
+        if os.path.isdir(archive_path):
+            counts = apply_retention(archive_path, **retention)
+            print(f"{page_name}: removed {counts['removed']}, compacted {counts['compacted']}")
+
+
+if __name__ == "__main__":
+    main()
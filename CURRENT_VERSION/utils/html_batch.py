@@ -0,0 +1,96 @@
+# utils/html_batch.py
+
+import os
+import glob
+import gzip
+import logging
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.pipeline import run_checks
+
+"""
+Browserless batch auditing of saved HTML files.
+
+Usable from Python:
+
+    from utils.html_batch import audit_html_files
+    for path, results in audit_html_files(["pages/", "more/*.html.gz"]):
+        ...
+"""
+
+HTML_SUFFIXES = ('.html', '.htm', '.html.gz', '.htm.gz')
+
+
+def iter_html_files(inputs):
+    """
+    Expands files, directories and glob patterns into HTML file paths.
+
+    Args:
+        inputs (list): Paths, directories (walked recursively) or glob patterns.
+
+    Yields:
+        str: Path of each HTML file, each one at most once.
+    """
+    seen = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            candidates = (
+                os.path.join(root, name)
+                for root, _, names in os.walk(entry)
+                for name in sorted(names)
+            )
+        elif os.path.isfile(entry):
+            candidates = [entry]
+        else:
+            candidates = sorted(glob.iglob(entry, recursive=True))
+
+        for path in candidates:
+            if path.lower().endswith(HTML_SUFFIXES) and os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                yield path
+
+
+def read_html_file(path):
+    """
+    Reads an HTML or gzip-compressed HTML file and returns its raw bytes.
+
+    The bytes are decoded when the page is parsed (Document.from_html), which
+    honours a BOM or <meta charset> instead of assuming UTF-8.
+    """
+    opener = gzip.open if path.lower().endswith('.gz') else open
+    with opener(path, 'rb') as html_file:
+        return html_file.read()
+
+
+def audit_html_file(path, checks=None):
+    """Runs the checks on one saved HTML file; returns (path, results or None)."""
+    try:
+        html_content = read_html_file(path)
+    except Exception as e:
+        logging.error(f"Error reading {path}: {e}")
+        return path, None
+    return path, run_checks(html_content, checks)
+
+
+def audit_html_files(inputs, workers=None, chunksize=4, checks=None):
+    """
+    Audits saved HTML files in parallel across CPU cores, without a browser.
+
+    Args:
+        inputs (list): Files, directories or glob patterns (see iter_html_files).
+        workers (int, optional): Worker processes. Defaults to the CPU count.
+        chunksize (int): Files handed to a worker at a time.
+        checks (str, list or dict, optional): Check selection or loaded tests (see utils.pipeline.load_tests).
+
+    Yields:
+        tuple: (path, results) in input order; results is None when the file could not be read.
+    """
+    paths = iter_html_files(inputs)
+    if workers == 1:
+        for path in paths:
+            yield audit_html_file(path, checks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(partial(audit_html_file, checks=checks), paths, chunksize=chunksize)
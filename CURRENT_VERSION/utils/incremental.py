@@ -0,0 +1,319 @@
+# utils/incremental.py
+
+import os
+import json
+import hashlib
+import logging
+from checks.WCAG_1_3_1.document import ELEMENT, MULTI_VALUED_ATTRIBUTES, Document
+from checks.WCAG_1_3_1.issues import jsonable
+from utils.memory import BYTES_PER_HTML_CHAR
+from utils.pipeline import check_inputs, last_document_reader
+
+"""
+Incremental re-audit support.
+
+Each audited page is reduced to a structural fingerprint tree: one entry per
+element holding its tag, parent index, source line, role and a hash of its
+whole subtree. Every check gets a signature from the parts of the tree it
+reads; the signatures and results are cached, and on the next run only the
+checks whose signature changed are executed again; the other results are
+carried forward unchanged.
+"""
+
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+REGION_TAGS = {'header', 'nav', 'main', 'footer', 'aside'}
+LANDMARK_ROLES = {'banner', 'navigation', 'main', 'contentinfo'}
+LANDMARK_TAGS = {'header', 'nav', 'main', 'footer', 'section', 'aside', 'article', 'form', 'hgroup'}
+INPUT_TAGS = {'input', 'textarea', 'select'}
+
+
+def _digest(parts):
+    """Returns a short hex digest for a sequence of strings."""
+    hasher = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        hasher.update(part.encode('utf-8', 'surrogatepass'))
+        hasher.update(b'\x00')
+    return hasher.hexdigest()
+
+
+def _attribute_part(tag, key, value):
+    # Space-separated attributes hash as the value lists earlier versions stored
+    if key in MULTI_VALUED_ATTRIBUTES['*'] or key in MULTI_VALUED_ATTRIBUTES.get(tag, ()):
+        return f"{key}={value.split()}"
+    return f"{key}={value}"
+
+
+def build_fingerprint(html, document=None):
+    """
+    Builds the structural fingerprint tree of a document.
+
+    Args:
+        html (str): Raw HTML of the page.
+        document (Document, optional): The page already parsed from `html`.
+
+    Returns:
+        dict: Parallel lists (tags, parents, lines, roles, hashes) in document order.
+    """
+    if document is None:
+        document = Document.from_html(html)
+    elements = document.find_all()
+    index_of = {node: index for index, node in enumerate(elements)}
+
+    parents = [index_of.get(document.parents[node], -1) for node in elements]
+    hashes = [None] * len(elements)
+    ends = document.ends
+
+    # Children always follow their parent in document order, so walking the
+    # list backwards hashes every subtree before the element that contains it.
+    for index in range(len(elements) - 1, -1, -1):
+        node = elements[index]
+        tag = document.name(node)
+        parts = [tag]
+        parts.extend(_attribute_part(tag, key, value) for key, value in sorted(document.attributes(node)))
+        child = node + 1
+        while child < ends[node]:
+            if document.kinds[child] == ELEMENT:
+                parts.append("@" + hashes[index_of[child]])
+            else:
+                parts.append("#" + document.node_text(child))
+            child = ends[child]
+        hashes[index] = _digest(parts)
+
+    return {
+        "tags": [document.name(node) for node in elements],
+        "parents": parents,
+        "lines": [document.line(node) for node in elements],
+        "roles": [document.get(node, 'role', '') for node in elements],
+        "hashes": hashes,
+    }
+
+
+def _has_ancestor(fingerprint, index, tags):
+    """Checks whether any ancestor of the element at `index` has one of `tags`."""
+    parent = fingerprint["parents"][index]
+    while parent != -1:
+        if fingerprint["tags"][parent] in tags:
+            return True
+        parent = fingerprint["parents"][parent]
+    return False
+
+
+def _elements(fingerprint, tags, with_lines=False):
+    """Yields the subtree hash (and line) of every element whose tag is in `tags`."""
+    for index, tag in enumerate(fingerprint["tags"]):
+        if tag in tags:
+            if with_lines:
+                yield f"{tag}:{fingerprint['hashes'][index]}:{fingerprint['lines'][index]}"
+            else:
+                yield f"{tag}:{fingerprint['hashes'][index]}"
+
+
+def _heading_projection(fingerprint):
+    tags, roles = fingerprint["tags"], fingerprint["roles"]
+    candidates = HEADING_TAGS | {'div', 'span'}
+    parts = [f"count:{sum(1 for tag in tags if tag in candidates)}"]
+    for index, tag in enumerate(tags):
+        if tag in HEADING_TAGS or (tag in ('div', 'span') and roles[index] == 'heading'):
+            parts.append(f"{tag}:{fingerprint['hashes'][index]}:{fingerprint['lines'][index]}")
+    return parts
+
+
+def _list_projection(fingerprint):
+    parts = list(_elements(fingerprint, {'ul', 'ol', 'div', 'section'}))
+    orphans = sum(
+        1 for index, tag in enumerate(fingerprint["tags"])
+        if tag == 'li' and not _has_ancestor(fingerprint, index, {'ul', 'ol'})
+    )
+    parts.append(f"orphans:{orphans}")
+    return parts
+
+
+def _ancestor_tags(fingerprint, index):
+    """Tags of the ancestors of the element at `index`, nearest first."""
+    tags = []
+    parent = fingerprint["parents"][index]
+    while parent != -1:
+        tags.append(fingerprint["tags"][parent])
+        parent = fingerprint["parents"][parent]
+    return tags
+
+
+def _form_projection(fingerprint):
+    parts = list(_elements(fingerprint, {'form'}, with_lines=True))
+    # An input may be labelled by a <label> ancestor outside any form
+    for index, tag in enumerate(fingerprint["tags"]):
+        if tag in INPUT_TAGS:
+            ancestors = "/".join(_ancestor_tags(fingerprint, index))
+            parts.append(f"{tag}:{fingerprint['hashes'][index]}:{fingerprint['lines'][index]}:{ancestors}")
+    return parts
+
+
+def _structural_projection(fingerprint):
+    parts = list(_elements(fingerprint, {'article', 'section', 'div'}, with_lines=True))
+    summary = document_summary(fingerprint)
+    parts.extend(summary["regions"])
+    parts.extend(summary["roles"])
+    return parts
+
+
+# Each check is keyed by its function name so both entry points can share the
+# projections regardless of how they label the tests.
+CHECK_PROJECTIONS = {
+    "check_heading_markup": _heading_projection,
+    "test_list_markup": _list_projection,
+    "test_table_markup": lambda fp: list(_elements(fp, {'table'})),
+    "test_blockquote_markup": lambda fp: list(_elements(fp, {'blockquote'})),
+    "test_landmark_markup": lambda fp: list(_elements(fp, LANDMARK_TAGS, with_lines=True)),
+    "test_structural_markup": _structural_projection,
+    "test_form_markup": _form_projection,
+}
+
+
+def document_summary(fingerprint):
+    """Summarizes document-level facts (regions and landmark roles present)."""
+    tags, roles = set(fingerprint["tags"]), set(fingerprint["roles"])
+    return {
+        "regions": sorted(REGION_TAGS & tags),
+        "roles": sorted(LANDMARK_ROLES & roles),
+    }
+
+
+def check_signatures(fingerprint):
+    """Computes one signature per check from the parts of the tree it reads."""
+    return {
+        check_name: _digest(projection(fingerprint))
+        for check_name, projection in CHECK_PROJECTIONS.items()
+    }
+
+
+def _input_key(value):
+    """JSON fallback for captured inputs: a Document is keyed by a digest of its markup."""
+    if isinstance(value, Document):
+        return _digest([value.decode(0)])
+    return str(value)
+
+
+def _cache_path(cache_dir, url):
+    name = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def load_audit_cache(cache_dir, url):
+    """Loads the cached check signatures and results of a previous run, if any."""
+    path = _cache_path(cache_dir, url)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except Exception as e:
+        logging.error(f"Error reading audit cache {path}: {e}")
+        return None
+
+
+def save_audit_cache(cache_dir, url, entry):
+    """Stores the check signatures and results of the current run."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, url)
+    try:
+        with open(path, "w", encoding="utf-8") as cache_file:
+            json.dump(entry, cache_file, default=jsonable)
+        return True
+    except Exception as e:
+        logging.error(f"Error writing audit cache {path}: {e}")
+        return False
+
+
+def run_checks_incrementally(url, html, tests, cache_dir, on_phase=None, on_result=None, inputs=None, memory=None):
+    """
+    Runs only the checks affected by changes since the previous run.
+
+    Args:
+        url (str): URL of the page, used as the cache key.
+        html (str): Raw HTML of the page.
+        tests (dict): Test name mapped to its check function.
+        cache_dir (str): Directory holding the audit cache.
+        on_phase (callable, optional): Called with "parse" and then each test name that is re-run.
+        on_result (callable, optional): Called with the test name and result of each test.
+        inputs (dict, optional): Captured page inputs passed to the checks that accept them.
+        memory (MemoryMonitor, optional): Switches the re-run checks to lean mode once the page
+            exceeds its memory budget (see utils.memory); lean results are not cached.
+
+    Returns:
+        dict: Test name mapped to its (fresh or carried forward) result.
+    """
+    if on_phase:
+        on_phase("parse")
+    if memory is not None:
+        memory.check("parse", len(html) * BYTES_PER_HTML_CHAR)
+    document = Document.from_html(html)
+    fingerprint = build_fingerprint(html, document)
+    signatures = check_signatures(fingerprint)
+    previous = load_audit_cache(cache_dir, url) or {}
+    previous_signatures = previous.get("signatures", {})
+    previous_results = previous.get("results", {})
+
+    # Keyed once per input, not once per check that reads it
+    input_keys = {
+        name: json.dumps(value, sort_keys=True, default=_input_key) for name, value in (inputs or {}).items()
+    }
+
+    # The checks share the Document parsed for the fingerprint, unless the browser's was captured
+    shared_inputs = dict(inputs or {})
+    if shared_inputs.get("document") is None:
+        shared_inputs["document"] = document
+    document = None
+    last_reader = last_document_reader(tests) if memory is not None else None
+
+    results = {}
+    stored_results = {}
+    stored_signatures = {}
+    for test_name, test_function in tests.items():
+        lean = False
+        # Tests bound to options (see utils.pipeline.load_tests) are partials
+        check_name = getattr(test_function, "func", test_function).__name__
+        signature = signatures.get(check_name)
+        options = getattr(test_function, "keywords", None)
+        if signature is not None and options:
+            signature = _digest([signature, repr(sorted(options.items()))])
+        # Results computed from other inputs than the HTML are tied to those inputs
+        test_inputs = check_inputs(test_function, inputs)
+        if signature is not None and test_inputs:
+            signature = _digest([signature, *(f"{name}={input_keys[name]}" for name in sorted(test_inputs))])
+        cached = previous_results.get(check_name)
+        if signature is not None and cached is not None and previous_signatures.get(check_name) == signature:
+            logging.info(f"{test_name} unchanged for {url}; reusing previous result.")
+            result = cached
+        else:
+            if on_phase:
+                on_phase(test_name)
+            if memory is not None:
+                lean = memory.check(test_name)
+                test_function = memory.prepare(test_function, shared_inputs)
+            try:
+                result = test_function(html, **check_inputs(test_function, shared_inputs))
+            except Exception as e:
+                logging.error(f"Error during {test_name} for {url}: {e}")
+                result = {
+                    "status": "Error",
+                    "details": [{"Issue": f"Unexpected error occurred: {e}"}],
+                    "confidence": 0.0,
+                }
+        results[test_name] = result
+        if on_result:
+            on_result(test_name, result)
+        # Failed runs are never carried forward, nor results cut short by lean mode.
+        if result.get("status") != "Error" and not lean:
+            stored_results[check_name] = result
+            # The signature as compared above, with the check's options and inputs folded in
+            if signature is not None:
+                stored_signatures[check_name] = signature
+        if memory is not None and test_name == last_reader:
+            memory.release(shared_inputs)
+
+    save_audit_cache(cache_dir, url, {
+        "url": url,
+        "signatures": stored_signatures,
+        "results": stored_results,
+    })
+    return results
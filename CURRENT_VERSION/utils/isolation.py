@@ -0,0 +1,108 @@
+# utils/isolation.py
+
+import os
+import signal
+import logging
+import multiprocessing
+import time
+
+"""
+Hard timeouts for work that may hang (browser fetches, pathological pages).
+
+The work runs in a separate process. On POSIX the process starts its own
+process group, so the Playwright driver and Chromium it spawns are killed
+together with it. The worker reports progress messages back through a pipe;
+the last reported phase tells where a timed-out job stalled.
+"""
+
+
+class WorkerTimeout(Exception):
+    """Raised when isolated work exceeds its time limit."""
+
+    def __init__(self, timeout, phase):
+        super().__init__(f"Timed out after {timeout}s during {phase}")
+        self.timeout = timeout
+        self.phase = phase
+
+
+def _worker_main(target, args, connection):
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    def report(kind, *payload):
+        connection.send((kind, *payload))
+
+    try:
+        report("result", target(*args, report=report))
+    except Exception as e:
+        report("error", f"{type(e).__name__}: {e}")
+    finally:
+        connection.close()
+
+
+def _kill_process_tree(process, grace_period=5):
+    """Stops the worker and everything it spawned."""
+    if hasattr(os, "killpg"):
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                # No group left (or the worker died before creating it)
+                if process.is_alive():
+                    process.kill()
+            if sig == signal.SIGTERM:
+                process.join(grace_period)
+    else:
+        process.terminate()
+        process.join(grace_period)
+        if process.is_alive():
+            process.kill()
+    process.join()
+
+
+def run_in_killable_worker(target, args=(), timeout=120, on_message=None):
+    """
+    Runs `target(*args, report=...)` in a separate process with a hard timeout.
+
+    The target may call `report("phase", name)` or send any other message;
+    every message except the final result is passed to `on_message`.
+
+    Returns:
+        The value returned by the target.
+
+    Raises:
+        WorkerTimeout: The target did not finish in time; it has been killed.
+        RuntimeError: The target raised or the worker died.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_worker_main, args=(target, args, sender), daemon=True)
+    process.start()
+    sender.close()
+
+    phase = "startup"
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not receiver.poll(remaining):
+                raise WorkerTimeout(timeout, phase)
+            try:
+                message = receiver.recv()
+            except EOFError:
+                process.join(1)
+                raise RuntimeError(f"Worker exited unexpectedly (exit code {process.exitcode}) during {phase}")
+            kind, payload = message[0], message[1:]
+            if kind == "result":
+                return payload[0]
+            if kind == "error":
+                raise RuntimeError(payload[0])
+            if kind == "phase":
+                phase = payload[0]
+            if on_message:
+                on_message(kind, *payload)
+    finally:
+        receiver.close()
+        # Always reap the process group, even after a clean finish, so no
+        # browser process outlives its URL.
+        _kill_process_tree(process)
+        logging.debug(f"Worker {process.pid} cleaned up (last phase: {phase}).")
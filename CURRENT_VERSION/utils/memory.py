@@ -0,0 +1,211 @@
+"""
+Per-URL memory accounting and the low-memory ("lean") mode of the checks.
+
+A MemoryMonitor samples the resident memory (RSS) of the process while one
+page is audited, and with `trace` also the peak of Python allocations
+traced by tracemalloc (slower, but independent of what the allocator keeps
+from earlier pages). Given a budget, it is asked before the page is parsed
+and before each check whether memory in use (plus what parsing is expected
+to take) exceeds it; from then on the page is audited lean:
+
+    - checks record at most `max_issues` issues of each kind (totals are
+      still counted, see IssueLimits);
+    - quoted markup is cut to `snippet_chars` characters as it is serialized
+      (Document.snippet_limit);
+    - the Document is released, and garbage collected, as soon as the last
+      check that reads it is done.
+
+The page's MemoryUsage (peaks, budget, and the phase lean mode started in)
+is reported next to its results. RSS counts every page mapped into the
+process, so in a worker forked for the page (see utils.isolation) it
+includes the memory still shared with the parent; the monitor therefore
+also records the RSS it started from, and reports the peak's growth over
+it as the page's own share. The budget applies to the whole RSS.
+"""
+
+import gc
+import os
+import sys
+import inspect
+import logging
+import threading
+import tracemalloc
+from collections import namedtuple
+from functools import partial
+
+from checks.WCAG_1_3_1.issues import IssueLimits
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MB = 1024 * 1024
+
+# Issues per kind and snippet length kept in lean mode
+LEAN_MAX_ISSUES = 50
+LEAN_SNIPPET_CHARS = 200
+
+# Rough peak bytes per character of HTML while a page is parsed into a Document
+BYTES_PER_HTML_CHAR = 8
+
+SAMPLE_INTERVAL = 0.05
+
+MemoryUsage = namedtuple("MemoryUsage", ["start_rss", "peak_rss", "peak_traced", "budget", "lean_from"])
+
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # The process' peak rather than its current RSS (e.g. on macOS, where it is in bytes)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+def lean_check(test_function, max_issues=LEAN_MAX_ISSUES):
+    """The check bound to limits that keep at most `max_issues` issues of each kind."""
+    # Wrappers such as utils.profiling's expose the wrapped check and a way to wrap its lean version
+    rewrap = getattr(test_function, "rewrap", None)
+    if rewrap is None and not isinstance(test_function, partial) and hasattr(test_function, "__wrapped__"):
+        logging.warning(f"Cannot apply lean limits to the wrapped check {test_function.__name__}.")
+        return test_function
+    function = getattr(test_function, "func", test_function)
+    if "limits" not in inspect.signature(function).parameters:
+        return test_function
+    keywords = dict(getattr(test_function, "keywords", None) or {})
+    limits = keywords.get("limits") or IssueLimits()
+    per_kind = max_issues if limits.per_kind is None else min(limits.per_kind, max_issues)
+    keywords["limits"] = limits._replace(per_kind=per_kind)
+    lean = partial(function, **keywords)
+    return rewrap(lean) if rewrap else lean
+
+
+class MemoryMonitor:
+    """
+    Tracks the memory of one page's audit and decides when to audit it lean.
+
+    Used as a context manager around the audit; `usage()` afterwards.
+
+    Args:
+        budget (int, optional): Bytes the process may use before lean mode starts.
+        trace (bool): Also trace Python allocations with tracemalloc.
+        max_issues (int): Issues of each kind kept in lean mode.
+        snippet_chars (int): Length of quoted markup in lean mode.
+        interval (float): Seconds between RSS samples.
+    """
+
+    def __init__(self, budget=None, trace=False, max_issues=LEAN_MAX_ISSUES, snippet_chars=LEAN_SNIPPET_CHARS,
+                 interval=SAMPLE_INTERVAL):
+        self.budget = budget
+        self.trace = trace
+        self.max_issues = max_issues
+        self.snippet_chars = snippet_chars
+        self.interval = interval
+        self.start_rss = None
+        self.peak_rss = 0
+        self.peak_traced = None
+        self.lean_from = None
+        self._started_tracing = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def lean(self):
+        return self.lean_from is not None
+
+    def __enter__(self):
+        if self.trace:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        self.start_rss = self.sample()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        if self.trace:
+            self.peak_traced = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Records the current RSS and returns it."""
+        rss = current_rss()
+        if rss is not None and rss > self.peak_rss:
+            self.peak_rss = rss
+        return rss
+
+    def check(self, phase, expected=0):
+        """
+        Switches to lean mode, from `phase` on, if the memory in use plus
+        `expected` more bytes exceeds the budget. Returns whether the audit is lean.
+        """
+        if self.budget is None or self.lean:
+            return self.lean
+        in_use = self.sample()
+        if in_use is None and self.trace:
+            in_use = tracemalloc.get_traced_memory()[0]
+        if in_use is not None and in_use + expected > self.budget:
+            self.lean_from = phase
+            logging.warning(
+                f"Memory {(in_use + expected) / MB:.0f} MB exceeds the {self.budget / MB:.0f} MB budget "
+                f"at {phase}; continuing in lean mode."
+            )
+            gc.collect()
+        return self.lean
+
+    def prepare(self, test_function, inputs):
+        """The check to run in the current mode; in lean mode also cuts the snippets of the inputs' Document."""
+        if not self.lean:
+            return test_function
+        document = inputs.get("document")
+        if document is not None:
+            document.snippet_limit = self.snippet_chars
+        return lean_check(test_function, self.max_issues)
+
+    def release(self, inputs):
+        """Drops the Document from the inputs once no check needs it."""
+        if inputs.pop("document", None) is not None and self.lean:
+            gc.collect()
+
+    def usage(self):
+        """The MemoryUsage so far (the final one once the monitor has exited)."""
+        self.sample()
+        peak_traced = self.peak_traced
+        if self.trace and peak_traced is None and tracemalloc.is_tracing():
+            peak_traced = tracemalloc.get_traced_memory()[1]
+        return MemoryUsage(self.start_rss, self.peak_rss, peak_traced, self.budget, self.lean_from)
+
+
+MEMORY_HEADERS = [
+    "Tested URL", "Peak RSS (MB)", "RSS Growth (MB)", "Peak Traced (MB)", "Budget (MB)", "Lean From",
+]
+
+
+def memory_row(url, usage):
+    """Report row of a page's MemoryUsage."""
+    def megabytes(value):
+        return None if value is None else round(value / MB, 1)
+
+    growth = None if usage.start_rss is None else max(usage.peak_rss - usage.start_rss, 0)
+    return [
+        url, megabytes(usage.peak_rss), megabytes(growth), megabytes(usage.peak_traced),
+        megabytes(usage.budget), usage.lean_from,
+    ]
@@ -0,0 +1,69 @@
+# utils/page_capture.py
+
+"""
+Extra page inputs captured from the browser next to `page.content()`.
+
+Checks that can use one of these inputs accept it as a keyword argument of
+the same name (see utils.pipeline.check_inputs); the others keep working
+from the HTML alone.
+
+    accessibility_tree  The accessibility tree from a Chrome DevTools
+                        `Accessibility.getFullAXTree`, in snapshot form (see
+                        checks.WCAG_1_3_1.accessibility_tree): the roles,
+                        names and heading levels assistive technology sees.
+    document            The live DOM from a Chrome DevTools
+                        `DOMSnapshot.captureSnapshot`, as a
+                        checks.WCAG_1_3_1.document.Document; the checks query
+                        it instead of re-parsing the serialized HTML.
+
+Both are read over one CDP session per page (Chromium only).
+"""
+
+from checks.WCAG_1_3_1.accessibility_tree import tree_from_ax_nodes
+from checks.WCAG_1_3_1.document import Document
+
+
+async def _accessibility_tree(client):
+    # The full tree keeps the text leaves that landmark checks measure
+    result = await client.send("Accessibility.getFullAXTree")
+    return tree_from_ax_nodes(result["nodes"])
+
+
+async def _document(client):
+    # No computed styles are needed, only the node tree
+    snapshot = await client.send("DOMSnapshot.captureSnapshot", {"computedStyles": []})
+    return Document.from_dom_snapshot(snapshot)
+
+
+CAPTURES = {
+    "accessibility_tree": _accessibility_tree,
+    "document": _document,
+}
+
+
+def validate_capture(capture):
+    """Raises ValueError for unknown capture names."""
+    unknown = [name for name in capture if name not in CAPTURES]
+    if unknown:
+        raise ValueError(f"Unknown page capture {', '.join(unknown)}. Available: {', '.join(CAPTURES)}.")
+
+
+async def capture_inputs(page, capture=()):
+    """
+    Captures the requested inputs from a loaded page.
+
+    Args:
+        page: Playwright page, already navigated.
+        capture (iterable): Names from CAPTURES.
+
+    Returns:
+        dict: Capture name mapped to its value.
+    """
+    validate_capture(capture)
+    if not capture:
+        return {}
+    client = await page.context.new_cdp_session(page)
+    try:
+        return {name: await CAPTURES[name](client) for name in capture}
+    finally:
+        await client.detach()
@@ -0,0 +1,123 @@
+# utils/pipeline.py
+
+import inspect
+import logging
+from functools import partial
+from checks.WCAG_1_3_1.document import Document
+from checks.WCAG_1_3_1.prefilter import may_contain
+from checks.WCAG_1_3_1.registry import CHECKS, find_check, load_check, select_checks
+from utils.memory import BYTES_PER_HTML_CHAR
+
+# Test names in report order, as used in the summary workbook
+TEST_NAMES = [spec.label for spec in CHECKS]
+
+
+def load_tests(selection=None, limits=None, sampling=None):
+    """
+    Imports the selected checks only.
+
+    Args:
+        selection (str, list or dict, optional): Check names or codes, e.g. "heading,table" or
+            ["1.3.1 (g)"]. None selects every check; a dict of loaded tests is returned as is.
+        limits (IssueLimits, optional): Issue cap and early-exit setting passed to every check.
+        sampling (Sampling, optional): Sample size for the checks that support sampling.
+
+    Returns:
+        dict: Test name mapped to its check function, in report order.
+    """
+    if isinstance(selection, dict):
+        return selection
+    options = {name: value for name, value in (("limits", limits), ("sampling", sampling)) if value}
+    tests = {}
+    for spec in select_checks(selection):
+        test_function = load_check(spec)
+        # Only bind the options a check accepts
+        parameters = inspect.signature(test_function).parameters
+        accepted = {name: value for name, value in options.items() if name in parameters}
+        tests[spec.label] = partial(test_function, **accepted) if accepted else test_function
+    return tests
+
+
+def check_inputs(test_function, inputs):
+    """The captured page inputs (see utils.page_capture) a check accepts as keyword arguments."""
+    if not inputs:
+        return {}
+    parameters = inspect.signature(test_function).parameters
+    return {name: value for name, value in inputs.items() if name in parameters and value is not None}
+
+
+def may_apply(test_name, html_content):
+    """False if the check's prefilter rules it out for this HTML (see CheckSpec.prefilter)."""
+    try:
+        prefilter = find_check(test_name).prefilter
+    except ValueError:
+        return True
+    return prefilter is None or may_contain(html_content, prefilter)
+
+
+def page_inputs(html_content, tests, inputs=None):
+    """
+    The inputs the checks of one page share: the captured ones plus, unless the
+    browser's DOM was captured, the page's Document parsed once from its HTML.
+    The page is not parsed when every check using it is ruled out by its prefilter.
+    """
+    inputs = dict(inputs or {})
+    if inputs.get("document") is None and any(
+        check_inputs(test, {"document": True}) and may_apply(test_name, html_content)
+        for test_name, test in tests.items()
+    ):
+        inputs["document"] = Document.from_html(html_content)
+    return inputs
+
+
+def last_document_reader(tests):
+    """Name of the last of the tests that reads the shared Document, or None."""
+    readers = [test_name for test_name, test in tests.items() if check_inputs(test, {"document": True})]
+    return readers[-1] if readers else None
+
+
+def run_checks(html_content, tests=None, on_phase=None, on_result=None, inputs=None, memory=None):
+    """
+    Runs the WCAG 1.3.1 checks on already fetched HTML.
+
+    Args:
+        html_content (str or bytes): HTML of the page; bytes are decoded by their BOM or <meta charset>.
+        tests (dict, str or list, optional): Test name mapped to its check function, or a
+            selection for load_tests. Defaults to all tests.
+        on_phase (callable, optional): Called with the test name before each test runs.
+        on_result (callable, optional): Called with the test name and result after each test.
+        inputs (dict, optional): Captured page inputs, e.g. {"accessibility_tree": ...}; each
+            check receives those it accepts.
+        memory (MemoryMonitor, optional): Switches the remaining checks to lean mode once the
+            page exceeds its memory budget (see utils.memory).
+
+    Returns:
+        dict: Test name mapped to the test result.
+    """
+    tests = load_tests(tests)
+    if memory is not None:
+        memory.check("parse", len(html_content) * BYTES_PER_HTML_CHAR)
+    inputs = page_inputs(html_content, tests, inputs)
+    last_reader = last_document_reader(tests) if memory is not None else None
+
+    results = {}
+    for test_name, test_function in tests.items():
+        if on_phase:
+            on_phase(test_name)
+        if memory is not None:
+            memory.check(test_name)
+            test_function = memory.prepare(test_function, inputs)
+        try:
+            results[test_name] = test_function(html_content, **check_inputs(test_function, inputs))
+        except Exception as e:
+            logging.error(f"Error during {test_name}: {e}")
+            results[test_name] = {
+                "status": "Error",
+                "details": [{"Issue": f"Unexpected error occurred: {e}"}],
+                "confidence": 0.0,
+            }
+        if on_result:
+            on_result(test_name, results[test_name])
+        if memory is not None and test_name == last_reader:
+            memory.release(inputs)
+    return results
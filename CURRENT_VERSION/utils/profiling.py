@@ -0,0 +1,178 @@
+"""
+Per-URL, per-check profiles for finding out why a site is slow.
+
+CheckProfiler.wrap() returns the tests with every check run under cProfile
+while a sampler thread records the check's call stack every millisecond.
+For each URL and check it writes, under `<directory>/<url>/`:
+
+    <Test_Name>.collapsed   sampled stacks in collapsed form ("a;b;c 12"), the
+                            input of flamegraph.pl, speedscope or inferno
+    <Test_Name>.pstats      the cProfile statistics (pstats, snakeviz)
+    summary.json            time per check and its top N functions by own time
+
+The summary is what the run reports (see load_profile_summary) show.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+from collections import Counter
+
+SAMPLE_INTERVAL = 0.001
+TOP_FUNCTIONS = 20
+
+
+def profile_key(key):
+    """File-system safe folder name of a URL or file."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", re.sub(r"^https?://", "", key)).strip("_")[:150] or "page"
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the call stack of one thread from a background thread."""
+
+    def __init__(self, thread_id, root_frame, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        # Frames above this one (the profiler's own caller chain) are left out
+        self.root_frame = root_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root_frame:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def hottest_functions(profile, top=TOP_FUNCTIONS):
+    """The `top` functions of a cProfile run by own time."""
+    stats = pstats.Stats(profile).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return [
+        {
+            "function": f"{name} ({os.path.basename(file)}:{line})",
+            "calls": calls,
+            "own_seconds": round(own, 6),
+            "cumulative_seconds": round(cumulative, 6),
+        }
+        for (file, line, name), (_, calls, own, cumulative, _) in ranked
+    ]
+
+
+class CheckProfiler:
+    """
+    Profiles the checks of each URL into `directory`.
+
+    Args:
+        directory (str): Output directory, with one folder per URL.
+        top (int): Functions listed per check in the summary.
+        interval (float): Seconds between stack samples.
+    """
+
+    def __init__(self, directory, top=TOP_FUNCTIONS, interval=SAMPLE_INTERVAL):
+        self.directory = directory
+        self.top = top
+        self.interval = interval
+        self.summaries = {}
+
+    def wrap(self, tests, key):
+        """The tests (name -> check function) with each check profiled under `key` (e.g. the URL)."""
+        return {test_name: self._wrap(test_name, function, key) for test_name, function in tests.items()}
+
+    def _wrap(self, test_name, function, key):
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            return self.run(key, test_name, function, *args, **kwargs)
+        # Keep the check's name and bound options visible to utils.incremental
+        profiled.func = getattr(function, "func", function)
+        profiled.keywords = getattr(function, "keywords", None)
+        # Lets utils.memory profile the check it rebinds with lean limits
+        profiled.rewrap = functools.partial(self._wrap, test_name, key=key)
+        return profiled
+
+    def run(self, key, test_name, function, *args, **kwargs):
+        """Runs one check under the profiler and records its profile."""
+        profile = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), sys._getframe(), self.interval)
+        sampler.start()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            self._record(key, test_name, profile, sampler.stacks, elapsed)
+
+    def _record(self, key, test_name, profile, stacks, elapsed):
+        folder = os.path.join(self.directory, profile_key(key))
+        os.makedirs(folder, exist_ok=True)
+        base_path = os.path.join(folder, test_name.replace(" ", "_"))
+        with open(base_path + ".collapsed", "w", encoding="utf-8") as collapsed_file:
+            for stack, count in sorted(stacks.items()):
+                collapsed_file.write(f"{stack} {count}\n")
+        profile.dump_stats(base_path + ".pstats")
+        self.summaries.setdefault(key, []).append({
+            "test": test_name,
+            "seconds": round(elapsed, 6),
+            "samples": sum(stacks.values()),
+            "top": hottest_functions(profile, self.top),
+        })
+
+    def save(self, key):
+        """Writes the summary.json of a URL (replacing one from an earlier run) and returns its path."""
+        summary = self.summaries.pop(key, [])
+        folder = os.path.join(self.directory, profile_key(key))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "summary.json")
+        with open(path, "w", encoding="utf-8") as summary_file:
+            json.dump({"key": key, "checks": summary}, summary_file, indent=2)
+        return path
+
+
+def load_profile_summary(directory, key):
+    """The profiled checks of a URL (see CheckProfiler.save), or [] if it has no profile."""
+    try:
+        with open(os.path.join(directory, profile_key(key), "summary.json"), encoding="utf-8") as summary_file:
+            return json.load(summary_file)["checks"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+PROFILE_HEADERS = ["URL", "Test", "Check Seconds", "Rank", "Function", "Calls", "Own Seconds", "Cumulative Seconds"]
+
+
+def profile_rows(key, checks):
+    """Report rows for the profiled checks of a URL: one per hot function."""
+    rows = []
+    for check in checks:
+        for rank, function in enumerate(check["top"], start=1):
+            rows.append([
+                key, check["test"], check["seconds"], rank, function["function"],
+                function["calls"], function["own_seconds"], function["cumulative_seconds"],
+            ])
+    return rows
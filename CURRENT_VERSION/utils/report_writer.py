@@ -0,0 +1,186 @@
+import gzip
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from checks.WCAG_1_3_1.issues import jsonable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+Per-test detail files (CSV and JSON) written in the background.
+
+Each test's detail rows are turned once into plain dicts, the JSON is encoded
+once (with orjson when it is installed, compact unless `indent` is set) and
+the CSV and JSON files are then written concurrently on a small thread pool,
+while the next test runs. Files can be gzip or zstd compressed; zstd needs the
+`zstandard` package. Given a SnippetStore (see utils.snippet_store), the rows
+quote their HTML snippets by reference. Given a BundleWriter (see
+utils.result_bundle), the files of the page become one record of the bundle
+instead of files in per-test folders.
+"""
+
+# File suffix of each compression
+COMPRESSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def check_compression(compression):
+    """Raises ValueError if the compression is unknown or its module is not installed."""
+    if compression not in COMPRESSIONS:
+        known = ", ".join(name for name in COMPRESSIONS if name)
+        raise ValueError(f"Unknown compression '{compression}'. Available: {known}.")
+    if compression == "zstd":
+        if importlib.util.find_spec("zstandard") is None:
+            raise ValueError("zstd compression requires the 'zstandard' package.")
+
+
+def open_compressed(file_path, compression=None):
+    """Opens a file for binary writing through the given compression."""
+    if compression == "gzip":
+        return gzip.open(file_path, "wb", compresslevel=6)
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor().stream_writer(open(file_path, "wb"), closefd=True)
+    return open(file_path, "wb")
+
+
+def plain_rows(details):
+    """Detail rows (Issue records, dicts) as plain dicts, the form both files are written from."""
+    return [dict(row) if isinstance(row, Mapping) else row for row in details or []]
+
+
+def encode_json(data, indent=False):
+    """Encodes data as UTF-8 JSON bytes, compact unless `indent` is set."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=jsonable, option=option)
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=jsonable).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=jsonable).encode("utf-8")
+
+
+def write_json(file_path, payload, compression=None):
+    """Writes encoded JSON bytes to a (compressed) file."""
+    with open_compressed(file_path, compression) as json_file:
+        json_file.write(payload)
+    logging.info(f"JSON file saved: {file_path}")
+    return file_path
+
+
+def write_csv(file_path, rows, write_function, compression=None):
+    """
+    Writes rows with a check's CSV writer, then compresses the file if asked.
+    The writer writes plain CSV; the compressed copy replaces it.
+    """
+    if write_function(file_path, rows) is False:
+        raise RuntimeError(f"CSV writer failed for {file_path}")
+    if not compression:
+        return file_path
+    compressed_path = file_path + COMPRESSIONS[compression]
+    with open(file_path, "rb") as csv_file, open_compressed(compressed_path, compression) as compressed:
+        shutil.copyfileobj(csv_file, compressed)
+    os.remove(file_path)
+    return compressed_path
+
+
+def render_csv(rows, write_function):
+    """The CSV bytes a check's writer produces for rows (it only writes to paths)."""
+    with tempfile.TemporaryDirectory(prefix="report-writer-") as directory:
+        file_path = os.path.join(directory, "details.csv")
+        if write_function(file_path, rows) is False:
+            raise RuntimeError("CSV writer failed")
+        with open(file_path, "rb") as csv_file:
+            return csv_file.read()
+
+
+class ReportWriter:
+    """
+    Writes detail files on a thread pool; use as a context manager, or call
+    close() to wait for every pending file.
+
+    Args:
+        compression (str, optional): None, "gzip" or "zstd".
+        indent (bool): Indent the JSON instead of writing it compactly.
+        max_workers (int): Files written at the same time.
+        snippets (SnippetStore, optional): Store the snippets are moved to; saved on close().
+        bundle (BundleWriter, optional): Bundle the files are appended to, as one record
+            under `key`, on close(); `compression` then is the bundle's.
+        key (str, optional): Record key in the bundle, e.g. the URL.
+    """
+
+    def __init__(self, compression=None, indent=False, max_workers=4, snippets=None, bundle=None, key=None):
+        check_compression(compression)
+        self.compression = compression
+        self.indent = indent
+        self.snippets = snippets
+        self.bundle = bundle
+        self.key = key
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-writer")
+        self._pending = []
+        # Bundled files: name inside the record -> content or Future of it
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, folder, test_name, details, write_function=None):
+        """
+        Queues the detail files of one test: `<test>_details.json` and, given the
+        check's writer, `<test>_details.csv` (plus the compression suffix). In a
+        bundle the files are named `<test folder>/<test>_details.json` and `.csv`.
+        """
+        rows = self.snippets.reference(details) if self.snippets is not None else plain_rows(details)
+        if self.bundle is not None:
+            base_name = f"{os.path.basename(folder)}/{test_name.replace(' ', '_')}_details"
+            self._files[base_name + ".json"] = encode_json(rows, self.indent)
+            if write_function is not None:
+                self._files[base_name + ".csv"] = self._executor.submit(render_csv, rows, write_function)
+            return
+        base_path = os.path.join(folder, f"{test_name.replace(' ', '_')}_details")
+        json_path = base_path + ".json" + COMPRESSIONS[self.compression]
+        payload = encode_json(rows, self.indent)
+        self._pending.append((test_name, self._executor.submit(write_json, json_path, payload, self.compression)))
+        if write_function is not None:
+            self._pending.append((test_name, self._executor.submit(
+                write_csv, base_path + ".csv", rows, write_function, self.compression
+            )))
+
+    def close(self):
+        """
+        Waits for the queued files.
+
+        Returns:
+            list: Paths of the files written (names in the bundle record when bundling);
+                failures are logged and left out.
+        """
+        written = []
+        for test_name, future in self._pending:
+            try:
+                written.append(future.result())
+            except Exception as e:
+                logging.error(f"Error saving results for {test_name}: {e}")
+        self._pending = []
+        if self.bundle is not None and self._files:
+            files = {}
+            for name, content in self._files.items():
+                try:
+                    files[name] = content.result() if hasattr(content, "result") else content
+                except Exception as e:
+                    logging.error(f"Error saving {name} for {self.key}: {e}")
+            self.bundle.append(self.key, files)
+            self._files = {}
+            written.extend(files)
+        self._executor.shutdown()
+        if self.snippets is not None:
+            self.snippets.save()
+        return written
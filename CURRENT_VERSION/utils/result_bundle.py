@@ -0,0 +1,204 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+"""
+Sharded, append-only result bundles.
+
+Instead of a folder per test with a CSV and a JSON file in it, the detail
+files of each URL become one compressed record appended to a shard file of
+the batch (`results-00000.bundle`, ...), next to an `index.jsonl` that gives
+the shard, offset and length of every record. A 50k URL audit thus writes a
+handful of large files, and the results of one URL are still read with a
+single seek:
+
+    reader = BundleReader("output/bundle")
+    files = reader.read("https://example.com/")   # {"Heading_Markup/...json": "..."}
+
+A record is the JSON object {"key": ..., "files": {name: text}}, compressed
+on its own (gzip by default, zstd with the `zstandard` package). Shards are
+only ever appended to, and a key written again is read from its latest
+record, so a batch can be resumed or re-run into the same bundle.
+"""
+
+INDEX_NAME = "index.jsonl"
+SHARD_PATTERN = "results-{:05d}.bundle"
+# A new shard is started once the current one reaches this size
+SHARD_BYTES = 256 * 1024 * 1024
+
+
+def compress(data, compression):
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def decompress(data, compression):
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def load_index(directory):
+    """
+    Reads a bundle index.
+
+    Returns:
+        dict: Key mapped to the index entry of its latest record.
+    """
+    index = {}
+    index_path = os.path.join(directory, INDEX_NAME)
+    if not os.path.exists(index_path):
+        return index
+    with open(index_path, encoding="utf-8") as index_file:
+        for line in index_file:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A run stopped mid-write leaves at most one partial last line
+                logging.warning(f"Skipping a damaged entry of {index_path}")
+                continue
+            index[entry["key"]] = entry
+    return index
+
+
+class BundleWriter:
+    """
+    Appends per-key records to the shards of a bundle directory.
+
+    Args:
+        directory (str): Bundle directory; an existing bundle is appended to.
+        compression (str, optional): "gzip" (default), "zstd" or None.
+        shard_bytes (int): Size at which a new shard is started.
+    """
+
+    def __init__(self, directory, compression="gzip", shard_bytes=SHARD_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compression = compression
+        self.shard_bytes = shard_bytes
+        self._lock = threading.Lock()
+        shards = sorted(name for name in os.listdir(directory) if name.startswith("results-"))
+        self._shard = int(shards[-1][len("results-"):-len(".bundle")]) if shards else 0
+        self._shard_file = None
+        self._index_file = open(os.path.join(directory, INDEX_NAME), "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_shard(self):
+        if self._shard_file is not None and self._shard_file.tell() >= self.shard_bytes:
+            self._shard_file.close()
+            self._shard_file = None
+            self._shard += 1
+        if self._shard_file is None:
+            self._shard_file = open(os.path.join(self.directory, SHARD_PATTERN.format(self._shard)), "ab")
+        return self._shard_file
+
+    def append(self, key, files):
+        """
+        Appends the files of one key as a record.
+
+        Args:
+            key (str): Record key, e.g. the URL.
+            files (dict): File name mapped to its content (str or UTF-8 bytes).
+        """
+        texts = {name: data.decode("utf-8") if isinstance(data, bytes) else data for name, data in files.items()}
+        record = compress(
+            json.dumps({"key": key, "files": texts}, ensure_ascii=False).encode("utf-8"), self.compression
+        )
+        with self._lock:
+            shard_file = self._open_shard()
+            offset = shard_file.tell()
+            shard_file.write(record)
+            shard_file.flush()
+            # The index entry is written after its record, so every indexed record is complete
+            self._index_file.write(json.dumps({
+                "key": key,
+                "shard": SHARD_PATTERN.format(self._shard),
+                "offset": offset,
+                "length": len(record),
+                "compression": self.compression,
+                "files": sorted(texts),
+                "time": round(time.time(), 3),
+            }) + "\n")
+            self._index_file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._shard_file is not None:
+                self._shard_file.close()
+                self._shard_file = None
+            self._index_file.close()
+
+
+class BundleReader:
+    """Random access to the records of a bundle directory by key."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = load_index(directory)
+
+    def keys(self):
+        return list(self.index)
+
+    def read(self, key):
+        """
+        Reads the latest record of a key.
+
+        Returns:
+            dict: File name mapped to its text; raises KeyError for unknown keys.
+        """
+        entry = self.index[key]
+        with open(os.path.join(self.directory, entry["shard"]), "rb") as shard_file:
+            shard_file.seek(entry["offset"])
+            record = shard_file.read(entry["length"])
+        return json.loads(decompress(record, entry.get("compression")))["files"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or read the records of a result bundle.")
+    parser.add_argument("directory", help="Bundle directory.")
+    parser.add_argument("key", nargs="?", help="Key (URL) to read; lists the keys when omitted.")
+    parser.add_argument("--file", default=None, help="Print only this file of the record.")
+    parser.add_argument("--extract", default=None, metavar="DIR", help="Write the record's files under DIR.")
+    args = parser.parse_args()
+
+    reader = BundleReader(args.directory)
+    if not args.key:
+        for key in reader.keys():
+            print(key)
+        return
+    files = reader.read(args.key)
+    if args.extract:
+        for name, text in files.items():
+            path = os.path.join(args.extract, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8", newline="") as output_file:
+                output_file.write(text)
+        print(f"Extracted {len(files)} files to {args.extract}")
+    elif args.file:
+        sys.stdout.write(files[args.file])
+    else:
+        for name in sorted(files):
+            print(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import os
+import json
+import shutil
+import hashlib
+from collections import namedtuple
+
+from openpyxl import Workbook, load_workbook
+
+from utils.aggregate import dataset_paths, write_site_summary
+from utils.csv_handler import flush_appenders
+from utils.snippet_store import snippet_store_path
+
+"""
+Sharded batch runs over a URL list, and the merge of their outputs.
+
+`--shard i/n` gives every URL to exactly one of n hosts by a stable hash of
+the URL, so each host can read the same urls.txt and needs no coordination.
+The URL file is read as a stream, and a URL listed twice is audited once.
+Each shard writes its own summary workbook with its datasets (and snippet
+store) next to it; merge_shard_results() concatenates those into one batch,
+copying the CSV datasets byte for byte, and builds the site summary of the
+whole run.
+"""
+
+# Shard `index` (1-based) of `count`
+Shard = namedtuple("Shard", ["index", "count"])
+
+
+def parse_shard(value):
+    """Parses "i/n" (1 <= i <= n) into a Shard; raises ValueError otherwise."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}'; expected i/n, e.g. 2/4.")
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}'; i must be between 1 and n.")
+    return Shard(index, count)
+
+
+def url_key(url):
+    """Stable 64-bit hash of a URL, the same on every host and Python run."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_of(url, count):
+    """1-based shard a URL belongs to."""
+    return url_key(url) % count + 1
+
+
+def iter_urls(file_path, shard=None):
+    """
+    Streams the URLs of a URL file, one per line.
+
+    Args:
+        file_path (str): URL list; blank lines and lines starting with '#' are skipped.
+        shard (Shard, optional): Only yield the URLs of this shard.
+
+    Yields:
+        str: Each URL of the shard once, in file order.
+    """
+    seen = set()
+    with open(file_path, "r", encoding="utf-8-sig") as url_file:
+        for line in url_file:
+            url = line.strip()
+            if not url or url.startswith("#"):
+                continue
+            key = url_key(url)
+            if shard is not None and key % shard.count + 1 != shard.index:
+                continue
+            # Hashes rather than URLs keep the memory per seen URL small
+            if key in seen:
+                continue
+            seen.add(key)
+            yield url
+
+
+def shard_results_file(results_file, shard):
+    """Summary workbook name of one shard of a batch."""
+    base, extension = os.path.splitext(results_file)
+    return f"{base}_shard{shard.index}of{shard.count}{extension}"
+
+
+def _concatenate_csv(paths, output_path):
+    # The header is taken from the first file; the rows are copied as bytes
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return
+    with open(output_path, "wb") as output:
+        for number, path in enumerate(paths):
+            with open(path, "rb") as part:
+                header = part.readline()
+                if number == 0:
+                    output.write(header)
+                shutil.copyfileobj(part, output)
+
+
+def _concatenate_snippets(paths, output_path):
+    # Snippet ids are content hashes, so the stores merge without rewriting references
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return
+    seen = set()
+    with open(output_path, "w", encoding="utf-8") as output:
+        for path in paths:
+            with open(path, encoding="utf-8") as part:
+                for line in part:
+                    if line.strip() and (key := json.loads(line)["id"]) not in seen:
+                        seen.add(key)
+                        output.write(line if line.endswith("\n") else line + "\n")
+
+
+def merge_shard_results(results_files, output_file):
+    """
+    Combines the outputs of the shards of a batch into one.
+
+    Args:
+        results_files (list): Summary workbooks of the shards (with their datasets next to them).
+        output_file (str): Merged summary workbook; its datasets, snippet store and site
+            summary are written next to it.
+
+    Returns:
+        str: Path of the merged site summary workbook, or None when there are no records.
+    """
+    flush_appenders()
+    merged = Workbook(write_only=True)
+    sheets = {}
+    for results_file in results_files:
+        workbook = load_workbook(results_file, read_only=True)
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if sheet.title not in sheets:
+                sheets[sheet.title] = (merged.create_sheet(sheet.title), header)
+                sheets[sheet.title][0].append(header or ())
+            elif header != sheets[sheet.title][1]:
+                raise ValueError(f"{results_file} was run with other checks than the first shard.")
+            for row in rows:
+                sheets[sheet.title][0].append(row)
+        workbook.close()
+    merged.save(output_file)
+
+    for merged_path, paths in zip(dataset_paths(output_file), zip(*(dataset_paths(f) for f in results_files))):
+        _concatenate_csv(paths, merged_path)
+    _concatenate_snippets([snippet_store_path(f) for f in results_files], snippet_store_path(output_file))
+    return write_site_summary(output_file)
@@ -0,0 +1,152 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from collections.abc import Mapping
+
+"""
+Content-addressed store for the HTML snippets quoted in issue reports.
+
+The same offending markup (a navigation div, a repeated form input) is
+quoted by many issues and on many pages. With a SnippetStore, the snippet
+fields of the report rows ("List HTML", "Table HTML", "Input HTML",
+"HTML Snippet", "blockquote_html") hold a reference such as
+"snippet:3f2a9c0d41be7e55" instead, and each distinct snippet is kept once,
+keyed by the hash of its text. The store is an append-only JSON lines file
+({"id": ..., "html": ...} per line), so one store can serve a whole batch or
+several runs. expand() (or `python -m utils.snippet_store`) puts the markup
+back inline for reading.
+"""
+
+# Report fields that quote page markup
+SNIPPET_KEYS = frozenset({"List HTML", "Table HTML", "Input HTML", "HTML Snippet", "blockquote_html"})
+REFERENCE_PREFIX = "snippet:"
+
+
+def snippet_store_path(results_file):
+    """The snippet store that belongs to a summary workbook."""
+    base, _ = os.path.splitext(results_file)
+    return f"{base}_snippets.jsonl"
+
+
+def snippet_id(snippet):
+    """Hash id of a snippet's text."""
+    return hashlib.blake2b(snippet.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+def plain(value):
+    """Issue records and other mappings, also nested in lists, as plain dicts and lists."""
+    if isinstance(value, Mapping):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    return value
+
+
+class SnippetStore:
+    """
+    Snippets by content hash.
+
+    Args:
+        path (str, optional): JSON lines file the store is loaded from and saved to;
+            without one the store lives in memory (e.g. for a single response).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.snippets = {}
+        self._unsaved = []
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.snippets)
+
+    def load(self, path):
+        """Adds the snippets saved in a store file."""
+        with open(path, encoding="utf-8") as store_file:
+            for line in store_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.snippets[entry["id"]] = entry["html"]
+
+    def add(self, snippet):
+        """Stores a snippet (once) and returns its reference."""
+        key = snippet_id(snippet)
+        if key not in self.snippets:
+            self.snippets[key] = snippet
+            self._unsaved.append(key)
+        return REFERENCE_PREFIX + key
+
+    def get(self, reference):
+        """The snippet of a reference, or None if it is not in the store."""
+        if isinstance(reference, str) and reference.startswith(REFERENCE_PREFIX):
+            return self.snippets.get(reference[len(REFERENCE_PREFIX):])
+        return None
+
+    def reference(self, rows):
+        """
+        Report rows with their snippets stored and replaced by references.
+
+        Args:
+            rows (list): Detail rows (Issue records or dicts, possibly nested).
+
+        Returns:
+            list: Plain dict rows; snippets no longer than a reference stay inline.
+        """
+        return self._map(plain(rows), self._reference_value)
+
+    def expand(self, rows):
+        """Report rows with every reference replaced by its snippet (unknown references are kept)."""
+        return self._map(plain(rows), lambda value: self.get(value) or value)
+
+    def _reference_value(self, value):
+        if isinstance(value, str) and len(value) > len(REFERENCE_PREFIX) + 16:
+            return self.add(value)
+        return value
+
+    def _map(self, value, convert):
+        if isinstance(value, dict):
+            return {
+                key: convert(item) if key in SNIPPET_KEYS else self._map(item, convert)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self._map(item, convert) for item in value]
+        return value
+
+    def save(self):
+        """Appends the snippets added since the last save to the store file."""
+        if not self.path or not self._unsaved:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as store_file:
+            for key in self._unsaved:
+                store_file.write(json.dumps({"id": key, "html": self.snippets[key]}, ensure_ascii=False) + "\n")
+        logging.info(f"Saved {len(self._unsaved)} new snippets to {self.path}")
+        self._unsaved = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Put the stored snippets of a JSON detail file back inline.")
+    parser.add_argument("details", help="JSON detail file with snippet references.")
+    parser.add_argument("--store", required=True, help="Snippet store (JSON lines) the references point to.")
+    parser.add_argument("--output", default=None, help="Where to write the expanded JSON (default: stdout).")
+    args = parser.parse_args()
+
+    store = SnippetStore(args.store)
+    with open(args.details, encoding="utf-8") as details_file:
+        expanded = store.expand(json.load(details_file))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(expanded, output_file, indent=2, ensure_ascii=False)
+    else:
+        json.dump(expanded, sys.stdout, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+# utils/web_archive.py
+
+"""
+Streaming WARC and HAR ingestion.
+
+Records are read one at a time, so archives of any size can be audited
+without extracting them. WARC work is split between processes by byte
+range: for plain .warc files the ranges follow exact record offsets taken
+from a header-only scan; for .warc.gz files each worker seeks to its range
+and resynchronises on the next gzip member that holds a WARC record (one
+record per member, as the WARC spec recommends). A record belongs to the
+range containing its first byte, so every record is audited exactly once.
+A member holding several records (up to a whole .warc.gz compressed as one
+stream) is decompressed incrementally and all of its records are read by
+the range the member starts in. Ranges are at most RANGE_BYTES long and
+only a few are in flight at a time, so the results held in memory stay
+bounded however large the archive is.
+"""
+
+import os
+import re
+import json
+import zlib
+import base64
+import codecs
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.pipeline import run_checks
+
+READ_SIZE = 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b\x08'
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# Archive bytes audited by one worker task
+RANGE_BYTES = 16 * 1024 * 1024
+
+
+def _parse_headers(lines):
+    """Parses `Name: value` header lines into a dict with lower-cased names."""
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower().decode('latin-1')] = value.strip().decode('latin-1')
+    return headers
+
+
+def _read_member_records(archive, offset):
+    """
+    Streams the WARC records of the gzip member at `offset`, decompressing it incrementally.
+
+    Yields (headers, block) for each record and returns the offset of the next member.
+    """
+    archive.seek(offset)
+    decompressor = zlib.decompressobj(wbits=31)
+    buffer = b''
+    consumed = 0
+    while True:
+        # Emit every complete record the buffer holds
+        while True:
+            buffer = buffer.lstrip(b'\r\n')
+            head_end = buffer.find(b'\r\n\r\n')
+            if head_end == -1:
+                break
+            lines = buffer[:head_end].split(b'\r\n')
+            if not lines[0].startswith(b'WARC/'):
+                raise ValueError(f"Expected a WARC record in the gzip member at offset {offset}")
+            headers = _parse_headers(lines[1:])
+            block_end = head_end + 4 + int(headers.get('content-length', 0))
+            if len(buffer) < block_end:
+                break
+            yield headers, buffer[head_end + 4:block_end]
+            buffer = buffer[block_end:]
+        if decompressor.eof:
+            break
+        chunk = archive.read(READ_SIZE)
+        if not chunk:
+            raise zlib.error(f"Truncated gzip member at offset {offset}")
+        buffer += decompressor.decompress(chunk)
+        consumed += len(chunk)
+    if buffer:
+        logging.error(f"Ignored {len(buffer)} bytes after the last WARC record of the gzip member at offset {offset}")
+    return offset + consumed - len(decompressor.unused_data)
+
+
+def _is_record_member(archive, offset):
+    """Checks whether a gzip member holding a WARC record starts at `offset`."""
+    archive.seek(offset)
+    try:
+        head = zlib.decompressobj(wbits=31).decompress(archive.read(512), 16)
+    except zlib.error:
+        return False
+    return head.startswith(b'WARC/')
+
+
+def _next_member_offset(archive, start, end):
+    """Finds the first WARC record member starting in [start, end)."""
+    position = start
+    while position < end:
+        archive.seek(position)
+        window = archive.read(READ_SIZE + len(GZIP_MAGIC))
+        if not window:
+            return None
+        found = window.find(GZIP_MAGIC)
+        while found != -1 and position + found < end:
+            if _is_record_member(archive, position + found):
+                return position + found
+            found = window.find(GZIP_MAGIC, found + 1)
+        position += READ_SIZE
+    return None
+
+
+def _iter_gzip_records(path, start, end):
+    with open(path, 'rb') as archive:
+        offset = start if start == 0 else _next_member_offset(archive, start, end)
+        while offset is not None and offset < end:
+            try:
+                # Records of one member share its offset; the member belongs to the range it starts in
+                records = _read_member_records(archive, offset)
+                while True:
+                    headers, block = next(records)
+                    yield offset, headers, block
+            except StopIteration as stop:
+                offset = stop.value
+            except (zlib.error, ValueError) as e:
+                logging.error(f"Corrupt record in {path} at offset {offset}: {e}")
+                offset = _next_member_offset(archive, offset + 1, end)
+
+
+def _read_plain_head(archive):
+    """Reads one plain WARC record header; returns (offset, headers) or None at EOF."""
+    line = archive.readline()
+    while line in (b'\r\n', b'\n'):
+        line = archive.readline()
+    if not line:
+        return None
+    offset = archive.tell() - len(line)
+    if not line.startswith(b'WARC/'):
+        raise ValueError(f"Expected a WARC record at offset {offset}")
+    lines = []
+    while True:
+        line = archive.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        lines.append(line.rstrip(b'\r\n'))
+    return offset, _parse_headers(lines)
+
+
+def _iter_plain_records(path, start, end, skip_block=None):
+    with open(path, 'rb') as archive:
+        archive.seek(start)
+        while True:
+            record = _read_plain_head(archive)
+            if record is None:
+                return
+            offset, headers = record
+            if offset >= end:
+                return
+            length = int(headers.get('content-length', 0))
+            if skip_block and skip_block(headers):
+                # Not needed: seek past the block instead of reading it
+                archive.seek(length, os.SEEK_CUR)
+                block = None
+            else:
+                block = archive.read(length)
+            yield offset, headers, block
+
+
+def _wants_block(headers):
+    return headers.get('warc-type') == 'response'
+
+
+def iter_warc_records(path, start=0, end=None):
+    """
+    Streams the records of a WARC file whose first byte lies in [start, end).
+
+    Yields:
+        tuple: (offset, headers, block); block is None for records other than responses.
+    """
+    end = os.path.getsize(path) if end is None else end
+    if path.lower().endswith('.gz'):
+        yield from _iter_gzip_records(path, start, end)
+    else:
+        yield from _iter_plain_records(path, start, end, skip_block=lambda headers: not _wants_block(headers))
+
+
+def warc_record_offsets(path):
+    """Lists record offsets of a plain WARC file by reading headers only."""
+    return [
+        offset
+        for offset, _, _ in _iter_plain_records(path, 0, os.path.getsize(path), skip_block=lambda headers: True)
+    ]
+
+
+def split_warc(path, parts):
+    """Splits a WARC file into at most `parts` byte ranges for parallel workers."""
+    size = os.path.getsize(path)
+    if path.lower().endswith('.gz'):
+        step = max(size // parts, 1)
+        bounds = list(range(0, size, step)) + [size]
+    else:
+        offsets = warc_record_offsets(path)
+        step = max(-(-len(offsets) // parts), 1)
+        bounds = offsets[::step] + [size]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i + 1]]
+
+
+def _dechunk(body):
+    """Decodes an HTTP/1.1 chunked transfer-encoded body."""
+    output = []
+    position = 0
+    while position < len(body):
+        line_end = body.find(b'\r\n', position)
+        if line_end == -1:
+            break
+        size = int(body[position:line_end].split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        output.append(body[line_end + 2:line_end + 2 + size])
+        position = line_end + 2 + size + 2
+    return b''.join(output)
+
+
+def _charset(content_type, default='utf-8'):
+    match = re.search(r'charset=["\']?([\w-]+)', content_type or '', re.I)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return default
+
+
+def http_response_html(block):
+    """Extracts decoded HTML from an HTTP response block, or None if it is not HTML."""
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    status = lines[0].split(b' ')
+    if len(status) < 2 or not status[1].startswith(b'2'):
+        return None
+    headers = _parse_headers(lines[1:])
+    content_type = headers.get('content-type', '')
+    if not content_type.lower().startswith(HTML_CONTENT_TYPES):
+        return None
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = _dechunk(body)
+    encoding = headers.get('content-encoding', '').lower()
+    if encoding in ('gzip', 'x-gzip'):
+        body = zlib.decompress(body, wbits=47)
+    elif encoding == 'deflate':
+        body = zlib.decompress(body)
+    return body.decode(_charset(content_type), 'replace')
+
+
+def iter_warc_html(path, start=0, end=None):
+    """Yields (target URI, HTML) for every HTML response record in the range."""
+    for offset, headers, block in iter_warc_records(path, start, end):
+        if headers.get('warc-type') != 'response' or block is None:
+            continue
+        try:
+            html_content = http_response_html(block)
+        except Exception as e:
+            logging.error(f"Cannot decode response at offset {offset} in {path}: {e}")
+            continue
+        if html_content is not None:
+            yield headers.get('warc-target-uri', f"{path}@{offset}"), html_content
+
+
+def iter_har_entries(path, read_size=READ_SIZE):
+    """Streams the `log.entries` of a HAR file without loading the whole file."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    with open(path, 'rb') as har_file:
+        buffer = ''
+        position = None
+        exhausted = False
+
+        def fill():
+            nonlocal buffer, exhausted
+            chunk = har_file.read(read_size)
+            exhausted = not chunk
+            buffer += text_decoder.decode(chunk, final=exhausted)
+
+        # Locate the opening bracket of the entries array
+        while position is None:
+            match = re.search(r'"entries"\s*:\s*\[', buffer)
+            if match:
+                position = match.end()
+            elif exhausted:
+                return
+            else:
+                fill()
+
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= len(buffer):
+                if exhausted:
+                    return
+                fill()
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                entry, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+                fill()
+                continue
+            buffer, position = buffer[position:], 0
+            yield entry
+
+
+def har_entry_html(entry):
+    """Extracts HTML from a HAR entry, or None if the response is not HTML."""
+    response = entry.get('response', {})
+    content = response.get('content', {})
+    if not 200 <= response.get('status', 0) < 300:
+        return None
+    if not content.get('mimeType', '').lower().startswith(HTML_CONTENT_TYPES) or 'text' not in content:
+        return None
+    if content.get('encoding') == 'base64':
+        return base64.b64decode(content['text']).decode(_charset(content['mimeType']), 'replace')
+    return content['text']
+
+
+def iter_archive_html(path):
+    """Yields (URI, HTML) for every HTML response in a WARC or HAR archive."""
+    if path.lower().endswith('.har'):
+        for entry in iter_har_entries(path):
+            html_content = har_entry_html(entry)
+            if html_content is not None:
+                yield entry.get('request', {}).get('url', path), html_content
+    else:
+        yield from iter_warc_html(path)
+
+
+def audit_warc_range(path, start, end, checks=None):
+    """Yields (URI, results) for the HTML responses whose record starts in [start, end)."""
+    for uri, html_content in iter_warc_html(path, start, end):
+        yield uri, run_checks(html_content, checks)
+
+
+def _audit_warc_range(path, start, end, checks=None):
+    # Worker tasks return their results at once; ranges are small enough for that
+    return list(audit_warc_range(path, start, end, checks))
+
+
+def _audit_html(item, checks=None):
+    uri, html_content = item
+    return uri, run_checks(html_content, checks)
+
+
+def audit_archive(path, workers=None, checks=None):
+    """
+    Audits every HTML response in a WARC or HAR archive in one pass.
+
+    Args:
+        path (str): .warc, .warc.gz or .har file.
+        workers (int, optional): Worker processes. Defaults to the CPU count.
+        checks (str, list or dict, optional): Check selection or loaded tests (see utils.pipeline.load_tests).
+
+    Yields:
+        tuple: (URI, results) for each HTML response.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if path.lower().endswith('.har'):
+            # HAR is one JSON document: stream entries here, check them in the pool
+            pending = deque()
+            for item in iter_archive_html(path):
+                pending.append(executor.submit(_audit_html, item, checks))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            parts = max(workers * 4, -(-os.path.getsize(path) // RANGE_BYTES))
+            pending = deque()
+            for start, end in split_warc(path, parts):
+                pending.append(executor.submit(_audit_warc_range, path, start, end, checks))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
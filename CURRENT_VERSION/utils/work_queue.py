@@ -0,0 +1,359 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+Lease-based work queue for batch runs shared by several workers.
+
+URLs are queued once in a SQLite file. A worker leases a URL for
+`lease_seconds`, keeps the lease alive with heartbeats while it audits the
+page and reports the URL done (or failed) at the end. A lease that runs out,
+because its worker died or hung, puts the URL back in the queue for the next
+lease; a URL that failed or expired `max_attempts` times is marked failed.
+Fast workers simply lease more often, so the load balances itself.
+
+Workers on one machine open the SQLite file directly. Workers on other
+machines talk to a coordinator that serves the same queue over HTTP:
+
+    python -m utils.work_queue serve jobs.db --host 0.0.0.0 --port 8132
+    python main.py --queue http://coordinator:8132 --enqueue   # on any host
+    python main.py --queue http://coordinator:8132             # on each worker
+
+open_queue() returns a WorkQueue for a path and a RemoteWorkQueue for a URL;
+both have the same methods. The coordinator has no authentication and binds
+to localhost unless given a --host; expose it on trusted networks only.
+"""
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+CREATE INDEX IF NOT EXISTS jobs_next ON jobs (state, attempts, id);
+"""
+
+
+class WorkQueue:
+    """
+    The queue in a SQLite file; safe to share between threads and processes.
+
+    Args:
+        path (str): SQLite database file (created if missing).
+        lease_seconds (float): How long a lease lasts without a heartbeat.
+        max_attempts (int): Leases a URL gets before it is marked failed.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def _transaction(self, work):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes never lease the same row
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._connection)
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            return result
+
+    def enqueue(self, urls, batch_size=1000):
+        """Queues URLs (an iterable, read in batches), skipping queued ones; returns the number added."""
+        added = 0
+        batch = []
+
+        def insert(connection):
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO jobs (url, updated) VALUES (?, ?)", [(url, time.time()) for url in batch]
+            )
+            return connection.total_changes - before
+
+        for url in urls:
+            batch.append(url)
+            if len(batch) >= batch_size:
+                added += self._transaction(insert)
+                batch = []
+        if batch:
+            added += self._transaction(insert)
+        return added
+
+    def lease(self, worker, count=1):
+        """
+        Leases up to `count` URLs to a worker, re-queuing expired leases first.
+
+        Returns:
+            list: The leased URLs (empty when nothing is available right now).
+        """
+        def lease(connection):
+            now = time.time()
+            # Expired leases go back to the queue, or fail once out of attempts
+            connection.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, updated = ? "
+                "WHERE state = ? AND lease_expires < ?",
+                (self.max_attempts, FAILED, PENDING, now, LEASED, now),
+            )
+            # URLs not tried yet go before retries
+            rows = connection.execute(
+                "SELECT id, url FROM jobs WHERE state = ? ORDER BY attempts, id LIMIT ?", (PENDING, count)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                "WHERE id = ?",
+                [(LEASED, worker, now + self.lease_seconds, now, row_id) for row_id, _ in rows],
+            )
+            return [url for _, url in rows]
+
+        return self._transaction(lease)
+
+    def heartbeat(self, worker, urls):
+        """Extends the worker's leases on URLs; returns the URLs whose lease it still holds."""
+        def heartbeat(connection):
+            now = time.time()
+            held = []
+            for url in urls:
+                cursor = connection.execute(
+                    "UPDATE jobs SET lease_expires = ?, updated = ? WHERE url = ? AND worker = ? AND state = ?",
+                    (now + self.lease_seconds, now, url, worker, LEASED),
+                )
+                if cursor.rowcount:
+                    held.append(url)
+            return held
+
+        return self._transaction(heartbeat)
+
+    def report(self, worker, url, status=DONE, result=None):
+        """
+        Reports a leased URL as DONE or FAILED; a failure is retried while attempts remain.
+
+        Returns:
+            bool: False if the worker no longer held the lease (the report is ignored).
+        """
+        def report(connection):
+            state = status
+            if status == FAILED:
+                attempts = connection.execute("SELECT attempts FROM jobs WHERE url = ?", (url,)).fetchone()
+                if attempts and attempts[0] < self.max_attempts:
+                    state = PENDING
+            cursor = connection.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, result = ?, updated = ? "
+                "WHERE url = ? AND worker = ? AND state = ?",
+                (state, json.dumps(result) if result is not None else None, time.time(), url, worker, LEASED),
+            )
+            return cursor.rowcount > 0
+
+        return self._transaction(report)
+
+    def stats(self):
+        """Number of URLs in each state."""
+        with self._lock:
+            counts = dict(self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in (PENDING, LEASED, DONE, FAILED)}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class RemoteWorkQueue:
+    """Client of a queue served by `python -m utils.work_queue serve`; same methods as WorkQueue."""
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # Updated from the coordinator with every lease
+        self.lease_seconds = LEASE_SECONDS
+
+    def _call(self, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def enqueue(self, urls, batch_size=1000):
+        added = 0
+        batch = []
+        for url in urls:
+            batch.append(url)
+            if len(batch) >= batch_size:
+                added += self._call("/enqueue", {"urls": batch})["added"]
+                batch = []
+        if batch:
+            added += self._call("/enqueue", {"urls": batch})["added"]
+        return added
+
+    def lease(self, worker, count=1):
+        response = self._call("/lease", {"worker": worker, "count": count})
+        self.lease_seconds = response.get("lease_seconds", self.lease_seconds)
+        return response["urls"]
+
+    def heartbeat(self, worker, urls):
+        return self._call("/heartbeat", {"worker": worker, "urls": list(urls)})["held"]
+
+    def report(self, worker, url, status=DONE, result=None):
+        return self._call("/report", {"worker": worker, "url": url, "status": status, "result": result})["accepted"]
+
+    def stats(self):
+        return self._call("/stats")
+
+    def close(self):
+        pass
+
+
+def open_queue(target, **options):
+    """A RemoteWorkQueue for an http(s) URL, otherwise a WorkQueue on the SQLite file `target`."""
+    if target.startswith(("http://", "https://")):
+        return RemoteWorkQueue(target)
+    return WorkQueue(target, **options)
+
+
+class LeaseKeeper:
+    """
+    Heartbeats a worker's leased URLs from a background thread while they are processed.
+
+        with LeaseKeeper(queue, worker, [url]):
+            audit(url)
+    """
+
+    def __init__(self, queue, worker, urls, interval=None):
+        self.queue = queue
+        self.worker = worker
+        self.urls = list(urls)
+        # Three heartbeats per lease leave room for a slow or missed one
+        self.interval = interval or getattr(queue, "lease_seconds", LEASE_SECONDS) / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                held = self.queue.heartbeat(self.worker, self.urls)
+                for url in set(self.urls) - set(held):
+                    logging.warning(f"Lease on {url} was lost; another worker may audit it again.")
+            except Exception as e:
+                logging.error(f"Heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_handler(queue):
+    class QueueRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, queue.stats())
+            elif self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise TypeError("the JSON body must be an object")
+                if self.path == "/enqueue":
+                    urls = request.get("urls")
+                    # A string is iterable too, and would be queued one character at a time
+                    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+                        raise ValueError("'urls' must be a list of URL strings")
+                    payload = {"added": queue.enqueue(urls)}
+                elif self.path == "/lease":
+                    payload = {
+                        "urls": queue.lease(request["worker"], int(request.get("count", 1))),
+                        "lease_seconds": queue.lease_seconds,
+                    }
+                elif self.path == "/heartbeat":
+                    payload = {"held": queue.heartbeat(request["worker"], request["urls"])}
+                elif self.path == "/report":
+                    payload = {"accepted": queue.report(
+                        request["worker"], request["url"], request.get("status", DONE), request.get("result")
+                    )}
+                else:
+                    self._send_json(404, {"error": f"Unknown path {self.path}"})
+                    return
+            except (KeyError, TypeError, ValueError) as e:
+                self._send_json(400, {"error": f"Invalid request: {e}"})
+                return
+            self._send_json(200, payload)
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} - {format % args}")
+
+    return QueueRequestHandler
+
+
+def serve(path, host="127.0.0.1", port=8132, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """Serves the queue in a SQLite file over HTTP until interrupted."""
+    queue = WorkQueue(path, lease_seconds, max_attempts)
+    server = ThreadingHTTPServer((host, port), make_handler(queue))
+    print(f"Work queue {path} served on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+        queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinate a batch audit shared by several workers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Serve a queue to workers on other machines.")
+    serve_parser.add_argument("database", help="SQLite file of the queue.")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only).")
+    serve_parser.add_argument("--port", type=int, default=8132, help="Port to listen on.")
+    serve_parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS, help="Lease duration.")
+    serve_parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Leases per URL before it fails.")
+    stats_parser = commands.add_parser("stats", help="Print the number of URLs in each state.")
+    stats_parser.add_argument("queue", help="SQLite file or coordinator URL.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.database, args.host, args.port, args.lease_seconds, args.max_attempts)
+    else:
+        print(json.dumps(open_queue(args.queue).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()